@@ -0,0 +1,99 @@
+"""
+Measures the speed of walking of AST by the translator in nodes per second. The speed depends on the machine, so the
+regression is checked by the slowdown: the time of the walking divided by the time of `ast.walk` over the same tree
+"""
+import ast
+import sys
+from argparse import ArgumentParser
+from io import StringIO
+from time import perf_counter
+
+from py2c.bytecode_walker import walk
+from py2c.translator_c import TranslatorC
+
+SOURCE_HEADER = """
+from tiny2313 import *
+
+REG_INIT: preproc = 7
+table: uint8_t__16
+"""
+
+SOURCE_FUNCTION = """
+def function_{index}(arg1: int, arg2: int = 5) -> int:
+    value: int = arg1 * {index} + arg2
+    counter = 0
+    while counter < value:
+        counter += 1
+        if counter % 3 == 0 and value > 10:
+            table[counter] = (counter << 2) | (value >> 1) ^ 0xFF
+        elif not counter:
+            break
+        else:
+            PORTB = 0 if PINB_0 == 1 else 1
+
+    for index in range(0, 10):
+        delay_ms(index + {index})
+
+    return value - counter
+"""
+
+
+def build_source(functions_count: int) -> str:
+    functions = [SOURCE_FUNCTION.format(index=index) for index in range(functions_count)]
+    return SOURCE_HEADER + ''.join(functions)
+
+
+DEFAULT_MAX_SLOWDOWN = 4.5
+
+
+def measure(source_code: str, repeats: int) -> tuple[int, float, float]:
+    """Return the count of nodes, the best time of the walking and the best time of `ast.walk`"""
+    nodes_count = sum(1 for _ in ast.walk(ast.parse(source_code)))
+    best_time = best_reference_time = None
+    for _ in range(repeats):
+        tree = ast.parse(source_code, feature_version=(3, 8))
+        start_time = perf_counter()
+        for _ in ast.walk(tree):
+            pass
+
+        reference_time = perf_counter() - start_time
+        if best_reference_time is None or reference_time < best_reference_time:
+            best_reference_time = reference_time
+
+        translator = TranslatorC(save_to=StringIO())
+        translator._walk = walk
+        start_time = perf_counter()
+        walk(translator, tree)
+        translator.save()
+        spent_time = perf_counter() - start_time
+        if best_time is None or spent_time < best_time:
+            best_time = spent_time
+
+    return nodes_count, best_time, best_reference_time
+
+
+def run():
+    parser = ArgumentParser(description='Benchmark of the AST walking')
+    parser.add_argument('-f', '--functions', type=int, default=200, help='count of functions in the source')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='count of repeats, the best is taken')
+    parser.add_argument(
+        '--max-slowdown',
+        type=float,
+        default=DEFAULT_MAX_SLOWDOWN,
+        help='the benchmark fails if the walking is slower than `ast.walk` by more times. 0 disables the check',
+    )
+    args = parser.parse_args()
+
+    nodes_count, spent_time, reference_time = measure(build_source(args.functions), args.repeats)
+    slowdown = spent_time / reference_time
+    print(
+        f'nodes: {nodes_count}, time: {spent_time:.4f} s, speed: {nodes_count / spent_time:.0f} nodes/s, '
+        f'slowdown against ast.walk: {slowdown:.2f}',
+    )
+    if args.max_slowdown and slowdown > args.max_slowdown:
+        print(f'The walking is slower than the limit: {slowdown:.2f} > {args.max_slowdown}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
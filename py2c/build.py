@@ -0,0 +1,164 @@
+"""Translation of all modules of a directory. Independent modules are translated in parallel processes"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+from py2c.bytecode_walker import parse, translate
+from py2c.manifest import build_manifest, is_up_to_date, open_output, write_manifest
+from py2c.module_interface import INTERFACES_DIR_NAME, get_imported_module_names, load_module_interface
+from py2c.translator_c import TranslatorC
+
+IGNORED_DIR_NAMES = {INTERFACES_DIR_NAME, '__pycache__'}
+
+
+@dataclass
+class Module:
+    name: str
+    path: Path
+    output_path: Path
+    dependencies: set[str] = field(default_factory=set)
+
+
+def get_module_name(module_path: Path, source_dir: Path) -> str:
+    return module_path.relative_to(source_dir).with_suffix('').as_posix()
+
+
+def discover_modules(source_dir: Path, output_dir: Path | None = None) -> dict[str, Module]:
+    modules = {}
+    for module_path in sorted(source_dir.rglob('*.py')):
+        if IGNORED_DIR_NAMES.intersection(module_path.relative_to(source_dir).parts):
+            continue
+
+        name = get_module_name(module_path, source_dir)
+        output_path = (output_dir / name).with_suffix('.c') if output_dir else module_path.with_suffix('.c')
+        modules[name] = Module(name=name, path=module_path, output_path=output_path)
+
+    return modules
+
+
+def build_import_graph(modules: dict[str, Module]):
+    for module in modules.values():
+        with open(module.path) as module_file:
+            tree = parse(module_file.read())
+
+        module.dependencies = {name for name in get_imported_module_names(tree) if name in modules} - {module.name}
+
+
+def build_module(module_path: Path, output_path: Path, config: dict, manifest: dict) -> int:
+    """
+    Translate the module in a worker. The interface of the module is written from the symbols of the same translation,
+    so workers, which translate dependent modules, load it instead of translating the module again.
+    The manifest is written after the output file. Returns the count of lines of the module.
+    """
+    translator = TranslatorC(save_to=None, config=config)
+    with open(module_path) as module_file:
+        source_code = module_file.read()
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open_output(output_path) as output_file:
+        translator.save_to = output_file
+        translate(translator, source_code, save_result=False)
+        symbols = dict(translator.symbols.global_symbols)
+        translator.save()
+
+    load_module_interface(module_path, config, lambda module_source_code: symbols)
+    write_manifest(output_path, manifest)
+    return source_code.count('\n') + 1
+
+
+def get_ready_modules(modules: dict[str, Module], waiting: set[str], translated: set[str], running: set[str]):
+    ready = [name for name in sorted(waiting - running) if modules[name].dependencies <= translated]
+    if not ready and waiting and not running:  # the rest modules import each other, so the cycle is broken
+        ready = [min(waiting)]
+
+    return ready
+
+
+@dataclass
+class BuildReport:
+    modules_count: int = 0
+    lines_count: int = 0
+    spent_time: float = 0
+    up_to_date_count: int = 0
+    errors: dict[str, str] = field(default_factory=dict)  # errors of failed modules by their names
+
+    def __str__(self):
+        spent_time = self.spent_time or float('inf')
+        lines = [
+            f'Translated {self.modules_count} modules ({self.lines_count} lines) in {self.spent_time:.2f} s: '
+            f'{self.modules_count / spent_time:.1f} modules/s, {self.lines_count / spent_time:.0f} lines/s. '
+            f'Up to date: {self.up_to_date_count} modules',
+        ]
+        if self.errors:
+            lines.append(f'Failed: {len(self.errors)} modules')
+            lines.extend(f'{name}: {error}' for name, error in sorted(self.errors.items()))
+
+        return '\n'.join(lines)
+
+
+def build(
+        source_dir: Path,
+        output_dir: Path | None = None,
+        jobs: int | None = None,
+        config: dict | None = None,
+        force: bool = False,
+):
+    """
+    Translate all modules of the directory. Modules are translated after the modules they import.
+    A module is skipped if its manifest is not changed, unless `force` is set.
+    """
+    start_time = perf_counter()
+    config = {**(config or {}), 'modules_dir': source_dir}
+    modules = discover_modules(source_dir, output_dir)
+    build_import_graph(modules)
+
+    report = BuildReport()
+    waiting = set(modules)
+    translated = set()
+    manifests = {}
+    for name, module in modules.items():
+        with open(module.path) as module_file:
+            manifests[name] = build_manifest(module.path, module_file.read(), config)
+
+        if not force and is_up_to_date(module.output_path, manifests[name]):
+            waiting.remove(name)
+            translated.add(name)
+            report.up_to_date_count += 1
+
+    def finish_module(name: str, get_lines_count):
+        """A failed module is reported, and the rest modules are built anyway"""
+        try:
+            report.lines_count += get_lines_count()
+        except Exception as error:
+            report.errors[name] = f'{error.__class__.__name__}: {error}'
+
+        waiting.remove(name)
+        translated.add(name)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        while waiting:
+            for name in get_ready_modules(modules, waiting, translated, set()):
+                module = modules[name]
+                finish_module(
+                    name,
+                    lambda: build_module(module.path, module.output_path, config, manifests[name]),
+                )
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            while waiting:
+                for name in get_ready_modules(modules, waiting, translated, set(futures.values())):
+                    module = modules[name]
+                    future = executor.submit(build_module, module.path, module.output_path, config, manifests[name])
+                    futures[future] = name
+
+                done_futures, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    finish_module(futures.pop(future), future.result)
+
+    report.modules_count = len(translated) - report.up_to_date_count - len(report.errors)
+    report.spent_time = perf_counter() - start_time
+    return report
@@ -1,90 +1,83 @@
 import ast
+from collections import OrderedDict
 from typing import Optional
 
+from py2c.constant_folding import NOT_CONSTANT, fold_constant, get_constant_value
+from py2c.dead_code import warn_removed_code
 from py2c.exceptions import InvalidAnnotationException, NoneIsNotAllowedException, SourceCodeException
+from py2c.tree_analysis import analyze_body
+
+
+OPERATORS = {
+    ast.Add: '+',
+    ast.Sub: '-',
+    ast.Mult: '*',
+    ast.Div: '/',
+    ast.FloorDiv: '//',
+    ast.Mod: '%',
+    ast.Pow: '**',
+    ast.RShift: '>>',
+    ast.LShift: '<<',
+    ast.BitOr: '|',
+    ast.BitXor: '^',
+    ast.BitAnd: '&',
+    # ast.MatMult: '',
+}
+COMPARE_OPERATORS = {
+    ast.Gt: '>',
+    ast.GtE: '>=',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+    # ast.Is: '',
+    # ast.IsNot: '',
+    # ast.In: '',
+    # ast.NotIn: '',
+}
+BOOL_OPERATORS = {
+    ast.Or: '||',
+    ast.And: '&&',
+}
+UNARY_OPERATORS = {
+    ast.UAdd: '+',
+    ast.USub: '-',
+    ast.Not: '!',
+    ast.Invert: '~',
+}
 
 
 def convert_op(node):
-    node.custom_ignore = True
-    if isinstance(node, ast.Add):
-        return '+'
-    elif isinstance(node, ast.Sub):
-        return '-'
-    elif isinstance(node, ast.Mult):
-        return '*'
-    elif isinstance(node, ast.Div):
-        return '/'
-    elif isinstance(node, ast.FloorDiv):
-        return '//'
-    elif isinstance(node, ast.Mod):
-        return '%'
-    elif isinstance(node, ast.Pow):
-        return '**'
-    elif isinstance(node, ast.RShift):
-        return '>>'
-    elif isinstance(node, ast.LShift):
-        return '<<'
-    elif isinstance(node, ast.BitOr):
-        return '|'
-    elif isinstance(node, ast.BitXor):
-        return '^'
-    elif isinstance(node, ast.BitAnd):
-        return '&'
-    # elif isinstance(node, ast.MatMult):
-    #    return ''
-    else:
+    operator = OPERATORS.get(type(node))
+    if operator is None:
         raise SourceCodeException('unknown node operator', node)
 
+    return operator
+
 
 def convert_compare_op(node):
-    node.custom_ignore = True
-    if isinstance(node, ast.Gt):
-        return '>'
-    elif isinstance(node, ast.GtE):
-        return '>='
-    elif isinstance(node, ast.Lt):
-        return '<'
-    elif isinstance(node, ast.LtE):
-        return '<='
-    elif isinstance(node, ast.Eq):
-        return '=='
-    elif isinstance(node, ast.NotEq):
-        return '!='
-    # elif isinstance(node, ast.Is):
-    #    return ''
-    # elif isinstance(node, ast.IsNot):
-    #    return ''
-    # elif isinstance(node, ast.In):
-    #    return ''
-    # elif isinstance(node, ast.NotIn):
-    #    return ''
-    else:
+    operator = COMPARE_OPERATORS.get(type(node))
+    if operator is None:
         raise SourceCodeException('unknown node compare operator', node)
 
+    return operator
+
 
 def convert_bool_op(node):
-    node.custom_ignore = True
-    if isinstance(node, ast.Or):
-        return '||'
-    elif isinstance(node, ast.And):
-        return '&&'
-    else:
+    operator = BOOL_OPERATORS.get(type(node))
+    if operator is None:
         raise SourceCodeException('unknown node bool operator', node)
 
+    return operator
+
 
 def convert_unary_op(node):
-    node.custom_ignore = True
-    if isinstance(node, ast.UAdd):
-        return '+'
-    elif isinstance(node, ast.USub):
-        return '-'
-    elif isinstance(node, ast.Not):
-        return '!'
-    elif isinstance(node, ast.Invert):
-        return '~'
-    else:
+    operator = UNARY_OPERATORS.get(type(node))
+    if operator is None:
         raise SourceCodeException('unknown node unary operator', node)
 
+    return operator
+
 
 def convert_annotation(annotation_node, parent_node) -> Optional[str]:
     # # закомментирован, так как переменные могут быть объявлены в C-библиотеках
@@ -93,7 +86,6 @@ def convert_annotation(annotation_node, parent_node) -> Optional[str]:
     if annotation_node is None:
         return
 
-    annotation_node.custom_ignore = True
     if isinstance(annotation_node, ast.Name):
         return annotation_node.id
     elif isinstance(annotation_node, ast.Constant):
@@ -114,320 +106,602 @@ def convert_annotation(annotation_node, parent_node) -> Optional[str]:
     raise InvalidAnnotationException('unknown annotation node', annotation_node)
 
 
+WALKERS = {}
+_resolved_walkers = {}
+
+
+def register_walker(*node_classes, translator_class=None):
+    """
+    Register a function as the walker of nodes of `node_classes`.
+    The walker is called as `walker(converter, node, parent_node)`.
+    If `translator_class` is set, the walker is used only by the class and its subclasses.
+    """
+    def decorator(walker):
+        if translator_class is None:
+            walkers = WALKERS
+        else:
+            walkers = translator_class.__dict__.get('walkers')
+            if walkers is None:
+                walkers = {}
+                translator_class.walkers = walkers
+
+        for node_class in node_classes:
+            walkers[node_class] = walker
+
+        _resolved_walkers.clear()
+        return walker
+
+    return decorator
+
+
+def resolve_walker(translator_class, node_class):
+    """Find a walker for `node_class`. Walkers of the translator class are preferred to the common walkers"""
+    resolved_walkers = _resolved_walkers.setdefault(translator_class, {})
+    if node_class in resolved_walkers:
+        return resolved_walkers[node_class]
+
+    walker = None
+    for node_base_class in node_class.__mro__:
+        for translator_base_class in translator_class.__mro__:
+            walker = translator_base_class.__dict__.get('walkers', {}).get(node_base_class)
+            if walker:
+                break
+
+        walker = walker or WALKERS.get(node_base_class)
+        if walker:
+            break
+
+    resolved_walkers[node_class] = walker
+    return walker
+
+
+def ignore_node(converter, node):
+    """Mark the node to skip it by walking. The mark is kept by the translator, the node is not changed"""
+    converter.transit_data.setdefault('ignored_nodes', set()).add(id(node))
+
+
+def is_ignored_node(converter, node) -> bool:
+    return node is None or id(node) in converter.transit_data.get('ignored_nodes', ())
+
+
 def walk(converter, node):
-    if node is None or getattr(node, 'custom_ignore', False):
+    if is_ignored_node(converter, node):
         return
 
+    walk_node(converter, node)
+
+
+def walk_node(converter, node):
     parents = converter.transit_data.setdefault('parents', [])
     parent_node = parents[-1] if parents else None
     parents.append(node)
 
-    has_while_orelse = converter.transit_data.setdefault('has_while_orelse', [])
+    lineno = getattr(node, 'lineno', None)
+    if lineno is not None:
+        converter.lineno = lineno
+        converter.col_offset = node.col_offset
 
-    converter.lineno = node.lineno if hasattr(node, 'lineno') else converter.lineno
-    converter.col_offset = node.col_offset if hasattr(node, 'col_offset') else converter.col_offset
-    node.lineno = converter.lineno
-    node.col_offset = converter.col_offset
-
-    node.custom_ignore = True
-    if isinstance(node, ast.AnnAssign):
-        if isinstance(node.value, ast.Lambda):
-            lambda_node = node.value
-            lambda_node.custom_ignore = True
-            args = [arg.arg for arg in lambda_node.args.args]
-            body = lambda_node.body
-            value_expr = None
-            value_lambda = (args, body)
-        else:
-            value_expr = node.value
-            value_lambda = None
-
-        converter.process_init_variable(
-            name=node.target.id,
-            value_expr=value_expr,
-            annotation=convert_annotation(node.annotation, node),
-            value_lambda=value_lambda,
-        )
+    node_class = node.__class__
+    resolved_walkers = _resolved_walkers.get(converter.__class__)
+    if resolved_walkers is not None and node_class in resolved_walkers:
+        walker = resolved_walkers[node_class]
+    else:
+        walker = resolve_walker(converter.__class__, node_class)
 
-    elif isinstance(node, ast.Assign):
-        # if isinstance(node.value, ast.IfExp):
-        #     data = {'targets': node.targets, 'value': None}
-        #     walk(converter, node.value, for_ifexpr=data)
-        #     node.value = data['value']
-
-        def guess_annotation(expr_value):
-            if isinstance(expr_value, ast.Constant):
-                value = expr_value.value
-                if isinstance(value, bool):
-                    return 'bool'
-                elif isinstance(value, str):
-                    return 'string'
-                elif isinstance(value, float):
-                    return 'float'
-                elif isinstance(value, int):
-                    return 'int'
-
-        is_ann_assign = False
-        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
-            name = node.targets[0].id
-            level = len(converter.variables_data)
-            variable_data = converter.get_variable_data(name, level)
-            if not variable_data:
-                if isinstance(node.value, ast.Constant):
-                    is_ann_assign = True
-                    annotation = guess_annotation(node.value)
-                    converter.process_init_variable(
-                        name=name,
-                        value_expr=node.value,
-                        annotation=annotation,
-                        value_lambda=None,
-                    )
-                elif isinstance(node.value, ast.UnaryOp) and isinstance(node.value.operand, ast.Constant):
-                    is_ann_assign = True
-                    annotation = guess_annotation(node.value.operand)
-                    operator = convert_unary_op(node.value.op)
-                    if operator == '-':
-                        annotation = f'signed__{annotation}'
-                    elif operator == '!':
-                        annotation = 'bool'
-
-                    converter.process_init_variable(
-                        name=name,
-                        value_expr=node.value,
-                        annotation=annotation,
-                        value_lambda=None,
-                    )
-
-        if not is_ann_assign:
-            converter.process_assign_variable(
-                names=node.targets,
-                value=node.value,
-            )
+    if walker is None:
+        raise SourceCodeException(f'unknown node: {node_class.__name__}', node)
+
+    walker(converter, node, parent_node)
 
-    elif isinstance(node, ast.AugAssign):
-        converter.process_augassign_variable(
-            name=node.target,
+    if parents:
+        parents.pop()
+
+
+# Nodes which are walked at once in the iterative mode: they are leaves, or their output is inspected by the parent
+INLINE_NODE_CLASSES = (ast.Name, ast.Constant, ast.Attribute)
+
+
+def walk_iteratively(converter, node):
+    """
+    Walk the node using the explicit work stack instead of the recursion through the translator methods.
+    A statement is walked at once. An expression is deferred: a raw segment is written instead of the expression,
+    and the expression is walked into the segment after the walker of its parent returns.
+    The order of walking is the same as in `walk`, so the output is the same too.
+    """
+    if is_ignored_node(converter, node):
+        return
+
+    transit_data = converter.transit_data
+    work_stack = transit_data.setdefault('work_stack', [])
+    if (
+        isinstance(node, ast.expr)
+        and not isinstance(node, INLINE_NODE_CLASSES)
+        and not transit_data.get('inline_walks')
+    ):
+        parents = transit_data.setdefault('parents', [])
+        raw_segment = converter.write_segment()
+        work_stack.append((node, raw_segment, parents[-1] if parents else None))
+        return
+
+    work_stack_size = len(work_stack)
+    walk(converter, node)
+    work_stack[work_stack_size:] = reversed(work_stack[work_stack_size:])
+    while len(work_stack) > work_stack_size:
+        deferred_node, raw_segment, parent_node = work_stack.pop()
+        deferred_work_stack_size = len(work_stack)
+
+        parents = transit_data['parents']
+        raw_strings = converter.raw_strings
+        transit_data['parents'] = [parent_node] if parent_node else []
+        converter.raw_strings = raw_segment
+        walk_node(converter, deferred_node)
+        converter.raw_strings = raw_strings
+        transit_data['parents'] = parents
+
+        work_stack[deferred_work_stack_size:] = reversed(work_stack[deferred_work_stack_size:])
+
+
+@register_walker(ast.AnnAssign)
+def walk_ann_assign(converter, node, parent_node):
+    if isinstance(node.value, ast.Lambda):
+        lambda_node = node.value
+        args = [arg.arg for arg in lambda_node.args.args]
+        body = lambda_node.body
+        value_expr = None
+        value_lambda = (args, body)
+    else:
+        value_expr = node.value
+        value_lambda = None
+
+    converter.process_init_variable(
+        name=node.target.id,
+        value_expr=value_expr,
+        annotation=convert_annotation(node.annotation, node),
+        value_lambda=value_lambda,
+    )
+
+
+def guess_annotation(expr_value):
+    if isinstance(expr_value, ast.Constant):
+        value = expr_value.value
+        if isinstance(value, bool):
+            return 'bool'
+        elif isinstance(value, str):
+            return 'string'
+        elif isinstance(value, float):
+            return 'float'
+        elif isinstance(value, int):
+            return 'int'
+
+
+@register_walker(ast.Assign)
+def walk_assign(converter, node, parent_node):
+    # if isinstance(node.value, ast.IfExp):
+    #     data = {'targets': node.targets, 'value': None}
+    #     walk(converter, node.value, for_ifexpr=data)
+    #     node.value = data['value']
+
+    if (
+        len(node.targets) == 1
+        and isinstance(node.targets[0], ast.Tuple)
+        and isinstance(node.value, ast.Call)
+        and isinstance(node.value.func, ast.Name)
+        and converter.get_variable_data(node.value.func.id).get('multi_return')
+    ):
+        converter.process_unpack_call(targets=node.targets[0].elts, call=node.value)
+        return
+
+    is_ann_assign = False
+    if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+        name = node.targets[0].id
+        variable_data = converter.get_variable_data(name)
+        inferred_type = None if variable_data else converter.get_inferred_type(name)
+        if inferred_type:
+            is_ann_assign = True
+            converter.process_init_variable(
+                name=name,
+                value_expr=node.value,
+                annotation=inferred_type,
+                value_lambda=None,
+            )
+        elif not variable_data:
+            if isinstance(node.value, ast.Constant):
+                is_ann_assign = True
+                annotation = guess_annotation(node.value)
+                converter.process_init_variable(
+                    name=name,
+                    value_expr=node.value,
+                    annotation=annotation,
+                    value_lambda=None,
+                )
+            elif isinstance(node.value, ast.UnaryOp) and isinstance(node.value.operand, ast.Constant):
+                is_ann_assign = True
+                annotation = guess_annotation(node.value.operand)
+                operator = convert_unary_op(node.value.op)
+                if operator == '-':
+                    annotation = f'signed__{annotation}'
+                elif operator == '!':
+                    annotation = 'bool'
+
+                converter.process_init_variable(
+                    name=name,
+                    value_expr=node.value,
+                    annotation=annotation,
+                    value_lambda=None,
+                )
+
+    if not is_ann_assign:
+        converter.process_assign_variable(
+            names=node.targets,
             value=node.value,
-            operator=convert_op(node.op),
         )
 
-    elif isinstance(node, ast.FunctionDef):
-        pos_args = []
-        for index_arg, arg in enumerate(node.args.args):  # node.args is ast.arguments
-            ann_name = convert_annotation(arg.annotation, node)
-            pos_arg = (ann_name, arg.arg)
-            pos_args.append(pos_arg)
-
-        docstring_comment = ast.get_docstring(node)
-        if docstring_comment is not None:
-            node.body[0].custom_ignore = True
-            node.body[0].value.custom_ignore = True
-
-        converter.process_def_function(
-            name=node.name,
-            annotation=convert_annotation(node.returns, node),
-            pos_args=pos_args,
-            pos_args_defaults=node.args.defaults,
-            body=node.body,
-            docstring_comment=docstring_comment,
-        )
 
-    elif isinstance(node, ast.Call):  # TODO: обрабатывать другие виды аргуентов
-        converter.process_call_function(
-            name=node.func,
-            pos_args=node.args,
-        )
+@register_walker(ast.AugAssign)
+def walk_aug_assign(converter, node, parent_node):
+    converter.process_augassign_variable(
+        name=node.target,
+        value=node.value,
+        operator=convert_op(node.op),
+    )
 
-    elif isinstance(node, ast.Constant):
-        converter.process_constant(node.value, node)
 
-    elif isinstance(node, ast.Num):  # Deprecated since version 3.8
-        converter.process_constant(node.n, node)
+def get_function_signature(node) -> tuple:
+    """Return the annotation of the result and annotations with names of positional arguments"""
+    pos_args = []
+    for index_arg, arg in enumerate(node.args.args):  # node.args is ast.arguments
+        ann_name = convert_annotation(arg.annotation, node)
+        pos_arg = (ann_name, arg.arg)
+        pos_args.append(pos_arg)
 
-    elif isinstance(node, ast.Str):  # Deprecated since version 3.8
-        converter.process_constant(node.s, node)
+    if isinstance(node.returns, ast.Tuple):
+        annotation = tuple(convert_annotation(element, node) for element in node.returns.elts)
+    else:
+        annotation = convert_annotation(node.returns, node)
 
-    elif isinstance(node, ast.Name):
-        converter.process_name(node.id)
-        node.ctx.custom_ignore = True  # we ignore ast.Load, ast.Store and ast.Del
+    return annotation, pos_args
 
-    elif isinstance(node, (ast.Load, ast.Store, ast.Del)):
-        pass
 
-    elif isinstance(node, ast.Delete):
-        names = []
-        for target_node in node.targets:
-            names.append(target_node)
+@register_walker(ast.FunctionDef)
+def walk_function_def(converter, node, parent_node):
+    annotation, pos_args = get_function_signature(node)
+    docstring_comment = ast.get_docstring(node)
+    if docstring_comment is not None:
+        ignore_node(converter, node.body[0])
 
-        converter.process_delete_variable(names)
+    converter.process_def_function(
+        name=node.name,
+        annotation=annotation,
+        pos_args=pos_args,
+        pos_args_defaults=node.args.defaults,
+        body=node.body,
+        docstring_comment=docstring_comment,
+    )
 
-    elif isinstance(node, ast.BinOp):
-        is_need_brackets = isinstance(parent_node, (ast.BinOp, ast.UnaryOp))
-        converter.process_binary_op(
-            operand_left=node.left,
-            operator=convert_op(node.op),
-            operand_right=node.right,
-            is_need_brackets=is_need_brackets,
-        )
 
-    elif isinstance(node, ast.BoolOp):
-        is_need_brackets = isinstance(parent_node, (ast.BoolOp, ast.UnaryOp))
-        converter.process_bool_op(
-            operand_left=node.values[0],
-            operator=convert_bool_op(node.op),
-            operands_right=node.values[1:],
-            is_need_brackets=is_need_brackets,
-        )
+@register_walker(ast.Call)
+def walk_call(converter, node, parent_node):  # TODO: обрабатывать другие виды аргуентов
+    converter.process_call_function(
+        name=node.func,
+        pos_args=node.args,
+        keywords=node.keywords,
+    )
 
-    elif isinstance(node, ast.UnaryOp):
-        converter.process_unary_op(
-            operand=node.operand,
-            operator=convert_unary_op(node.op),
-        )
 
-    elif isinstance(node, ast.Return):
-        if isinstance(node.value, ast.Tuple):
-            converter.process_multi_return(expressions=node.value)
-        else:
-            converter.process_return(expression=node.value)
+@register_walker(ast.Constant)
+def walk_constant(converter, node, parent_node):
+    converter.process_constant(node.value, node)
 
-    elif isinstance(node, ast.NameConstant):  # New in version 3.4; Deprecated since version 3.8
-        if isinstance(node.value, bool):
-            converter.process_constant(node.value, node)
-        else:
-            walk(converter, node.value)
-
-    elif isinstance(node, ast.IfExp):
-        is_need_brackets = isinstance(parent_node, (ast.Call, ast.BoolOp))
-        converter.process_ifexpr(
-            condition=node.test,
-            body=node.body,
-            orelse=node.orelse,
-            is_need_brackets=is_need_brackets,
-        )
 
-    # Control flow
-
-    elif isinstance(node, ast.If):
-        ifelses = []
-        orelse = node.orelse
-        while orelse and len(orelse) == 1 and isinstance(orelse[0], ast.If):
-            ifelses.append((orelse[0].test, orelse[0].body))
-            orelse = orelse[0].orelse
-            node.orelse = None
-
-        converter.process_if(
-            condition=node.test,
-            body=node.body,
-            ifelses=ifelses,
-            orelse=orelse,
-        )
+@register_walker(ast.Name)
+def walk_name(converter, node, parent_node):
+    converter.process_name(node.id)
 
-    elif isinstance(node, ast.For):
-        if isinstance(node.target, ast.Name):
-            name = node.target.id
-        else:
-            raise Exception('Unsupported target of `for`!')
 
-        if isinstance(node.iter, ast.Call):
-            converter.process_for_function(name, node.body, node.iter.func.id, node.iter.args)
+@register_walker(ast.Load, ast.Store, ast.Del, ast.Pass, ast.Global)  # global variables are visible in C-functions
+def walk_nothing(converter, node, parent_node):
+    pass
+
+
+@register_walker(ast.Delete)
+def walk_delete(converter, node, parent_node):
+    names = []
+    for target_node in node.targets:
+        names.append(target_node)
+
+    converter.process_delete_variable(names)
+
+
+@register_walker(ast.BinOp)
+def walk_bin_op(converter, node, parent_node):
+    if fold_constant(converter, node, parent_node):
+        return
+
+    is_need_brackets = isinstance(parent_node, (ast.BinOp, ast.UnaryOp))
+    converter.process_binary_op(
+        operand_left=node.left,
+        operator=convert_op(node.op),
+        operand_right=node.right,
+        is_need_brackets=is_need_brackets,
+    )
+
+
+@register_walker(ast.BoolOp)
+def walk_bool_op(converter, node, parent_node):
+    is_need_brackets = isinstance(parent_node, (ast.BoolOp, ast.UnaryOp))
+    converter.process_bool_op(
+        operand_left=node.values[0],
+        operator=convert_bool_op(node.op),
+        operands_right=node.values[1:],
+        is_need_brackets=is_need_brackets,
+    )
+
+
+@register_walker(ast.UnaryOp)
+def walk_unary_op(converter, node, parent_node):
+    is_literal = isinstance(node.op, (ast.UAdd, ast.USub)) and isinstance(node.operand, ast.Constant)
+    if not is_literal and fold_constant(converter, node, parent_node):
+        return
+
+    converter.process_unary_op(
+        operand=node.operand,
+        operator=convert_unary_op(node.op),
+    )
+
+
+@register_walker(ast.Return)
+def walk_return(converter, node, parent_node):
+    if isinstance(node.value, ast.Tuple):
+        converter.process_multi_return(expressions=node.value)
+    else:
+        converter.process_return(expression=node.value)
+
+
+@register_walker(ast.IfExp)
+def walk_if_exp(converter, node, parent_node):
+    is_need_brackets = isinstance(parent_node, (ast.Call, ast.BoolOp))
+    converter.process_ifexpr(
+        condition=node.test,
+        body=node.body,
+        orelse=node.orelse,
+        is_need_brackets=is_need_brackets,
+    )
+
+
+# Control flow
+
+def get_constant_condition(converter, condition):
+    """Return the value of the constant condition or `NOT_CONSTANT`, if the dead code elimination is turned on"""
+    if not converter.config.get('eliminate_dead_code', True):
+        return NOT_CONSTANT
+
+    return get_constant_value(converter, condition)
+
+
+def walk_statements(converter, statements):
+    for statement in statements:
+        converter.walk(statement)
+
+
+@register_walker(ast.If)
+def walk_if(converter, node, parent_node):
+    condition = get_constant_condition(converter, node.test)
+    if condition is not NOT_CONSTANT:
+        removed_statements = node.orelse if condition else node.body
+        for statement in removed_statements:
+            warn_removed_code(statement, f'the condition is always {bool(condition)}')
+
+        walk_statements(converter, node.body if condition else node.orelse)
+        return
+
+    ifelses = []
+    orelse = node.orelse
+    while orelse and len(orelse) == 1 and isinstance(orelse[0], ast.If):
+        ifelses.append((orelse[0].test, orelse[0].body))
+        orelse = orelse[0].orelse
+
+    converter.process_if(
+        condition=node.test,
+        body=node.body,
+        ifelses=ifelses,
+        orelse=orelse,
+    )
+
+
+def get_target_names(target, count: int) -> list[str] | None:
+    if isinstance(target, ast.Tuple) and len(target.elts) == count:
+        if all(isinstance(element, ast.Name) for element in target.elts):
+            return [element.id for element in target.elts]
+
+
+@register_walker(ast.For)
+def walk_for(converter, node, parent_node):
+    target, iterator = node.target, node.iter
+    if isinstance(iterator, ast.Name) and isinstance(target, ast.Name):
+        converter.process_for_array([target.id], node.body, [iterator.id])
+        return
+
+    if not isinstance(iterator, ast.Call) or not isinstance(iterator.func, ast.Name):
+        raise SourceCodeException('Unsupported iter of `for`', node)
+
+    function_name, args = iterator.func.id, iterator.args
+    if function_name == 'enumerate':
+        names = get_target_names(target, 2)
+        if not names or not 1 <= len(args) <= 2 or not isinstance(args[0], ast.Name):
+            raise SourceCodeException('Only `for index, item in enumerate(array, start)` is supported', node)
+
+        index_start = args[1] if len(args) == 2 else None
+        converter.process_for_array(names[1:], node.body, [args[0].id], names[0], index_start)
+    elif function_name == 'zip':
+        names = get_target_names(target, len(args))
+        if not names or not all(isinstance(arg, ast.Name) for arg in args):
+            raise SourceCodeException('Only arrays can be zipped, items must be unpacked to names', node)
+
+        converter.process_for_array(names, node.body, [arg.id for arg in args])
+    elif isinstance(target, ast.Name):
+        converter.process_for_function(target.id, node.body, function_name, args)
+    else:
+        raise SourceCodeException('Unsupported target of `for`', node)
+
+
+@register_walker(ast.While)
+def walk_while(converter, node, parent_node):
+    condition = get_constant_condition(converter, node.test)
+    if condition is not NOT_CONSTANT and not condition:
+        for statement in node.body:
+            warn_removed_code(statement, 'the condition is always False')
+
+        walk_statements(converter, node.orelse)
+        return
+
+    has_while_orelse = converter.transit_data.setdefault('has_while_orelse', [])
+    has_while_orelse.append(bool(node.orelse))
+    converter.process_while(
+        condition=node.test,
+        body=node.body,
+        orelse=node.orelse,
+    )
+    has_while_orelse.pop()
+
+
+@register_walker(ast.Break)
+def walk_break(converter, node, parent_node):
+    has_while_orelse = converter.transit_data.setdefault('has_while_orelse', [])
+    converter.process_break(has_while_orelse[-1])
+
+
+@register_walker(ast.Continue)
+def walk_continue(converter, node, parent_node):
+    converter.process_continue()
+
+
+@register_walker(ast.Expr)
+def walk_expr(converter, node, parent_node):
+    if isinstance(node.value, ast.Constant) and isinstance(parent_node, ast.Module):
+        comment = node.value.value
+        if '\n' in comment:
+            converter.process_multiline_comment(comment)
         else:
-            raise Exception('Unsupported iter of `for`!')
-
-    elif isinstance(node, ast.While):
-        has_while_orelse.append(bool(node.orelse))
-        converter.process_while(
-            condition=node.test,
-            body=node.body,
-            orelse=node.orelse,
+            converter.process_one_comment(comment)
+    else:
+        converter.process_expression(
+            expression=node.value,
         )
-        has_while_orelse.pop()
-
-    elif isinstance(node, ast.Break):
-        converter.process_break(has_while_orelse[-1])
-
-    elif isinstance(node, ast.Continue):
-        converter.process_continue()
-
-    elif isinstance(node, ast.Expr):
-        if isinstance(node.value, (ast.Str, ast.Constant)) and isinstance(parent_node, ast.Module):
-            comment = ''
-            if isinstance(node.value, ast.Str):
-                comment = node.value.s
-            elif isinstance(node.value, ast.Constant):
-                comment = node.value.value
-
-            if '\n' in comment:
-                converter.process_multiline_comment(comment)
-            else:
-                converter.process_one_comment(comment)
-        else:
-            converter.process_expression(
-                expression=node.value,
-            )
 
-    elif isinstance(node, ast.Pass):
-        pass
 
-    elif isinstance(node, ast.Import):
-        converter.process_import([(node_name.name, node_name.asname) for node_name in node.names])
+@register_walker(ast.Import)
+def walk_import(converter, node, parent_node):
+    converter.process_import([(node_name.name, node_name.asname) for node_name in node.names])
 
-    elif isinstance(node, ast.ImportFrom):
-        names = [(alias.name, alias.asname) for alias in node.names]
-        converter.process_import_from(node.module, names, node.level)
 
-    elif isinstance(node, ast.Compare):
-        converter.process_compare(node.left, [convert_compare_op(op) for op in node.ops], node.comparators)
+@register_walker(ast.ImportFrom)
+def walk_import_from(converter, node, parent_node):
+    names = [(alias.name, alias.asname) for alias in node.names]
+    converter.process_import_from(node.module, names, node.level)
 
-    elif isinstance(node, ast.Attribute):
-        converter.process_attribute(node.value, node.attr)
 
-    elif isinstance(node, ast.Lambda):
-        pos_args = []
-        node.args.custom_ignore = True
-        for arg in node.args.args:  # node.args is ast.arguments
-            pos_args.append(arg.arg)
+@register_walker(ast.Compare)
+def walk_compare(converter, node, parent_node):
+    converter.process_compare(node.left, [convert_compare_op(op) for op in node.ops], node.comparators)
 
-        converter.process_lambda(pos_args, node.body)
 
-    # Subscripting
-    elif isinstance(node, ast.Subscript):
-        converter.process_subscript(node.value, node.slice)
+@register_walker(ast.Attribute)
+def walk_attribute(converter, node, parent_node):
+    converter.process_attribute(node.value, node.attr)
 
-    # elif isinstance(node, ast.Slice):
-    # elif isinstance(node, ast.ExtSlice):
 
-    # Top level nodes
-    elif isinstance(node, ast.Module):
-        for body_node in node.body:
-            walk(converter, body_node)
+@register_walker(ast.Lambda)
+def walk_lambda(converter, node, parent_node):
+    pos_args = []
+    for arg in node.args.args:  # node.args is ast.arguments
+        pos_args.append(arg.arg)
 
-    # elif isinstance(node, ast.Interactive):
-    # elif isinstance(node, ast.Expression):
+    converter.process_lambda(pos_args, node.body)
 
-    # Literals
-    elif isinstance(node, (ast.List, ast.Tuple)):
-        variable_name = None
-        if parent_node and isinstance(parent_node, ast.AnnAssign):
-            variable_name = parent_node.target.id
 
-        converter.process_array(node.elts, variable_name)
+# Subscripting
 
-    #     if isinstance(parent_node, ast.Return):
-    #         converter.process_multi_return(expressions=node.elts)
-    #     else:
-    #         raise SourceCodeException(f'unknown node: {node.__class__.__name__}', node)
+@register_walker(ast.Subscript)
+def walk_subscript(converter, node, parent_node):
+    converter.process_subscript(node.value, node.slice)
 
-    else:
-        raise SourceCodeException(f'unknown node: {node.__class__.__name__}', node)
 
-    if parents:
-        parents.pop()
+# elif isinstance(node, ast.Slice):
+# elif isinstance(node, ast.ExtSlice):
 
+# Top level nodes
 
-def translate(translator, source_code: str, save_result=True):
-    translator._walk = walk
-    tree = ast.parse(source_code, feature_version=(3, 8))
-    walk(translator, tree)
+@register_walker(ast.Module)
+def walk_module(converter, node, parent_node):
+    """The module is analyzed by one pass before it is walked"""
+    analysis = analyze_body(node.body)
+    converter.transit_data['scopes'] = analysis.scopes
+    if converter.config.get('eliminate_dead_code', True):
+        for statement in analysis.unreachable_statements:
+            ignore_node(converter, statement)
+            warn_removed_code(statement, 'it follows return, break, continue or raise')
+
+    for body_node in node.body:
+        if isinstance(body_node, ast.FunctionDef):
+            annotation, pos_args = get_function_signature(body_node)
+            converter.declare_function(body_node.name, annotation, pos_args, body_node.args.defaults, body_node.body)
+
+    for body_node in node.body:
+        walk(converter, body_node)
+
+
+# elif isinstance(node, ast.Interactive):
+# elif isinstance(node, ast.Expression):
+
+# Literals
+
+@register_walker(ast.List, ast.Tuple)
+def walk_array(converter, node, parent_node):
+    variable_name = None
+    if parent_node and isinstance(parent_node, ast.AnnAssign):
+        variable_name = parent_node.target.id
+
+    converter.process_array(node.elts, variable_name)
+
+#     if isinstance(parent_node, ast.Return):
+#         converter.process_multi_return(expressions=node.elts)
+#     else:
+#         raise SourceCodeException(f'unknown node: {node.__class__.__name__}', node)
+
+
+def translate_tree(translator, tree, save_result=True):
+    """Translate AST. The tree is not changed, so it may be translated again"""
+    translator.transit_data['ignored_nodes'] = set()
+    translator.transit_data['constant_values'] = {}
+    translator.transit_data['operand_types'] = {}
+    translator.transit_data['temporaries_count'] = 0
+    translator.transit_data['declared_functions'] = {}  # data of functions by ids of their bodies
+    translator.transit_data['scopes'] = {}  # analyses of scopes by ids of their bodies
+    translator.read_modules = []
+    translator.folded_constants = []
+    translator._walk = walk_iteratively if translator.config.get('iterative_walk') else walk
+    translator._walk(translator, tree)
     if save_result:
         translator.save()
+
+
+PARSED_TREES_MAX_COUNT = 64
+_parsed_trees = OrderedDict()
+
+
+def parse(source_code: str):
+    """Parse the source code. Trees are not changed by translating, so the recently parsed trees are reused"""
+    tree = _parsed_trees.get(source_code)
+    if tree is None:
+        tree = ast.parse(source_code, feature_version=(3, 8))
+        _parsed_trees[source_code] = tree
+        if len(_parsed_trees) > PARSED_TREES_MAX_COUNT:
+            _parsed_trees.popitem(last=False)
+    else:
+        _parsed_trees.move_to_end(source_code)
+
+    return tree
+
+
+def translate(translator, source_code: str, save_result=True):
+    translate_tree(translator, parse(source_code), save_result)
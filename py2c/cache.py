@@ -0,0 +1,84 @@
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+from py2c import __version__
+
+DEFAULT_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+
+def make_key(*parts: str) -> str:
+    """Build a key by the content. Versions of Py2C and Python are the part of the key"""
+    hasher = hashlib.sha256()
+    for part in (__version__, sys.version, *parts):
+        hasher.update(part.encode('utf-8'))
+        hasher.update(b'\0')
+
+    return hasher.hexdigest()
+
+
+class FileCache:
+    """
+    Persistent cache of pickled objects. A file of the cache is touched when it is read,
+    so the least recently used files are removed first when the size of the cache exceeds `max_size`.
+    """
+    FILE_SUFFIX = '.pickle'
+
+    def __init__(self, directory: Path | str, max_size: int = DEFAULT_CACHE_MAX_SIZE, namespace: str = ''):
+        self.directory = Path(directory) / namespace
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config: dict, namespace: str):
+        """Build the cache by the translator's config. Returns None if `cache_dir` is not set"""
+        cache_dir = config.get('cache_dir')
+        if not cache_dir:
+            return None
+
+        return cls(cache_dir, config.get('cache_max_size', DEFAULT_CACHE_MAX_SIZE), namespace)
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / f'{key}{self.FILE_SUFFIX}'
+
+    def get(self, key: str, default=None):
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                value = pickle.load(cache_file)
+
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return default
+
+        return value
+
+    def set(self, key: str, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile('wb', dir=self.directory, suffix='.tmp', delete=False) as temp_file:
+            pickle.dump(value, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_file.name, self.get_path(key))  # the replacing is atomic, so parallel processes are safe
+        self.evict()
+
+    def evict(self):
+        files = []
+        size = 0
+        for path in self.directory.glob(f'*{self.FILE_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, path))
+            size += stat.st_size
+
+        files.sort()
+        for _, file_size, path in files:
+            if size <= self.max_size:
+                break
+
+            path.unlink(missing_ok=True)
+            size -= file_size
@@ -1,17 +1,152 @@
+import ast
+import sys
 from argparse import ArgumentParser
 from pathlib import Path
-from sys import stdout
 
+from py2c.build import build
 from py2c.bytecode_walker import translate
+from py2c.depfile import get_default_depfile_path, write_depfile
+from py2c.extension import build_extension
+from py2c.manifest import build_manifest, is_up_to_date, open_output, write_manifest
+from py2c.module_interface import get_transitive_dependencies
+from py2c.server import get_default_socket_path, serve_socket, serve_stream
 from py2c.translator_cpp import TranslatorC
 
 
-def trans(python_source_code, write_to):
-    translator = TranslatorC(save_to=write_to)
+def trans(python_source_code, write_to, config=None):
+    translator = TranslatorC(save_to=write_to, config=config)
     translate(translator, python_source_code)
+    return translator
 
 
-def run():
+def print_debug_listing(input_filepath: Path, translator: TranslatorC):
+    for node, value in translator.folded_constants:
+        print(
+            f'{input_filepath}:{node.lineno}:{node.col_offset}: `{ast.unparse(node)}` is folded to {value}',
+            file=sys.stderr,
+        )
+
+
+def add_common_arguments(parser: ArgumentParser):
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        type=Path,
+        help='A directory to keep the persistent cache in',
+    )
+    parser.add_argument(
+        '-f',
+        '--force',
+        action='store_true',
+        help='If set, c-files are translated even if their manifests show that they are up to date',
+    )
+
+
+def run_build(argv: list[str]):
+    parser = ArgumentParser(
+        prog='py2c build',
+        description='The program translates all python-modules of the directory to c-syntax',
+    )
+    parser.add_argument('source_dir', type=Path, help='A directory with python files to compile')
+    parser.add_argument(
+        '-o',
+        '--output-dir',
+        default=None,
+        type=Path,
+        help='A directory for output c-files. If absent, c-files are written near python files',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        default=None,
+        type=int,
+        help='A count of parallel processes. If absent, it is the count of CPUs',
+    )
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {'cache_dir': args.cache_dir} if args.cache_dir else {}
+    report = build(args.source_dir, args.output_dir, args.jobs, config, force=args.force)
+    print(report)
+    if report.errors:
+        sys.exit(1)
+
+
+def run_build_ext(argv: list[str]):
+    parser = ArgumentParser(
+        prog='py2c build-ext',
+        description='The program compiles the python-module into a shared library and writes an importable wrapper',
+    )
+    parser.add_argument('module', type=Path, help='A python file to compile')
+    parser.add_argument(
+        '-o',
+        '--output-dir',
+        default=None,
+        type=Path,
+        help='A directory for the library and the wrapper. If absent, they are written near the python file',
+    )
+    parser.add_argument(
+        '-m',
+        '--modules-dir',
+        default=None,
+        type=Path,
+        help='A directory to search imported python modules in',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        type=Path,
+        help='A directory to keep the persistent cache in',
+    )
+    args = parser.parse_args(argv)
+    config = {}
+    if args.modules_dir:
+        config['modules_dir'] = args.modules_dir
+
+    if args.cache_dir:
+        config['cache_dir'] = args.cache_dir
+
+    library_path, wrapper_path = build_extension(args.module, args.output_dir, config)
+    print(f'{library_path}\n{wrapper_path}')
+
+
+def run_serve(argv: list[str]):
+    parser = ArgumentParser(
+        prog='py2c serve',
+        description='The program keeps translators warm and translates requests of `py2c-client`',
+    )
+    parser.add_argument(
+        '-s',
+        '--socket',
+        default=None,
+        type=Path,
+        help='A path of Unix socket to listen. If absent, $PY2C_SOCKET or a path in the temporary directory is used',
+    )
+    parser.add_argument(
+        '--stdin',
+        action='store_true',
+        help='If set, requests are read from stdin and responses are written to stdout as JSON-lines',
+    )
+    args = parser.parse_args(argv)
+    if args.stdin:
+        serve_stream(sys.stdin, sys.stdout)
+    else:
+        serve_socket(args.socket or get_default_socket_path())
+
+
+def run(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['build']:
+        run_build(argv[1:])
+        return
+
+    if argv[:1] == ['build-ext']:
+        run_build_ext(argv[1:])
+        return
+
+    if argv[:1] == ['serve']:
+        run_serve(argv[1:])
+        return
+
     parser = ArgumentParser(
         prog='Py2C translator',
         description='The program translates python-syntax to c-syntax',
@@ -36,6 +171,35 @@ def run():
         action='store_true',
         help='If set, the program will print a output in console and output argument will be ignored',
     )
+    parser.add_argument(
+        '-m',
+        '--modules-dir',
+        default=None,
+        type=Path,
+        help='A directory to search imported python modules in',
+    )
+    parser.add_argument(
+        '-MD',
+        dest='write_depfile',
+        action='store_true',
+        help=(
+            'If set, a depfile <output-base-filename>.d is written. It lists modules from modules-dir, which are '
+            'imported directly or through another modules'
+        ),
+    )
+    parser.add_argument(
+        '-MF',
+        dest='depfile',
+        default=None,
+        type=Path,
+        help='A filename for the depfile. It implies -MD',
+    )
+    parser.add_argument(
+        '--debug-listing',
+        action='store_true',
+        help='If set, folded constant expressions are listed in stderr',
+    )
+    add_common_arguments(parser)
     parser.add_argument(
         '-v',
         '--version',
@@ -44,21 +208,48 @@ def run():
         help='shows version info of Py2C',
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     input_filepath = args.input[0]
     with open(input_filepath) as input_file:
         python_source_code = input_file.read()
 
+    config = {}
+    if args.modules_dir:
+        config['modules_dir'] = args.modules_dir
+
+    if args.cache_dir:
+        config['cache_dir'] = args.cache_dir
+
     if args.print:
-        trans(python_source_code, stdout)
+        translator = trans(python_source_code, sys.stdout, config)
+        if args.debug_listing:
+            print_debug_listing(input_filepath, translator)
+
         return
 
     output_filepath = args.output
     if not output_filepath:
         output_filepath = input_filepath.parent / f'{input_filepath.stem}.c'
 
-    with open(output_filepath, 'w') as output_file:
-        trans(python_source_code, output_file)
+    depfile_path = args.depfile
+    if args.write_depfile and not depfile_path:
+        depfile_path = get_default_depfile_path(output_filepath)
+
+    manifest = build_manifest(input_filepath, python_source_code, config)
+    if not args.force and is_up_to_date(output_filepath, manifest):
+        if not depfile_path or depfile_path.exists():
+            return
+
+    with open_output(output_filepath) as output_file:
+        translator = trans(python_source_code, output_file, config)
+
+    write_manifest(output_filepath, manifest)
+    if args.debug_listing:
+        print_debug_listing(input_filepath, translator)
+
+    if depfile_path:
+        dependencies = get_transitive_dependencies(python_source_code, config.get('modules_dir'))
+        write_depfile(depfile_path, output_filepath, [input_filepath, *dependencies])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,54 @@
+"""
+Thin client of `py2c serve`. It is started by a build system for every file, so only light modules are imported:
+the translator is imported only if the server is not running and the command is run in this process
+"""
+import json
+import os
+import socket
+import sys
+
+TEMP_DIR_VARIABLES = ('TMPDIR', 'TEMP', 'TMP')
+DEFAULT_TEMP_DIR = '/tmp'
+
+
+def get_default_socket_path() -> str:
+    """`tempfile.gettempdir` is not used, because importing of `tempfile` is longer than the request to the server"""
+    socket_path = os.environ.get('PY2C_SOCKET')
+    if socket_path:
+        return socket_path
+
+    temp_dir = next(
+        (os.environ[variable] for variable in TEMP_DIR_VARIABLES if os.environ.get(variable)),
+        DEFAULT_TEMP_DIR,
+    )
+    user_id = os.getuid() if hasattr(os, 'getuid') else 'user'
+    return os.path.join(temp_dir, f'py2c-{user_id}.sock')
+
+
+def request_server(request: dict, socket_path) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        client_socket.connect(str(socket_path))
+        with client_socket.makefile('rwb') as stream:
+            stream.write(json.dumps(request, ensure_ascii=False).encode('utf-8'))
+            stream.write(b'\n')
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def run_client(argv: list[str] | None = None):
+    """
+    Client has the same arguments as `py2c`. The command is run by the server if it is running,
+    otherwise the command is run in this process
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        response = request_server({'argv': argv, 'cwd': os.getcwd()}, get_default_socket_path())
+    except (OSError, ValueError):
+        from py2c.cli import run
+        run(argv)
+        return
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    if response['returncode']:
+        sys.exit(response['returncode'])
@@ -0,0 +1,207 @@
+"""
+Folding of constant expressions. The tree is not changed: values of constant subtrees are computed while walking,
+and the walker writes the value instead of the expression.
+Python semantics is kept where it differs from C (floor division, modulo of negative numbers), then the value is
+wrapped to the declared integer type like C does by the conversion
+"""
+import ast
+import math
+import operator
+
+NOT_CONSTANT = object()
+MAX_INTEGER_BITS = 64
+
+BINARY_OPERATIONS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+UNARY_OPERATIONS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Invert: operator.invert,
+    ast.Not: lambda value: int(not value),
+}
+# bits and signedness of integer types, which have the same width on all platforms
+FIXED_INTEGER_TYPES = {
+    'bool': (1, False),
+    'int8_t': (8, True),
+    'uint8_t': (8, False),
+    'signed char': (8, True),
+    'unsigned char': (8, False),
+    'byte': (8, False),
+    'unsigned byte': (8, False),
+    'int16_t': (16, True),
+    'uint16_t': (16, False),
+    'short': (16, True),
+    'signed short': (16, True),
+    'unsigned short': (16, False),
+    'int32_t': (32, True),
+    'uint32_t': (32, False),
+    'int64_t': (64, True),
+    'uint64_t': (64, False),
+    'long long': (64, True),
+    'unsigned long long': (64, False),
+}
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+def compute_binary_operation(operation_class, left, right):
+    if not is_number(left) or not is_number(right):
+        return NOT_CONSTANT
+
+    is_integer = isinstance(left, int) and isinstance(right, int)
+    if operation_class is ast.Div and is_integer:
+        return NOT_CONSTANT  # C divides integers as integers, Python does not
+
+    if operation_class in (ast.LShift, ast.RShift) and not 0 <= right <= MAX_INTEGER_BITS:
+        return NOT_CONSTANT
+
+    if operation_class is ast.Pow and is_integer and not 0 <= right <= MAX_INTEGER_BITS:
+        return NOT_CONSTANT
+
+    try:
+        value = BINARY_OPERATIONS[operation_class](left, right)
+    except (ArithmeticError, TypeError, ValueError):
+        return NOT_CONSTANT
+
+    return value if is_representable(value) else NOT_CONSTANT
+
+
+def compute_unary_operation(operation_class, operand):
+    if not is_number(operand) or (operation_class is ast.Invert and not isinstance(operand, int)):
+        return NOT_CONSTANT
+
+    return UNARY_OPERATIONS[operation_class](operand)
+
+
+def is_representable(value) -> bool:
+    if isinstance(value, int):
+        return value.bit_length() <= MAX_INTEGER_BITS
+
+    return isinstance(value, float) and math.isfinite(value)
+
+
+def get_leaf_value(converter, node):
+    if isinstance(node, ast.Constant):
+        return node.value if is_number(node.value) else NOT_CONSTANT
+
+    if isinstance(node, ast.Name):
+        variable_data = converter.get_variable_data(node.id)
+        if variable_data.get('type') == 'preproc' and is_number(variable_data.get('value')):
+            return variable_data['value']
+
+    return NOT_CONSTANT
+
+
+def get_constant_value(converter, node, values: dict | None = None):
+    """
+    Return the value of the constant expression or `NOT_CONSTANT`. Values of subtrees are remembered by the translator
+    (or in `values`), and the tree is walked by the explicit stack, so long expressions are computed once and without
+    the recursion
+    """
+    if values is None:
+        values = converter.transit_data.setdefault('constant_values', {})
+
+    value = values.get(id(node))
+    if value is not None:
+        return value  # operands are walked after their parent, so their values are computed already
+
+    stack = [node]
+    while stack:
+        current_node = stack[-1]
+        if id(current_node) in values:
+            stack.pop()
+            continue
+
+        if isinstance(current_node, ast.BinOp) and type(current_node.op) in BINARY_OPERATIONS:
+            operands = (current_node.left, current_node.right)
+        elif isinstance(current_node, ast.UnaryOp) and type(current_node.op) in UNARY_OPERATIONS:
+            operands = (current_node.operand,)
+        else:
+            values[id(current_node)] = get_leaf_value(converter, current_node)
+            stack.pop()
+            continue
+
+        not_computed_operands = [operand for operand in operands if id(operand) not in values]
+        if not_computed_operands:
+            stack.extend(reversed(not_computed_operands))
+            continue
+
+        operand_values = [values[id(operand)] for operand in operands]
+        if NOT_CONSTANT in operand_values:
+            value = NOT_CONSTANT
+        elif isinstance(current_node, ast.BinOp):
+            value = compute_binary_operation(type(current_node.op), *operand_values)
+        else:
+            value = compute_unary_operation(type(current_node.op), *operand_values)
+
+        values[id(current_node)] = value
+        stack.pop()
+
+    return values[id(node)]
+
+
+def wrap_integer(value: int, c_type: str | None) -> int:
+    """Convert the value to the integer type like C does"""
+    if c_type not in FIXED_INTEGER_TYPES:
+        return value
+
+    if c_type == 'bool':
+        return int(bool(value))
+
+    bits, is_signed = FIXED_INTEGER_TYPES[c_type]
+    value &= (1 << bits) - 1
+    if is_signed and value >> (bits - 1):
+        value -= 1 << bits
+
+    return value
+
+
+def get_declared_type(converter, node, parent_node) -> str | None:
+    """Return the C-type of the variable or of the function result, which the expression is assigned to"""
+    if isinstance(parent_node, ast.AnnAssign) and parent_node.value is node:
+        annotation = parent_node.annotation
+        if isinstance(annotation, ast.Name):
+            return converter.parse_annotation(annotation.id).type
+
+        if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+            return converter.parse_annotation(annotation.value).type
+    elif isinstance(parent_node, ast.Assign) and parent_node.value is node:
+        target = parent_node.targets[0]
+        if isinstance(target, ast.Name):
+            return converter.get_variable_data(target.id).get('type')
+    elif isinstance(parent_node, ast.Return) and converter.current_function_names:
+        return converter.get_variable_data(converter.current_function_name).get('annotation')
+
+
+def fold_constant(converter, node, parent_node) -> bool:
+    """Write the value instead of the constant expression. Returns `True` if the expression is folded"""
+    if not converter.config.get('fold_constants', True):
+        return False
+
+    value = get_constant_value(converter, node)
+    if value is NOT_CONSTANT:
+        return False
+
+    if isinstance(value, int):
+        value = wrap_integer(value, get_declared_type(converter, node, parent_node))
+
+    converter.folded_constants.append((node, value))
+    is_need_brackets = value < 0 and isinstance(parent_node, (ast.BinOp, ast.UnaryOp))
+    converter.write_lbracket(is_need_brackets)
+    converter.process_constant(value, parent_node)
+    converter.write_rbracket(is_need_brackets)
+    return True
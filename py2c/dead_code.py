@@ -0,0 +1,30 @@
+"""
+Search of unreachable code: statements after `return`, `break`, `continue` and `raise` in the same block.
+Branches with constant conditions are removed by walkers of `if` and `while`, because the kept branch is written instead
+of the statement
+"""
+import ast
+import warnings
+
+from py2c.exceptions import DeadCodeWarning
+
+TERMINATOR_NODE_CLASSES = (ast.Return, ast.Break, ast.Continue, ast.Raise)
+STATEMENTS_FIELDS = ('body', 'orelse', 'finalbody')
+
+
+def get_unreachable_statements(statements: list) -> list:
+    """Return statements of the block, which follow a terminator"""
+    for index, statement in enumerate(statements[:-1]):
+        if isinstance(statement, TERMINATOR_NODE_CLASSES):
+            return statements[index + 1:]
+
+    return []
+
+
+def warn_removed_code(node, reason: str):
+    warnings.warn_explicit(
+        DeadCodeWarning(f'Unreachable code is removed ({reason})', node),
+        DeadCodeWarning,
+        '<source code>',
+        node.lineno,
+    )
@@ -0,0 +1,24 @@
+"""Depfile in the format of Make, which is understood by Ninja too. It is like a depfile of `gcc -MD`"""
+from pathlib import Path
+
+
+def escape_path(path: Path | str) -> str:
+    return str(path).replace(' ', '\\ ').replace('#', '\\#').replace('$', '$$')
+
+
+def get_default_depfile_path(output_path: Path) -> Path:
+    return output_path.with_suffix('.d')
+
+
+def write_depfile(depfile_path: Path, target_path: Path, dependency_paths: list[Path]):
+    """
+    Write the rule: the target depends on the dependencies.
+    Phony rules of imported modules are written like by `gcc -MP`, so Make does not fail when a module is removed
+    """
+    dependencies = ' \\\n  '.join(escape_path(path) for path in dependency_paths)
+    lines = [f'{escape_path(target_path)}: {dependencies}\n']
+    for path in dependency_paths[1:]:
+        lines.append(f'\n{escape_path(path)}:\n')
+
+    with open(depfile_path, 'w') as depfile:
+        depfile.writelines(lines)
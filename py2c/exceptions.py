@@ -1,3 +1,6 @@
+import ast
+
+
 class SourceCodeException(Exception):
     def __init__(self, message, node):
         lineno = node.lineno if hasattr(node, 'lineno') else None
@@ -6,6 +9,10 @@ class SourceCodeException(Exception):
         message = f'{message}! Line: {lineno}/{col_offset} Name: {name}'
         super().__init__(message)
 
+    def __reduce__(self):
+        """The exception is passed from a worker of `py2c build` with the formatted message only"""
+        return Exception.__new__, (self.__class__, *self.args)
+
 
 class InvalidAnnotationException(SourceCodeException):
     pass
@@ -21,3 +28,15 @@ class LambdaIsNotAllowedHereException(SourceCodeException):
 
 class TranslateAlgorythmException(Exception):
     pass
+
+
+class CompilationException(Exception):
+    pass
+
+
+class DeadCodeWarning(UserWarning):
+    def __init__(self, message, node):
+        lineno = node.lineno if hasattr(node, 'lineno') else None
+        col_offset = node.col_offset if hasattr(node, 'col_offset') else '-'
+        message = f'{message}! Line: {lineno}/{col_offset} Code: {ast.unparse(node).splitlines()[0]}'
+        super().__init__(message)
@@ -0,0 +1,158 @@
+"""
+Native extension of a whole module: the module is translated into one shared library, and an importable wrapper
+exposes top-level functions and global variables of the library. Names starting with `_` are not exposed.
+Arguments and results of exposed functions must be annotated by types, which can be passed through `ctypes`
+"""
+import ast
+import os
+import shutil
+from io import StringIO
+from pathlib import Path
+
+from py2c import native
+from py2c.bytecode_walker import convert_annotation, translate_tree
+from py2c.exceptions import CompilationException, InvalidAnnotationException, NoneIsNotAllowedException
+from py2c.translator_c import TranslatorC
+
+WRAPPER_SUFFIX = '_native'
+
+
+def get_library_path(module_path: Path, output_dir: Path | None = None) -> Path:
+    """`lib` prefix is used, because the `.so` file named as the module is imported by Python instead of it"""
+    return (output_dir or module_path.parent) / f'lib{module_path.stem}{native.LIBRARY_SUFFIX}'
+
+
+def get_wrapper_path(module_path: Path, output_dir: Path | None = None) -> Path:
+    return (output_dir or module_path.parent) / f'{module_path.stem}{WRAPPER_SUFFIX}.py'
+
+
+def is_exposed_function(node) -> bool:
+    return isinstance(node, ast.FunctionDef) and not node.name.startswith('_')
+
+
+def get_exposed_function_types(node) -> tuple[list[str], list[int | None], str]:
+    """Return types of the exposed function like `native.get_function_types`. All of them must be known for C"""
+    for arg in node.args.args:
+        if arg.annotation is None:
+            raise CompilationException(
+                f'The argument `{arg.arg}` of the exposed function `{node.name}` is not annotated',
+            )
+
+    if isinstance(node.returns, ast.Tuple):
+        raise CompilationException(f'The exposed function `{node.name}` returns several values')
+
+    try:
+        arg_types, array_lengths, return_type = native.get_function_types(node)
+    except (InvalidAnnotationException, NoneIsNotAllowedException) as exception:
+        raise CompilationException(f'Invalid annotation of the exposed function `{node.name}`: {exception}')
+
+    for arg, arg_type in zip(node.args.args, arg_types):
+        try:
+            native.get_ctype(arg_type)
+        except CompilationException as exception:
+            raise CompilationException(f'The argument `{arg.arg}` of the exposed function `{node.name}`: {exception}')
+
+    try:
+        native.get_ctype(return_type)
+    except CompilationException as exception:
+        raise CompilationException(f'The result of the exposed function `{node.name}`: {exception}')
+
+    return arg_types, array_lengths, return_type
+
+
+def get_exposed_variable(node) -> tuple[str, str] | None:
+    """Return the name and the C-type of the global variable, which can be shared by `ctypes`"""
+    if not isinstance(node, ast.AnnAssign) or not isinstance(node.target, ast.Name):
+        return
+
+    c_type = native.parse_arg_annotation(convert_annotation(node.annotation, node))[0]
+    if c_type in native.CTYPES and c_type != 'void' and not node.target.id.startswith('_'):
+        return node.target.id, c_type
+
+
+def translate_module(tree: ast.Module, config: dict | None = None) -> str:
+    """Arguments of exposed functions are annotated by C-types, so arrays and links are passed as pointers"""
+    body = []
+    for node in tree.body:
+        if is_exposed_function(node):
+            node = native.annotate_function(node, get_exposed_function_types(node)[0])
+
+        body.append(node)
+
+    c_code = StringIO()
+    translate_tree(TranslatorC(save_to=c_code, config=config), ast.Module(body=body, type_ignores=[]))
+    return c_code.getvalue()
+
+
+def build_wrapper(tree: ast.Module, module_name: str, library_name: str) -> str:
+    lines = [
+        f'"""Native version of `{module_name}` module. It is generated by `py2c build-ext`, do not edit it"""\n',
+        'import ctypes\n',
+        'from pathlib import Path\n',
+        '\n',
+        'from py2c import native\n',
+        '\n',
+        f'_library_path = Path(__file__).with_name({library_name!r})\n',
+        '_library = ctypes.CDLL(str(_library_path))\n',
+    ]
+    for node in tree.body:
+        variable = get_exposed_variable(node)
+        if variable:
+            name, c_type = variable
+            lines.append(f'{name} = native.get_ctype({c_type!r}).in_dll(_library, {name!r})\n')
+
+    for node in tree.body:
+        if not is_exposed_function(node):
+            continue
+
+        arg_types, array_lengths, return_type = get_exposed_function_types(node)
+        arguments = ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg.arg) for arg in node.args.args],
+            defaults=node.args.defaults,
+            kwonlyargs=[],
+            kw_defaults=[],
+        )
+        arg_names = ''.join(f'{arg.arg}, ' for arg in node.args.args)
+        lines.extend([
+            '\n',
+            '\n',
+            f'_{node.name} = native.load_function(\n',
+            '    _library_path,\n',
+            f'    {node.name!r},\n',
+            f'    [native.get_ctype(arg_type) for arg_type in {tuple(arg_types)!r}],\n',
+            f'    native.get_ctype({return_type!r}),\n',
+            ')\n',
+            '\n',
+            '\n',
+            f'def {node.name}({ast.unparse(arguments)}):\n',
+        ])
+        docstring = ast.get_docstring(node)
+        if docstring:
+            lines.append(f'    {docstring!r}\n')
+
+        lines.append(
+            f'    return native.call_native(_{node.name}, ({arg_names}), {tuple(arg_types)!r}, {tuple(array_lengths)!r})\n',
+        )
+
+    return ''.join(lines)
+
+
+def build_extension(
+        module_path: Path,
+        output_dir: Path | None = None,
+        config: dict | None = None,
+) -> tuple[Path, Path]:
+    """Compile the module into the shared library and write its wrapper. Returns paths of them"""
+    source_code = module_path.read_text(encoding='utf-8')
+    tree = ast.parse(source_code)
+    cached_library_path = native.compile_library(translate_module(tree, config))
+
+    library_path = get_library_path(module_path, output_dir)
+    wrapper_path = get_wrapper_path(module_path, output_dir)
+    library_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_library_path = library_path.with_name(f'{library_path.name}.tmp')
+    shutil.copyfile(cached_library_path, temp_library_path)
+    os.replace(temp_library_path, library_path)
+    wrapper_path.write_text(build_wrapper(tree, module_path.stem, library_path.name), encoding='utf-8')
+    return library_path, wrapper_path
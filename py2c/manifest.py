@@ -0,0 +1,60 @@
+"""
+Manifest of an output c-file keeps hashes of the input python-file, of the modules imported by it directly
+or through another modules, and the config of the translator. The translation is skipped if they are not changed.
+"""
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from py2c import __version__
+from py2c.module_interface import get_dependencies_hashes, get_source_hash
+
+MANIFEST_SUFFIX = '.py2c.json'
+
+
+def get_manifest_path(output_path: Path) -> Path:
+    return output_path.with_name(f'{output_path.name}{MANIFEST_SUFFIX}')
+
+
+def build_manifest(input_path: Path, source_code: str, config: dict) -> dict:
+    return {
+        'py2c_version': __version__,
+        'input': {str(input_path): get_source_hash(source_code)},
+        'dependencies': get_dependencies_hashes(source_code, config.get('modules_dir')),
+        'config': json.loads(json.dumps(config, default=str, sort_keys=True)),
+    }
+
+
+def read_manifest(output_path: Path) -> dict | None:
+    try:
+        with open(get_manifest_path(output_path), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(output_path: Path, manifest: dict):
+    with open(get_manifest_path(output_path), 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+@contextmanager
+def open_output(output_path: Path):
+    """
+    Open a temporary file for the output. It replaces the output file only if the translation succeeds,
+    so a failed translation keeps the previous output, which matches its manifest
+    """
+    temp_output_path = output_path.with_name(f'{output_path.name}.tmp')
+    try:
+        with open(temp_output_path, 'w') as output_file:
+            yield output_file
+    except BaseException:
+        temp_output_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(temp_output_path, output_path)
+
+
+def is_up_to_date(output_path: Path, manifest: dict) -> bool:
+    return output_path.is_file() and read_manifest(output_path) == manifest
@@ -0,0 +1,167 @@
+"""
+Interface of a module is the compact artifact with the symbols of the module: variables with their annotations
+and array sizes, preproc constants and functions. Importers load the interface instead of translating the module.
+The interface is regenerated only when the source code of the module, of the modules imported by it
+or the config is changed.
+
+Interfaces are kept in `cache_dir` if it is set in the config, otherwise in `__py2c__` directory near the module
+like `__pycache__`.
+"""
+import ast
+import hashlib
+import json
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+from py2c import __version__
+from py2c.cache import FileCache, make_key
+
+INTERFACES_DIR_NAME = '__py2c__'
+
+_loaded_interfaces = {}
+
+
+def get_source_hash(source_code: str) -> str:
+    return hashlib.sha256(source_code.encode('utf-8')).hexdigest()
+
+
+def get_config_hash(config: dict) -> str:
+    """Symbols depend on the config (e.g. `multi_return`), so interfaces are built for the config of the importer"""
+    return get_source_hash(json.dumps(config, default=str, sort_keys=True))
+
+
+def get_imported_module_names(tree) -> set[str]:
+    """Names of imported modules are resolved like `TranslatorC.process_import` and `process_import_from` do"""
+    module_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names.update(alias.name.replace('.', '/') for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            module_names.add(node.module.replace('.', '/'))
+
+    return module_names
+
+
+def find_module_path(module_name: str, modules_dir: Path | None) -> Path | None:
+    if modules_dir:
+        module_path = Path(modules_dir) / f'{module_name}.py'
+        if module_path.is_file():
+            return module_path
+
+
+def read_transitive_dependencies(source_code: str, modules_dir: Path | None) -> dict[Path, str]:
+    """Source codes of modules which are imported by the source code directly or through another modules"""
+    from py2c.bytecode_walker import parse
+
+    dependencies = {}
+    source_codes = [source_code]
+    while source_codes:
+        for module_name in get_imported_module_names(parse(source_codes.pop())):
+            module_path = find_module_path(module_name, modules_dir)
+            if module_path and module_path not in dependencies:
+                with open(module_path) as module_file:
+                    dependencies[module_path] = module_file.read()
+
+                source_codes.append(dependencies[module_path])
+
+    return dependencies
+
+
+def get_transitive_dependencies(source_code: str, modules_dir: Path | None) -> list[Path]:
+    """Paths of modules which are imported by the source code directly or through another modules"""
+    return sorted(read_transitive_dependencies(source_code, modules_dir))
+
+
+def get_dependencies_hashes(source_code: str, modules_dir: Path | None) -> dict[str, str]:
+    """Hashes of modules which are imported by the source code directly or through another modules by their paths"""
+    return {
+        str(module_path): get_source_hash(module_source_code)
+        for module_path, module_source_code in sorted(read_transitive_dependencies(source_code, modules_dir).items())
+    }
+
+
+def get_interface_path(module_path: Path) -> Path:
+    return module_path.parent / INTERFACES_DIR_NAME / f'{module_path.stem}.json'
+
+
+def read_interface(
+        interface_path: Path,
+        source_hash: str,
+        config_hash: str,
+        dependencies: dict[str, str],
+) -> dict | None:
+    try:
+        with open(interface_path, encoding='utf-8') as interface_file:
+            interface = json.load(interface_file)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        interface.get('py2c_version') != __version__
+        or interface.get('source_hash') != source_hash
+        or interface.get('config_hash') != config_hash
+        or interface.get('dependencies') != dependencies
+    ):
+        return None
+
+    return interface
+
+
+def write_interface(interface_path: Path, interface: dict):
+    """Write the interface atomically. The interface is only an optimization, so the writing may fail"""
+    try:
+        interface_path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(
+            'w', encoding='utf-8', dir=interface_path.parent, suffix='.tmp', delete=False,
+        ) as temp_file:
+            json.dump(interface, temp_file, ensure_ascii=False, separators=(',', ':'))
+
+        os.replace(temp_file.name, interface_path)
+    except OSError:
+        pass
+
+
+def load_module_interface(module_path: Path, config: dict, build_symbols) -> dict:
+    """
+    Load the interface of the module. If the interface is absent or outdated,
+    `build_symbols(source_code)` is called to get symbols of the module and the interface is written.
+    Symbols of the module include symbols of modules imported by it, so the interface is outdated
+    if any module imported directly or through another modules is changed too.
+    Loaded interfaces are kept in memory while the source codes of the module and its imports are not changed.
+    """
+    with open(module_path) as module_file:
+        source_code = module_file.read()
+
+    source_hash = get_source_hash(source_code)
+    config_hash = get_config_hash(config)
+    dependencies = get_dependencies_hashes(source_code, config.get('modules_dir'))
+    interface = _loaded_interfaces.get((module_path, config_hash))
+    if interface and interface['source_hash'] == source_hash and interface['dependencies'] == dependencies:
+        return interface
+
+    interfaces_cache = FileCache.from_config(config, 'interfaces')
+    if interfaces_cache:
+        interface_key = make_key(
+            str(module_path.resolve()), source_code, config_hash, json.dumps(dependencies, sort_keys=True),
+        )
+        interface = interfaces_cache.get(interface_key)
+    else:
+        interface_path = get_interface_path(module_path)
+        interface = read_interface(interface_path, source_hash, config_hash, dependencies)
+
+    if interface is None:
+        interface = {
+            'py2c_version': __version__,
+            'source_hash': source_hash,
+            'config_hash': config_hash,
+            'dependencies': dependencies,
+            'symbols': build_symbols(source_code),
+        }
+        if interfaces_cache:
+            interfaces_cache.set(interface_key, interface)
+        else:
+            write_interface(interface_path, interface)
+
+    _loaded_interfaces[(module_path, config_hash)] = interface
+    return interface
@@ -0,0 +1,414 @@
+"""
+Native compilation of translated c-code: the code is compiled by the system C-compiler into a shared library,
+which is loaded by `ctypes`. Libraries are cached on disk by the hash of the c-code, the compiler flags
+and the version of Py2C, so the code is compiled once per machine.
+"""
+import ast
+import copy
+import ctypes
+import functools
+import inspect
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from py2c.bytecode_walker import convert_annotation, translate_tree
+from py2c.cache import make_key
+from py2c.exceptions import CompilationException
+from py2c.translator_c import TranslatorC
+
+C_COMPILER = os.environ.get('CC', 'gcc')
+C_FLAGS = ('-O2', '-shared', '-fPIC')
+C_LIBRARIES = ('-lm',)
+C_PRELUDE = '#include <stdint.h>\n#include <stdbool.h>\n\n'
+LIBRARY_SUFFIX = '.so'
+
+CTYPES = {
+    'void': None,
+    'bool': ctypes.c_bool,
+    'char': ctypes.c_char,
+    'signed char': ctypes.c_byte,
+    'unsigned char': ctypes.c_ubyte,
+    'byte': ctypes.c_ubyte,
+    'short': ctypes.c_short,
+    'signed short': ctypes.c_short,
+    'unsigned short': ctypes.c_ushort,
+    'int': ctypes.c_int,
+    'signed int': ctypes.c_int,
+    'unsigned int': ctypes.c_uint,
+    'long': ctypes.c_long,
+    'signed long': ctypes.c_long,
+    'unsigned long': ctypes.c_ulong,
+    'long long': ctypes.c_longlong,
+    'unsigned long long': ctypes.c_ulonglong,
+    'float': ctypes.c_float,
+    'double': ctypes.c_double,
+    'int8_t': ctypes.c_int8,
+    'uint8_t': ctypes.c_uint8,
+    'int16_t': ctypes.c_int16,
+    'uint16_t': ctypes.c_uint16,
+    'int32_t': ctypes.c_int32,
+    'uint32_t': ctypes.c_uint32,
+    'int64_t': ctypes.c_int64,
+    'uint64_t': ctypes.c_uint64,
+    'size_t': ctypes.c_size_t,
+}
+
+
+def get_native_cache_dir() -> Path:
+    cache_dir = os.environ.get('PY2C_NATIVE_CACHE')
+    if cache_dir:
+        return Path(cache_dir)
+
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'py2c' / 'native'
+
+
+# C-types of values of unannotated arguments
+VALUE_C_TYPES = {
+    bool: 'bool',
+    int: 'long long',
+    float: 'double',
+}
+VALUE_C_TYPES.update({ctype: c_type for c_type, ctype in reversed(CTYPES.items()) if ctype is not None})
+NUMPY_C_TYPES = {
+    'bool': 'bool',
+    'int8': 'int8_t',
+    'uint8': 'uint8_t',
+    'int16': 'int16_t',
+    'uint16': 'uint16_t',
+    'int32': 'int32_t',
+    'uint32': 'uint32_t',
+    'int64': 'int64_t',
+    'uint64': 'uint64_t',
+    'float32': 'float',
+    'float64': 'double',
+}
+# C-types of elements of buffers by the format of `memoryview`
+BUFFER_C_TYPES = {
+    'b': 'int8_t',
+    'B': 'uint8_t',
+    'h': 'int16_t',
+    'H': 'uint16_t',
+    'i': 'int32_t',
+    'I': 'uint32_t',
+    'l': 'long',
+    'L': 'unsigned long',
+    'q': 'int64_t',
+    'Q': 'uint64_t',
+    'f': 'float',
+    'd': 'double',
+}
+# prefixes of formats of buffers, which keep items in the native byte order
+NATIVE_BYTE_ORDERS = ('', '@', '=', '<' if sys.byteorder == 'little' else '>')
+POINTER_SUFFIX = ' *'
+SPECIALIZATIONS_MAX_COUNT = 16
+PREWARM = os.environ.get('PY2C_PREWARM') == '1'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_ctype(c_type: str):
+    if c_type.endswith(POINTER_SUFFIX):
+        return ctypes.POINTER(get_ctype(c_type[:-len(POINTER_SUFFIX)]))
+
+    if c_type not in CTYPES:
+        raise CompilationException(f'The type `{c_type}` can not be passed between Python and C')
+
+    return CTYPES[c_type]
+
+
+def parse_arg_annotation(annotation: str | None) -> tuple[str | None, int | None]:
+    """
+    Convert the annotation to the C-type, like `TranslatorC.parse_annotation` does: `unsigned__int` -> `unsigned int`.
+    Arrays and links are passed as pointers: `uint8_t__64` -> `uint8_t *`, and the count of elements of the array
+    is returned too
+    """
+    if annotation is None:
+        return None, None
+
+    parts = annotation.split('__')
+    array_length = None
+    while parts and parts[-1].isdigit():
+        array_length = int(parts.pop()) * (array_length or 1)
+
+    is_link = bool(parts) and parts[-1] == 'link'
+    if is_link:
+        parts.pop()
+
+    c_type = ' '.join(parts)
+    return (f'{c_type}{POINTER_SUFFIX}' if is_link or array_length else c_type), array_length
+
+
+def get_buffer_code(buffer_format: str) -> str | None:
+    """Return the code of items of the buffer, or None if the items are not in the native byte order"""
+    code = buffer_format.lstrip('@=<>!')
+    if buffer_format[:len(buffer_format) - len(code)] not in NATIVE_BYTE_ORDERS:
+        return
+
+    return code
+
+
+def get_ctype_kind(ctype) -> tuple[int, str]:
+    """Return the size and the kind of values of the scalar ctype: `float`, `signed` or `unsigned`"""
+    code = ctype._type_
+    if code in 'fdg':
+        kind = 'float'
+    elif code in 'bhilq':
+        kind = 'signed'
+    elif code in 'BHILQ':
+        kind = 'unsigned'
+    else:
+        kind = code
+
+    return ctypes.sizeof(ctype), kind
+
+
+def get_buffer_c_type(value) -> str | None:
+    try:
+        with memoryview(value) as view:
+            buffer_format = view.format
+    except TypeError:
+        return
+
+    c_type = BUFFER_C_TYPES.get(get_buffer_code(buffer_format))
+    return c_type and f'{c_type}{POINTER_SUFFIX}'
+
+
+def get_buffer_arg(value, c_type: str, array_length: int | None):
+    """
+    Return the pointer to the memory of the object supporting the buffer protocol (`bytearray`, `array.array`,
+    `memoryview`, arrays of numpy). The memory is not copied, so the C-function may change it. Read-only buffers
+    (`bytes`, read-only `memoryview`) are copied, and changes of the copy are not written back
+    """
+    element_ctype = get_ctype(c_type[:-len(POINTER_SUFFIX)])
+    element_size = ctypes.sizeof(element_ctype)
+    with memoryview(value) as view:
+        if view.itemsize != element_size:
+            raise TypeError(f'Items of the buffer have {view.itemsize} bytes, but `{c_type}` is expected')
+
+        buffer_c_type = BUFFER_C_TYPES.get(get_buffer_code(view.format))
+        if buffer_c_type is None or get_ctype_kind(get_ctype(buffer_c_type)) != get_ctype_kind(element_ctype):
+            raise TypeError(f'Items of the buffer have the format `{view.format}`, but `{c_type}` is expected')
+
+        if not view.c_contiguous:
+            raise TypeError('The buffer must be C-contiguous')
+
+        length = view.nbytes // element_size
+        if array_length is not None and length < array_length:
+            raise ValueError(f'The buffer has {length} items, but the array of {array_length} items is expected')
+
+        if view.readonly:
+            return (element_ctype * length).from_buffer_copy(view)
+
+    return (element_ctype * length).from_buffer(value)
+
+
+def get_value_c_type(value) -> str:
+    """Return the C-type of the value of an unannotated argument"""
+    c_type = VALUE_C_TYPES.get(type(value))
+    if c_type is None:
+        dtype = getattr(value, 'dtype', None)  # scalars of numpy
+        c_type = NUMPY_C_TYPES.get(getattr(dtype, 'name', None)) if getattr(value, 'ndim', 0) == 0 else None
+
+    if c_type is None:
+        c_type = get_buffer_c_type(value)
+
+    if c_type is None:
+        raise CompilationException(f'The type of the argument `{type(value).__name__}` can not be passed to C')
+
+    return c_type
+
+
+def get_function_types(function_node: ast.FunctionDef) -> tuple[list[str | None], list[int | None], str]:
+    """
+    Return C-types of arguments, counts of elements of array arguments and the C-type of the result.
+    Unannotated arguments are `None`
+    """
+    arg_types, array_lengths = [], []
+    for arg in function_node.args.args:
+        arg_type, array_length = parse_arg_annotation(convert_annotation(arg.annotation, function_node))
+        arg_types.append(arg_type)
+        array_lengths.append(array_length)
+
+    return_type = parse_arg_annotation(convert_annotation(function_node.returns, function_node))[0]
+    return arg_types, array_lengths, return_type or 'void'
+
+
+def compile_library(c_code: str, flags: tuple[str, ...] = C_FLAGS, cache_dir: Path | None = None) -> Path:
+    """Compile the c-code into a shared library. Returns the path of the cached library"""
+    cache_dir = cache_dir or get_native_cache_dir()
+    c_code = f'{C_PRELUDE}{c_code}'
+    library_path = cache_dir / f'{make_key(c_code, C_COMPILER, *flags, *C_LIBRARIES)}{LIBRARY_SUFFIX}'
+    if library_path.exists():
+        return library_path
+
+    if not shutil.which(C_COMPILER):
+        raise CompilationException(f'C-compiler `{C_COMPILER}` is not found')
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(dir=cache_dir) as build_dir:
+        source_path = Path(build_dir) / 'module.c'
+        temp_library_path = Path(build_dir) / f'module{LIBRARY_SUFFIX}'
+        source_path.write_text(c_code, encoding='utf-8')
+        completed_process = subprocess.run(
+            [C_COMPILER, *flags, '-o', str(temp_library_path), str(source_path), *C_LIBRARIES],
+            capture_output=True,
+            text=True,
+        )
+        if completed_process.returncode:
+            raise CompilationException(f'Compilation is failed:\n{completed_process.stderr}')
+
+        os.replace(temp_library_path, library_path)  # the replacing is atomic, so parallel processes are safe
+
+    return library_path
+
+
+def load_function(library_path: Path, name: str, arg_ctypes: list, return_ctype):
+    try:
+        function = getattr(ctypes.CDLL(str(library_path)), name)
+    except OSError as error:
+        raise CompilationException(f'The library can not be loaded: {error}') from error
+
+    function.argtypes = arg_ctypes
+    function.restype = return_ctype
+    return function
+
+
+def annotate_function(function_node: ast.FunctionDef, arg_types) -> ast.FunctionDef:
+    """Return the copy of the function with the arguments annotated by C-types. The node is not changed"""
+    function_node = copy.deepcopy(function_node)
+    for arg, arg_type in zip(function_node.args.args, arg_types):
+        arg.annotation = ast.Constant(arg_type)
+
+    return function_node
+
+
+def translate_function(function_node: ast.FunctionDef, arg_types) -> str:
+    c_code = StringIO()
+    translate_tree(
+        TranslatorC(save_to=c_code),
+        ast.Module(body=[annotate_function(function_node, arg_types)], type_ignores=[]),
+    )
+    return c_code.getvalue()
+
+
+def call_native(native_function, args, arg_types, array_lengths):
+    """Call the native function. Buffers are passed to pointer arguments without copying"""
+    return native_function(*[
+        get_buffer_arg(value, arg_type, array_length) if arg_type.endswith(POINTER_SUFFIX) else value
+        for value, arg_type, array_length in zip(args, arg_types, array_lengths)
+    ])
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Compilations run in threads: the work is done by the C-compiler in its own process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='py2c-compile')
+
+    return _executor
+
+
+class NativeFunction:
+    """
+    The native version of the python-function. A specialization is compiled for every observed signature:
+    unannotated arguments get C-types of values of the call. Recently used specializations are kept in the memory,
+    and compiled libraries are kept in the disk cache.
+
+    In the background mode the python-function is called while the specialization is compiled in another thread,
+    so the first call does not wait for the C-compiler
+    """
+    def __init__(self, func, background: bool = True, prewarm: bool = False):
+        self.func = func
+        self.background = background
+        self.function_node = ast.parse(textwrap.dedent(inspect.getsource(func))).body[0]
+        self.signature = inspect.signature(func)
+        self.arg_types, self.array_lengths, self.return_type = get_function_types(self.function_node)
+        self.specializations = OrderedDict()
+        self.compilations = {}  # futures of specializations, which are not compiled yet or failed
+        self.lock = threading.RLock()  # the callback of the compilation may be called by the thread of a call
+        functools.update_wrapper(self, func)
+        if prewarm and None not in self.arg_types:
+            self.start_compilation(tuple(self.arg_types))
+
+    def get_arg_types(self, args) -> tuple[str, ...]:
+        return tuple(
+            get_value_c_type(value) if arg_type is None else arg_type
+            for arg_type, value in zip(self.arg_types, args)
+        )
+
+    def compile(self, arg_types: tuple[str, ...]):
+        library_path = compile_library(translate_function(self.function_node, arg_types))
+        return load_function(
+            library_path,
+            self.function_node.name,
+            [get_ctype(arg_type) for arg_type in arg_types],
+            get_ctype(self.return_type),
+        )
+
+    def finish_compilation(self, arg_types: tuple[str, ...], future: Future):
+        """Swap in the compiled specialization. A failed compilation is kept to raise its error by `wait`"""
+        if future.exception() is not None:
+            return
+
+        with self.lock:
+            self.specializations[arg_types] = future.result()
+            if len(self.specializations) > SPECIALIZATIONS_MAX_COUNT:
+                self.specializations.popitem(last=False)
+
+            del self.compilations[arg_types]
+
+    def start_compilation(self, arg_types: tuple[str, ...]) -> Future:
+        """Start the compilation of the specialization, if it is not started yet"""
+        with self.lock:
+            future = self.compilations.get(arg_types)
+            if future is None:
+                future = self.compilations[arg_types] = get_executor().submit(self.compile, arg_types)
+                future.add_done_callback(functools.partial(self.finish_compilation, arg_types))
+
+        return future
+
+    def get_specialization(self, arg_types: tuple[str, ...]):
+        """Return the native function, or `None` if it is compiled in the background mode"""
+        with self.lock:
+            native_function = self.specializations.get(arg_types)
+            if native_function is not None:
+                self.specializations.move_to_end(arg_types)
+                return native_function
+
+        future = self.start_compilation(arg_types)
+        if self.background:
+            return
+
+        return future.result()
+
+    def wait(self, timeout: float | None = None):
+        """Wait for compilations started by calls. Errors of compilations are raised"""
+        with self.lock:
+            futures = list(self.compilations.values())
+
+        for future in futures:
+            future.result(timeout)
+
+    def __call__(self, *args, **kwargs):
+        if kwargs or len(args) != len(self.arg_types):
+            bound_args = self.signature.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            args = bound_args.args
+
+        arg_types = self.get_arg_types(args)
+        native_function = self.get_specialization(arg_types)
+        if native_function is None:
+            return self.func(*args)
+
+        return call_native(native_function, args, arg_types, self.array_lengths)
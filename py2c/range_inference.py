@@ -0,0 +1,90 @@
+"""
+Flow-insensitive inference of value ranges of unannotated local variables. The variable, which is assigned only by
+integer constants and is the variable of `for` loops over `range` with constant bounds, gets the range of all its
+values, so the translator declares it by the smallest integer type. Any other assignment of the variable (augmented,
+non-constant, unpacking, `global`) or taking its address (`variable.link`) excludes it from the inference
+"""
+import ast
+
+from py2c.constant_folding import get_constant_value
+
+
+def get_range_exit_value(start: int, stop: int, step: int) -> int:
+    """Return the value of the loop variable, which stops the C-loop"""
+    length = len(range(start, stop, step))
+    return start + length * step
+
+
+def get_integer_value(converter, node, values: dict) -> int | None:
+    value = get_constant_value(converter, node, values)
+    return value if type(value) is int else None
+
+
+def get_loop_values(converter, node: ast.For, values: dict) -> tuple[int, int] | None:
+    """Return the first value and the exit value of the variable of `for` loop over `range` with constant bounds"""
+    iterator = node.iter
+    if (
+        not isinstance(iterator, ast.Call)
+        or not isinstance(iterator.func, ast.Name)
+        or iterator.func.id != 'range'
+        or iterator.keywords
+        or not 1 <= len(iterator.args) <= 3
+    ):
+        return
+
+    args = [get_integer_value(converter, arg, values) for arg in iterator.args]
+    if None in args:
+        return
+
+    if len(args) == 1:
+        args.insert(0, 0)
+
+    start, stop, step = (args + [1])[:3]
+    if step:
+        return start, get_range_exit_value(start, stop, step)
+
+
+def is_range_node(node) -> bool:
+    """The node assigns a variable or takes its address, so it is needed for the inference"""
+    if isinstance(node, ast.Name):
+        return not isinstance(node.ctx, ast.Load)
+
+    return isinstance(node, (ast.Assign, ast.For, ast.Global)) or (
+        isinstance(node, ast.Attribute) and node.attr == 'link'
+    )
+
+
+def infer_value_ranges(converter, range_nodes: list) -> dict[str, tuple[int, int]]:
+    """
+    Return the minimal and the maximal values of inferred variables of the scope by their names. `range_nodes` are
+    nodes of the scope in the order of the tree, which are selected by `is_range_node` while the tree is analyzed.
+    Values of constant expressions are not remembered by the translator, because variables of the scope are not
+    declared yet
+    """
+    constant_values = {}
+    values = {}
+    excluded_names = set()
+    inferred_targets = set()
+    for node in range_nodes:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = get_integer_value(converter, node.value, constant_values)
+            if value is not None:
+                values.setdefault(node.targets[0].id, []).append(value)
+                inferred_targets.add(id(node.targets[0]))
+        elif isinstance(node, ast.For) and isinstance(node.target, ast.Name):
+            loop_values = get_loop_values(converter, node, constant_values)
+            if loop_values:
+                values.setdefault(node.target.id, []).extend(loop_values)
+                inferred_targets.add(id(node.target))
+        elif isinstance(node, ast.Global):
+            excluded_names.update(node.names)
+        elif isinstance(node, ast.Attribute) and node.attr == 'link' and isinstance(node.value, ast.Name):
+            excluded_names.add(node.value.id)  # the address is taken, the pointed type must not be changed
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load) and id(node) not in inferred_targets:
+            excluded_names.add(node.id)
+
+    return {
+        name: (min(name_values), max(name_values))
+        for name, name_values in values.items()
+        if name not in excluded_names
+    }
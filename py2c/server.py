@@ -0,0 +1,132 @@
+"""
+Server keeps the interpreter, translators and caches warm, so a build system does not pay for the start of Python
+on every file. Requests and responses are JSON-lines, which are read from stdin or from a Unix socket.
+
+Kinds of requests:
+- `{"argv": [...], "cwd": "..."}` - run the command line interface like `py2c` does.
+  The response is `{"returncode": 0, "stdout": "...", "stderr": "..."}`
+- `{"source_code": "...", "language": "c", "config": {...}}` - translate the source code.
+  The response is `{"code": "..."}` or `{"error": "..."}`
+"""
+import json
+import os
+import socketserver
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from py2c import client
+from py2c.bytecode_walker import translate
+from py2c.translator_cpp import TranslatorC, TranslatorCpp
+
+TRANSLATOR_CLASSES = {'c': TranslatorC, 'cpp': TranslatorCpp}
+PATH_CONFIG_KEYS = ('modules_dir', 'cache_dir')
+
+
+def get_default_socket_path() -> Path:
+    return Path(client.get_default_socket_path())
+
+
+class TranslationService:
+    """
+    Keeps translators between requests. A translator is ready for the next translation after `save`, only its
+    transit data (ranges of values, declared functions and so on) is reset, so nothing is carried over to the next
+    request
+    """
+
+    def __init__(self):
+        self.translators = {}
+
+    def translate(self, source_code: str, language: str = 'c', config: dict | None = None) -> str:
+        config = dict(config or {})
+        for key in PATH_CONFIG_KEYS:
+            if config.get(key):
+                config[key] = Path(config[key])
+
+        translator = self.translators.pop(language, None)
+        if translator is None:
+            translator = TRANSLATOR_CLASSES[language](save_to=None)
+
+        output = StringIO()
+        translator.transit_data = {}
+        translator.config = config
+        translator.save_to = output
+        translate(translator, source_code)
+        self.translators[language] = translator  # it is returned only after successful translation
+        return output.getvalue()
+
+    def run_command(self, argv: list[str], cwd: str | None = None) -> dict:
+        from py2c.cli import run
+
+        if argv[:1] == ['serve']:
+            return {'returncode': 2, 'stdout': '', 'stderr': 'The server can not be run by the server\n'}
+
+        stdout, stderr = StringIO(), StringIO()
+        returncode = 0
+        current_dir = os.getcwd()
+        try:
+            if cwd:
+                os.chdir(cwd)
+
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                run(argv)
+        except SystemExit as error:
+            returncode = error.code if isinstance(error.code, int) else 1
+        except Exception as error:
+            stderr.write(f'{error.__class__.__name__}: {error}\n')
+            returncode = 1
+        finally:
+            os.chdir(current_dir)
+
+        return {'returncode': returncode, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+    def handle(self, request: dict) -> dict:
+        if 'argv' in request:
+            return self.run_command(request['argv'], request.get('cwd'))
+
+        try:
+            code = self.translate(request['source_code'], request.get('language', 'c'), request.get('config'))
+        except Exception as error:
+            return {'error': f'{error.__class__.__name__}: {error}'}
+
+        return {'code': code}
+
+    def handle_line(self, line: str) -> str:
+        try:
+            response = self.handle(json.loads(line))
+        except (ValueError, KeyError, TypeError) as error:
+            response = {'error': f'Invalid request: {error}'}
+
+        return json.dumps(response, ensure_ascii=False)
+
+
+def serve_stream(input_stream, output_stream, service: TranslationService | None = None):
+    service = service or TranslationService()
+    for line in input_stream:
+        if line.strip():
+            output_stream.write(service.handle_line(line))
+            output_stream.write('\n')
+            output_stream.flush()
+
+
+def make_socket_server(socket_path: Path, service: TranslationService | None = None):
+    service = service or TranslationService()
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write(service.handle_line(line.decode('utf-8')).encode('utf-8'))
+                    self.wfile.write(b'\n')
+                    self.wfile.flush()
+
+    socket_path.unlink(missing_ok=True)
+    return socketserver.UnixStreamServer(str(socket_path), RequestHandler)
+
+
+def serve_socket(socket_path: Path, service: TranslationService | None = None):
+    with make_socket_server(socket_path, service) as server:
+        try:
+            server.serve_forever()
+        finally:
+            socket_path.unlink(missing_ok=True)
@@ -1,6 +1,6 @@
 from io import StringIO, TextIOWrapper
 
-
+from py2c import native
 from py2c.bytecode_walker import translate
 from py2c.translator_cpp import TranslatorC, TranslatorCpp
 
@@ -38,15 +38,18 @@ def trans_cpp(
     return trans(source_code, TranslatorCpp, write_to, config=config)
 
 
-def compile_c(func):
-    import inspect
-    def _compile_c(*args, **kwargs):
-        c_code = trans_c(inspect.getsource(func))
-        c_file_path = 'temp.c'
-        with open(c_file_path, 'wt', encoding='utf-8') as file_c:
-            file_c.write(c_code)
-            file_c.write('\n\nint main() {return 0;}\n')
-        print(c_code)
-        return func(*args, **kwargs)
-    
-    return _compile_c
+def compile_c(func=None, *, background: bool = True, prewarm: bool | None = None):
+    """
+    Decorator: translate the function into C, compile it into a shared library and call the native function.
+    The compilation is lazy - it is started by the first call with the new types of arguments,
+    and the library is cached on disk. In the background mode the python-function is called until the library is ready.
+    If `prewarm` is set (or `PY2C_PREWARM=1` environment variable), annotated functions are compiled at once
+    """
+    def decorator(func):
+        return native.NativeFunction(
+            func,
+            background=background,
+            prewarm=native.PREWARM if prewarm is None else prewarm,
+        )
+
+    return decorator if func is None else decorator(func)
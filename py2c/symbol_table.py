@@ -0,0 +1,46 @@
+class SymbolTable:
+    """
+    Table of symbols with scopes. Every name has a stack of its bindings, so the lookup is one access to a dict.
+    Bindings of a scope are released when the scope is left.
+    """
+
+    def __init__(self):
+        self.bindings: dict[str, list[dict]] = {}
+        self.scopes: list[dict[str, dict]] = [{}]
+
+    def enter_scope(self):
+        self.scopes.append({})
+
+    def leave_scope(self):
+        for name in self.scopes.pop():
+            bindings = self.bindings[name]
+            bindings.pop()
+            if not bindings:
+                del self.bindings[name]
+
+    def lookup(self, name: str) -> dict | None:
+        bindings = self.bindings.get(name)
+        return bindings[-1] if bindings else None
+
+    def bind(self, name: str, **kwargs) -> dict:
+        """Bind the name in the current scope or update the existing binding of the scope"""
+        scope = self.scopes[-1]
+        variable_data = scope.get(name)
+        if variable_data is None:
+            variable_data = scope[name] = {}
+            self.bindings.setdefault(name, []).append(variable_data)
+
+        variable_data.update(kwargs)
+        return variable_data
+
+    def update(self, symbols: dict[str, dict]):
+        for name, variable_data in symbols.items():
+            self.bind(name, **variable_data)
+
+    @property
+    def global_symbols(self) -> dict[str, dict]:
+        return self.scopes[0]
+
+    def clear(self):
+        self.bindings.clear()
+        self.scopes = [{}]
@@ -1,6 +1,125 @@
+import ast
 from dataclasses import dataclass, field
 
+from py2c.constant_folding import FIXED_INTEGER_TYPES, NOT_CONSTANT, get_constant_value, get_declared_type
 from py2c.exceptions import NoneIsNotAllowedException, SourceCodeException
+from py2c.module_interface import load_module_interface
+from py2c.range_inference import get_range_exit_value, infer_value_ranges
+from py2c.tree_analysis import ScopeAnalysis, analyze_body
+from py2c.symbol_table import SymbolTable
+
+
+INTEGER_TYPES = {
+    'char', 'signed char', 'unsigned char', 'byte', 'unsigned byte', 'short', 'signed short', 'unsigned short',
+    'int', 'signed int', 'unsigned int', 'unsigned', 'long', 'signed long', 'unsigned long', 'long long',
+    'unsigned long long', 'size_t', 'int8_t', 'uint8_t', 'int16_t', 'uint16_t', 'int32_t', 'uint32_t', 'int64_t',
+    'uint64_t',
+}
+UNSIGNED_INTEGER_TYPES = {
+    'unsigned char', 'byte', 'unsigned byte', 'unsigned short', 'unsigned int', 'unsigned', 'unsigned long',
+    'unsigned long long', 'size_t', 'uint8_t', 'uint16_t', 'uint32_t', 'uint64_t',
+}
+# types, which are promoted to `int` in arithmetic
+NARROW_INTEGER_TYPES = {'char'} | {
+    integer_type for integer_type, (bits, is_signed) in FIXED_INTEGER_TYPES.items() if bits < 32
+}
+FLOAT_TYPES = {'float', 'double', 'long double'}
+# `1` of the type of the result of `2 ** n`, which is written as the shift
+SHIFTED_ONE_LITERALS = {
+    'int': '1', 'signed int': '1', 'unsigned int': '1U', 'unsigned': '1U', 'long': '1L', 'signed long': '1L',
+    'unsigned long': '1UL', 'long long': '1LL', 'unsigned long long': '1ULL',
+}
+DEFAULT_SHIFTED_ONE_LITERAL = '1LL'
+# types to keep the product of the multiplication by the reciprocal, by their bits
+WIDE_UNSIGNED_TYPES = {16: 'uint16_t', 32: 'uint32_t', 64: 'uint64_t'}
+# the smallest types are preferred, unsigned ones - in the case of equal sizes
+SMALLEST_INTEGER_TYPES = (
+    ('uint8_t', 0, 0xFF),
+    ('int8_t', -0x80, 0x7F),
+    ('uint16_t', 0, 0xFFFF),
+    ('int16_t', -0x8000, 0x7FFF),
+    ('uint32_t', 0, 0xFFFFFFFF),
+    ('int32_t', -0x80000000, 0x7FFFFFFF),
+    ('uint64_t', 0, 0xFFFFFFFFFFFFFFFF),
+    ('int64_t', -0x8000000000000000, 0x7FFFFFFFFFFFFFFF),
+)
+STATEMENT_NODE_CLASSES = (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Return, ast.Expr)
+# C-types of returned constants, when the function returning several values has no annotation of their types
+CONSTANT_C_TYPES = {bool: 'bool', int: 'int', float: 'float'}
+OUT_ARGUMENT_NAME = 'py2c_out_{index}'
+MAX_POW_MULTIPLICATIONS = 4  # `x ** 4` is written as `x * x * x * x`
+STR_HELPER_IPOW = (
+    'static long long py2c_ipow(long long base, long long exponent) {\n'
+    '    long long result = 1;\n'
+    '    while (exponent > 0) {\n'
+    '        if (exponent & 1) {\n'
+    '            result *= base;\n'
+    '        }\n'
+    '        base *= base;\n'
+    '        exponent >>= 1;\n'
+    '    }\n'
+    '    return result;\n'
+    '}\n'
+)
+
+
+def get_array_repetition(node) -> tuple | None:
+    """Return the item and the size of the array created by the repetition: `[0] * size` or `size * [0]`"""
+    if not isinstance(node, ast.BinOp) or not isinstance(node.op, ast.Mult):
+        return
+
+    for items, size in ((node.left, node.right), (node.right, node.left)):
+        if isinstance(items, ast.List) and len(items.elts) == 1 and not isinstance(size, ast.List):
+            return items.elts[0], size
+
+
+def promote_integer_type(c_type: str | None) -> str | None:
+    return 'int' if c_type in NARROW_INTEGER_TYPES else c_type
+
+
+def get_arithmetic_type(left_type: str | None, right_type: str | None) -> str | None:
+    """
+    Return the type of the result of arithmetic on the types. Integer types of different signedness give the signed
+    type, so unsigned optimizations are not applied to values, which may be negative
+    """
+    if left_type in FLOAT_TYPES or right_type in FLOAT_TYPES:
+        if left_type in FLOAT_TYPES | INTEGER_TYPES and right_type in FLOAT_TYPES | INTEGER_TYPES:
+            return 'float' if {left_type, right_type} <= {'float'} | INTEGER_TYPES else 'double'
+
+        return
+
+    if left_type not in INTEGER_TYPES or right_type not in INTEGER_TYPES:
+        return
+
+    left_type, right_type = promote_integer_type(left_type), promote_integer_type(right_type)
+    if left_type == right_type:
+        return left_type
+
+    if left_type in UNSIGNED_INTEGER_TYPES and right_type in UNSIGNED_INTEGER_TYPES:
+        return 'unsigned long long'
+
+    return 'long long'
+
+
+def get_smallest_integer_type(minimum: int, maximum: int) -> str | None:
+    for integer_type, type_minimum, type_maximum in SMALLEST_INTEGER_TYPES:
+        if type_minimum <= minimum and maximum <= type_maximum:
+            return integer_type
+
+
+def get_reciprocal(divisor: int, bits: int) -> tuple[int, int, int] | None:
+    """
+    Return the multiplier, the shift and bits of the product: `x // divisor == (x * multiplier) >> shift`
+    for all `x < 2 ** bits`. See "Division by Invariant Integers using Multiplication" by Granlund and Montgomery
+    """
+    for shift in range(bits, 2 * bits + 1):
+        multiplier = -(-(1 << shift) // divisor)
+        if multiplier * divisor - (1 << shift) <= 1 << (shift - bits):
+            product_bits = next(
+                (wide_bits for wide_bits in WIDE_UNSIGNED_TYPES if wide_bits >= bits + multiplier.bit_length()),
+                None,
+            )
+            return (multiplier, shift, product_bits) if product_bits else None
 
 
 @dataclass
@@ -28,26 +147,29 @@ class RawString:
         self.prev_raw_string = prev_raw_string
 
 
+class RawSegment(list):
+    """Class to represent a part of the output, which is written later (by the iterative walker)"""
+
+
 class DeclarationVariableString(RawString):
     """Класс управления параметрами объявления переменной"""
     def __init__(self, annotation: Annotation, name: str, *args):
         super().__init__(*args)
         self.annotation = annotation
         self.name = name
-        self.translater.set_variable_data(name, type=annotation.type)
+        variable_data = {'type': annotation.type}
+        if annotation.array_sizes:
+            variable_data['array_sizes'] = annotation.array_sizes
 
-    @property
-    def variable_data(self):
-        return self.translater.get_variable_data(self.name, self.level)
+        if annotation.link:
+            variable_data['link'] = True
+
+        self.variable_data = self.translater.set_variable_data(name, **variable_data)
 
     def __str__(self):
         variable_type = self.variable_data.get('variable_type')
         if variable_type == 'dynamic_array':
-            return (
-                '{ident}int py2c_length_{name} = {array_size};\n'
-                '{ident}{annotation} *{name}\n'
-                '{ident}{name} = ({annotation} *)malloc(py2c_length_{name} * sizeof({annotation}));\n'
-            ).format(annotation=self.annotation.type, name=self.name, array_size=self.array_size, ident=self.ident)
+            return f'{self.ident}{self.annotation.type} *{self.name}'
 
         link = '*' if self.annotation.link else ''
         array_sizes = self.annotation.array_sizes or self.variable_data.get('array_sizes', [])
@@ -59,6 +181,38 @@ class DeclarationVariableString(RawString):
         return f'{self.ident}{self.annotation.type} {link}{self.name}{str_array_sizes}'
 
 
+class StructureDefinitionString(RawString):
+    """Definition of the structure of values returned by the function. Types are known after the body is walked"""
+    def __init__(self, structure_name: str, function_data: dict, *args):
+        super().__init__(*args)
+        self.structure_name = structure_name
+        self.function_data = function_data
+
+    def __str__(self):
+        fields = ''.join(
+            f'{self.ident}    {return_type} item{index};\n'
+            for index, return_type in enumerate(self.function_data['return_types'] or ())
+        )
+        return f'{self.ident}struct {self.structure_name} {{\n{fields}{self.ident}}};\n'
+
+
+class OutArgumentsString(RawString):
+    """Out-arguments of the function returning several values: declarations of pointers or their names to pass"""
+    def __init__(self, function_data: dict, is_declaration: bool, is_first: bool, *args):
+        super().__init__(*args)
+        self.function_data = function_data
+        self.is_declaration = is_declaration
+        self.is_first = is_first
+
+    def __str__(self):
+        out_arguments = []
+        for index, return_type in enumerate(self.function_data['return_types'] or ()):
+            out_argument = OUT_ARGUMENT_NAME.format(index=index)
+            out_arguments.append(f'{return_type} *{out_argument}' if self.is_declaration else out_argument)
+
+        return ('' if self.is_first else ', ') + ', '.join(out_arguments)
+
+
 class TranslatorC:
     """
     > Если подключаемый файл указан в <>, то поиск будет происходить в стандартных каталогах,
@@ -75,6 +229,9 @@ class TranslatorC:
     STR_INCLUDE_STD_MODULE = '#include <{module_name}.h>'
     STR_INCLUDE_MODULE_MATH = STR_INCLUDE_USER_MODULE.format(parent_path='', module_name='math')
     STR_INCLUDE_MODULE_STDIO = STR_INCLUDE_USER_MODULE.format(parent_path='', module_name='stdio')
+    STR_INCLUDE_MODULE_STDINT = STR_INCLUDE_STD_MODULE.format(module_name='stdint')
+    STR_INCLUDE_MODULE_STDLIB = STR_INCLUDE_STD_MODULE.format(module_name='stdlib')
+    IS_OVERLOADING_SUPPORTED = False
 
     def __init__(self, save_to, config=None):
         self.config = {} if config is None else config
@@ -86,31 +243,41 @@ class TranslatorC:
         self._walk = None
         self.transit_data = {}
         self.current_function_names = []
-        self.variables_data = {}
+        self.symbols = SymbolTable()
 
         self.raw_strings = []
         self.raw_imports = set()
+        self.raw_helpers = {}  # functions, which are used by the translated code, by their names
+        self.read_modules = []  # paths of the imported modules, which are found in `modules_dir`
+        self.folded_constants = []  # (node, value) of folded constant expressions, nodes are unparsed for the listing
 
-    def get_variable_data(self, name: str, level: int = None):
-        level = self.level if level is None else level
-        while level >= 0:
-            variable_data = self.variables_data.get(level, {}).get(name)
-            if variable_data:
-                return variable_data
-
-            level -= 1
+    def get_variable_data(self, name: str) -> dict:
+        return self.symbols.lookup(name) or {}
 
-        variable_data = {}
-        self.variables_data[level] = {name: variable_data}
-        return variable_data
+    def set_variable_data(self, name: str, **kwargs) -> dict:
+        return self.symbols.bind(name, **kwargs)
 
-    def set_variable_data(self, name: str, level: int = None, **kwargs):
-        level = self.level if level is None else level
-        self.variables_data.setdefault(level, {}).setdefault(name, {}).update(kwargs)
-
-    def write(self, data: str | RawString):
+    def write(self, data: str | RawString | RawSegment):
         self.raw_strings.append(data)
 
+    def write_segment(self) -> RawSegment:
+        raw_segment = RawSegment()
+        self.write(raw_segment)
+        return raw_segment
+
+    def iter_raw_strings(self):
+        """Iterate over the written strings, nested segments are expanded"""
+        iterators = [iter(self.raw_strings)]
+        while iterators:
+            for raw_string in iterators[-1]:
+                if isinstance(raw_string, RawSegment):
+                    iterators.append(iter(raw_string))
+                    break
+
+                yield raw_string
+            else:
+                iterators.pop()
+
     def write_lbracket(self, is_need_brackets):
         if is_need_brackets:
             self.write('(')
@@ -127,8 +294,12 @@ class TranslatorC:
             self.save_to.write(str_imports)
             self.save_to.write('\n\n')
 
+        for raw_helper in self.raw_helpers.values():
+            self.save_to.write(raw_helper)
+            self.save_to.write('\n')
+
         prev_raw_string = None
-        for raw_index, raw_string in enumerate(self.raw_strings):
+        for raw_index, raw_string in enumerate(self.iter_raw_strings()):
             if isinstance(raw_string, RawString):
                 raw_string.set_previous_raw_string(prev_raw_string)
                 self.save_to.write(str(raw_string))
@@ -143,9 +314,10 @@ class TranslatorC:
 
             prev_raw_string = raw_string
 
-        self.variables_data.clear()
+        self.symbols.clear()
         self.raw_strings.clear()
         self.raw_imports.clear()
+        self.raw_helpers.clear()
 
     @property
     def ident(self):
@@ -169,6 +341,13 @@ class TranslatorC:
         if current_function_name:
             self.current_function_names.pop()
 
+    def walk_inline(self, node):
+        """Walk the node at once even in the iterative mode, because the written output is inspected right after"""
+        inline_walks = self.transit_data.get('inline_walks', 0)
+        self.transit_data['inline_walks'] = inline_walks + 1
+        self.walk(node)
+        self.transit_data['inline_walks'] = inline_walks
+
     def parse_annotation(self, annotation: str):
         params = {'array_sizes': []}
         parts = annotation.split('__')
@@ -195,7 +374,26 @@ class TranslatorC:
 
     def process_init_variable(self, name: str, value_expr, annotation: str | None, value_lambda=None):
         annotation = self.parse_annotation(annotation)
-        if annotation.type == 'preproc':
+        array_repetition = get_array_repetition(value_expr)
+        if array_repetition and annotation.type != 'preproc':
+            if annotation.link or len(annotation.array_sizes) > 1:
+                raise SourceCodeException('The annotation of the array must be the type of its items', value_expr)
+
+            if annotation.array_sizes and not self.is_same_size(annotation.array_sizes[0], array_repetition[1]):
+                raise SourceCodeException('The size of the array differs from the size in the annotation', value_expr)
+
+            self.process_init_array(name, annotation.type, *array_repetition)
+        elif annotation.type == 'preproc':
+            value = get_constant_value(self, value_expr) if value_expr else NOT_CONSTANT
+            if isinstance(value_expr, ast.Constant):
+                self.set_variable_data(name, type='preproc', value=value_expr.value)
+            elif value is not NOT_CONSTANT:
+                self.set_variable_data(name, type='preproc', value=value)
+            elif value_lambda:
+                self.set_variable_data(name, type='preproc', args=value_lambda[0])
+            else:
+                self.set_variable_data(name, type='preproc')
+
             self.write(f'#define ')
             self.write(name)
             if value_expr:
@@ -247,51 +445,182 @@ class TranslatorC:
     def process_def_function(
             self,
             name: str,
-            annotation: str | None,
+            annotation: str | tuple[str] | None,
             pos_args: tuple[str],
             pos_args_defaults,
             body,
             docstring_comment: str
     ):
-        if annotation is None:
-            annotation = 'void'
+        """
+        Several values are returned in the structure `<name>_mys`, or through pointers passed by the caller if
+        `multi_return` of the config is `out_pointers`. The tuple annotation of the result sets types of the values,
+        otherwise they are taken from the values of the first `return`
+        """
+        function_data = self.declare_function(name, annotation, pos_args, pos_args_defaults, body)
+        annotation = function_data['annotation']
+        if function_data.get('multi_return') == 'struct':
+            structure_name = f'{name}_mys'
+            self.write(StructureDefinitionString(structure_name, function_data, self, self.level, self.ident))
 
         if docstring_comment:
             self.process_multiline_comment(docstring_comment)
 
         self.write(f'{self.ident}{annotation} {name}(')
-        str_args = [f'{annotation_arg} {name_arg}' for annotation_arg, name_arg in pos_args]
-        self.write(', '.join(str_args) if pos_args else 'void')
+        self.write_function_arguments(pos_args, function_data)
         self.write(') {\n')
+        self.symbols.enter_scope()
+        for annotation_arg, name_arg in pos_args:
+            self.set_variable_data(name_arg, type=annotation_arg)
+
+        if self.config.get('infer_integer_types', True):
+            range_nodes = self.get_scope_analysis(body).range_nodes
+            self.transit_data.setdefault('value_ranges', {})[name] = infer_value_ranges(self, range_nodes)
+
+        heap_arrays = self.transit_data.setdefault('heap_arrays', [])
+        heap_arrays.append((self.level + 1, []))
         for expression in body:
             self.walk(expression, 1, current_function_name=name)
 
+        if not body or not isinstance(body[-1], ast.Return):
+            self.level += 1
+            self.write_heap_arrays_freeing()
+            self.level -= 1
+
+        heap_arrays.pop()
+        self.symbols.leave_scope()
         self.write('}\n')
 
-        return_expr = '' if annotation == 'void' else 'return '
+        if self.config.get('default_args_wrappers'):
+            self.process_default_args_wrappers(name, annotation, pos_args, pos_args_defaults, function_data)
 
+    def declare_function(
+            self,
+            name: str,
+            annotation: str | tuple[str] | None,
+            pos_args: tuple[str],
+            pos_args_defaults,
+            body,
+    ) -> dict:
+        """
+        Bind the signature of the function. Top-level functions are declared before the module is walked, so calls
+        of functions defined below get default arguments too. The declaration is reused when the function is walked
+        """
+        declared_functions = self.transit_data.setdefault('declared_functions', {})
+        function_data = declared_functions.get(id(body))
+        if function_data and function_data['type'] == 'function' and self.get_variable_data(name) is function_data:
+            return function_data
+
+        function_data = self.set_variable_data(name, type='function', pos_args=pos_args)
+        declared_functions[id(body)] = function_data
+        if isinstance(annotation, tuple) or self.get_scope_analysis(body).has_multi_return:
+            multi_return = 'out_pointers' if self.config.get('multi_return') == 'out_pointers' else 'struct'
+            function_data['multi_return'] = multi_return
+            if function_data.get('return_types') is None or isinstance(annotation, tuple):
+                function_data['return_types'] = list(annotation) if isinstance(annotation, tuple) else None
+
+            annotation = f'struct {name}_mys' if multi_return == 'struct' else 'void'
+
+        function_data['annotation'] = annotation or 'void'
+        if pos_args_defaults:
+            function_data['pos_args_defaults'] = [ast.unparse(pos_arg_default) for pos_arg_default in pos_args_defaults]
+
+        return function_data
+
+    def get_scope_analysis(self, body) -> ScopeAnalysis:
+        """The module is analyzed before it is walked. A body out of the analyzed tree is analyzed separately"""
+        scopes = self.transit_data.setdefault('scopes', {})
+        if id(body) not in scopes:
+            scopes.update(analyze_body(body).scopes)
+
+        return scopes[id(body)]
+
+    def get_inferred_type(self, name: str) -> str | None:
+        """Return the smallest integer type covering values of the unannotated local variable"""
+        if not self.current_function_names:
+            return
+
+        value_range = self.transit_data.get('value_ranges', {}).get(self.current_function_name, {}).get(name)
+        inferred_type = get_smallest_integer_type(*value_range) if value_range else None
+        if inferred_type:
+            self.raw_imports.add(self.STR_INCLUDE_MODULE_STDINT)
+
+        return inferred_type
+
+    def write_function_arguments(self, pos_args, function_data: dict):
+        str_args = [f'{annotation_arg} {name_arg}' for annotation_arg, name_arg in pos_args]
+        if function_data.get('multi_return') == 'out_pointers':
+            self.write(', '.join(str_args))
+            self.write(OutArgumentsString(function_data, True, not str_args, self, self.level, self.ident))
+        else:
+            self.write(', '.join(str_args) if str_args else 'void')
+
+    def process_default_args_wrappers(self, name: str, annotation: str, pos_args, pos_args_defaults, function_data):
+        """
+        Calls of known functions get default values at the call site. The wrappers are written for callers,
+        which do not know the function, e.g. another C-code. They are overloads in C++ and `<name>__<count of args>`
+        in C
+        """
+        return_expr = '' if annotation == 'void' else 'return '
         for index_default_arg in range(1, len(pos_args_defaults)+1):
-            self.write(f'{self.ident}{annotation} {name}(')
-            str_args = [f'{annotation_arg} {name_arg}' for annotation_arg, name_arg in pos_args[:-index_default_arg]]
-            self.write(', '.join(str_args) if pos_args else 'void')
+            wrapper_pos_args = pos_args[:-index_default_arg]
+            wrapper_name = name if self.IS_OVERLOADING_SUPPORTED else f'{name}__{len(wrapper_pos_args)}'
+            self.write(f'{self.ident}static inline {annotation} {wrapper_name}(')
+            self.write_function_arguments(wrapper_pos_args, function_data)
             self.write(') {\n')
             self.level += 1
             self.write(f'{self.ident}{return_expr}{name}(')
             self.level -= 1
-            for annotation_arg, name_arg in pos_args[:-index_default_arg]:
+            for annotation_arg, name_arg in wrapper_pos_args:
                 self.write(f'{name_arg}, ')
 
             for index_pos_arg_default, pos_arg_default in enumerate(pos_args_defaults[-index_default_arg:]):
-                pos_arg_default.custom_ignore = False
                 self.walk(pos_arg_default)
                 if index_pos_arg_default < len(pos_args_defaults[-index_default_arg:]) - 1:
                     self.write(', ')
 
+            if function_data.get('multi_return') == 'out_pointers':
+                self.write(OutArgumentsString(function_data, False, False, self, self.level, self.ident))
+
             self.write(');\n')
             self.write('}\n')
 
-    def process_call_function(self, name, pos_args):
-        self.walk(name)
+    def get_call_arguments(self, function_data: dict, pos_args, keywords, call_node) -> list:
+        """
+        Arguments of the call in the order of parameters of the function. Keyword arguments are placed by their
+        names, and absent arguments are replaced by default values, so the function is called directly.
+        Calls of unknown functions are written as they are
+        """
+        if function_data.get('type') != 'function':
+            return list(pos_args)
+
+        arg_names = [name_arg for annotation_arg, name_arg in function_data['pos_args']]
+        if len(pos_args) > len(arg_names):
+            raise SourceCodeException('Too many arguments of the function', call_node)
+
+        arguments = dict(zip(arg_names, pos_args))
+        for keyword in keywords:
+            if keyword.arg not in arg_names or keyword.arg in arguments:
+                raise SourceCodeException(f'Unexpected argument: {keyword.arg}', keyword)
+
+            arguments[keyword.arg] = keyword.value
+
+        pos_args_defaults = function_data.get('pos_args_defaults', [])
+        parsed_defaults = self.transit_data.setdefault('parsed_defaults', {})
+        for name_arg, pos_arg_default in zip(arg_names[len(arg_names) - len(pos_args_defaults):], pos_args_defaults):
+            if name_arg not in arguments:
+                if pos_arg_default not in parsed_defaults:
+                    parsed_defaults[pos_arg_default] = ast.parse(pos_arg_default, mode='eval').body
+
+                arguments[name_arg] = parsed_defaults[pos_arg_default]
+
+        missing_names = [name_arg for name_arg in arg_names if name_arg not in arguments]
+        if missing_names:
+            raise SourceCodeException(f'Missing arguments: {", ".join(missing_names)}', call_node)
+
+        return [arguments[name_arg] for name_arg in arg_names]
+
+    def process_call_function(self, name, pos_args, keywords=()):
+        self.walk_inline(name)
 
         if self.raw_strings[-1] == 'print':
             self.raw_imports.add(self.STR_INCLUDE_MODULE_STDIO)
@@ -301,7 +630,7 @@ class TranslatorC:
                 self.write('("\\n")')
             elif len(pos_args) == 1:
                 self.write('(')
-                self.walk(pos_args[0])
+                self.walk_inline(pos_args[0])
                 last_row = self.raw_strings[-1]
                 if last_row.endswith('"'):
                     self.raw_strings.pop()
@@ -317,6 +646,11 @@ class TranslatorC:
 
                 self.write(')')
         else:
+            function_data = self.get_variable_data(name.id) if isinstance(name, ast.Name) else {}
+            if function_data.get('multi_return') == 'out_pointers':
+                raise SourceCodeException('Values returned through pointers must be unpacked: `a, b = function()`', name)
+
+            pos_args = self.get_call_arguments(function_data, pos_args, keywords, name)
             self.write('(')
             for pos_arg_index, pos_arg in enumerate(pos_args, 1):
                 self.walk(pos_arg)
@@ -348,18 +682,183 @@ class TranslatorC:
     def process_continue(self):
         self.write(f'{self.ident}continue;\n')
 
-    def process_binary_op(self, operand_left, operator: str, operand_right, is_need_brackets: bool):
-        if operator == '**':
-            self.raw_imports.add(self.STR_INCLUDE_MODULE_MATH)
+    def get_operand_type(self, operand) -> str | None:
+        """
+        Return the C-type of the expression or `None` if it is unknown. Types of subexpressions are remembered by
+        the translator, and the expression is walked by the explicit stack like `get_constant_value` does, so long
+        chains are typed once and without the recursion
+        """
+        operand_types = self.transit_data.setdefault('operand_types', {})
+        stack = [operand]
+        while stack:
+            node = stack[-1]
+            if id(node) in operand_types:
+                stack.pop()
+                continue
+
+            if isinstance(node, ast.BinOp):
+                operands = (node.left, node.right)
+            elif isinstance(node, ast.UnaryOp) and not isinstance(node.op, ast.Not):
+                operands = (node.operand,)
+            else:
+                operands = ()
+
+            not_typed_operands = [operand for operand in operands if id(operand) not in operand_types]
+            if not_typed_operands:
+                stack.extend(reversed(not_typed_operands))
+                continue
+
+            operand_types[id(node)] = self.get_node_type(node, operand_types)
+            stack.pop()
+
+        return operand_types[id(operand)]
+
+    def get_node_type(self, node, operand_types: dict) -> str | None:
+        """Return the C-type of the node by the types of its operands, which are computed already"""
+        if isinstance(node, ast.Constant):
+            return {int: 'int', float: 'double'}.get(type(node.value))
+
+        if isinstance(node, ast.Name):
+            return self.get_variable_data(node.id).get('type')
+
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            return self.get_variable_data(node.value.id).get('type')  # the type of items of the array
+
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return 'int'
+
+            return promote_integer_type(operand_types[id(node.operand)])
+
+        if isinstance(node, ast.BinOp):
+            left_type = operand_types[id(node.left)]
+            right_type = operand_types[id(node.right)]
+            if isinstance(node.op, (ast.LShift, ast.RShift)):
+                return promote_integer_type(left_type) if left_type in INTEGER_TYPES else None
+
+            if isinstance(node.op, ast.Pow):
+                if left_type in INTEGER_TYPES and self.is_non_negative_operand(node.right):
+                    return 'long long'  # the result of `py2c_ipow`
+
+                return 'double' if get_arithmetic_type(left_type, right_type) else None
+
+            return get_arithmetic_type(left_type, right_type)
+
+    def is_integer_operand(self, operand) -> bool:
+        return self.get_operand_type(operand) in INTEGER_TYPES
+
+    def is_non_negative_operand(self, operand) -> bool:
+        """The integer operand is a non-negative constant or has an unsigned type"""
+        if isinstance(operand, ast.Constant):
+            return type(operand.value) is int and operand.value >= 0
+
+        return self.get_operand_type(operand) in UNSIGNED_INTEGER_TYPES
+
+    def process_pow(self, operand_left, operand_right, is_need_brackets: bool):
+        """
+        Small constant exponents are written as multiplications, powers of two - as shifts of `1` of the type of
+        the result, and integer operands (expressions too) are raised by the integer helper. The shift and the helper
+        are used only if the exponent can not be negative, otherwise the result is fractional, so the floating `pow`
+        is called
+        """
+        exponent = operand_right.value if isinstance(operand_right, ast.Constant) else None
+        is_simple_base = isinstance(operand_left, (ast.Name, ast.Attribute, ast.Constant)) or (
+            isinstance(operand_left, ast.Subscript)
+            and isinstance(operand_left.value, ast.Name)
+            and isinstance(operand_left.slice, (ast.Name, ast.Constant))
+        )
+        if type(exponent) is int and 0 <= exponent <= MAX_POW_MULTIPLICATIONS and is_simple_base:
+            if exponent == 0:
+                self.write('1')
+                return
+
+            self.write_lbracket(is_need_brackets and exponent > 1)
+            for index in range(exponent):
+                if index:
+                    self.write(' * ')
+
+                self.walk(operand_left)
+
+            self.write_rbracket(is_need_brackets and exponent > 1)
+        elif (
+            isinstance(operand_left, ast.Constant)
+            and type(operand_left.value) is int
+            and operand_left.value == 2
+            and self.is_non_negative_operand(operand_right)
+        ):
+            parents = self.transit_data['parents']
+            result_type = get_declared_type(self, parents[-1], parents[-2]) if len(parents) >= 2 else None
+            if result_type in SHIFTED_ONE_LITERALS:
+                shifted_one = SHIFTED_ONE_LITERALS[result_type]
+            elif result_type in INTEGER_TYPES:
+                shifted_one = f'({result_type})1'
+            else:
+                shifted_one = DEFAULT_SHIFTED_ONE_LITERAL
+
+            self.write_lbracket(is_need_brackets)
+            self.write(f'{shifted_one} << ')
+            self.walk(operand_right)
+            self.write_rbracket(is_need_brackets)
+        else:
             self.write_lbracket(is_need_brackets)
-            self.write(f'pow(')
+            if self.is_integer_operand(operand_left) and self.is_non_negative_operand(operand_right):
+                self.raw_helpers['py2c_ipow'] = STR_HELPER_IPOW
+                self.write('py2c_ipow(')
+            else:
+                self.raw_imports.add(self.STR_INCLUDE_MODULE_MATH)
+                self.write('pow(')
+
             self.walk(operand_left)
-            self.write(f', ')
+            self.write(', ')
             self.walk(operand_right)
-            self.write(f')')
+            self.write(')')
             self.write_rbracket(is_need_brackets)
-            # if not is_need_brackets:
-            #     self.write(f';')
+
+    def process_division_by_constant(self, operand_left, operator: str, operand_right) -> bool:
+        """
+        Division of an unsigned variable by a constant power of two is written as the shift, and the modulo -
+        as the mask. Division by another constant is written as the multiplication by the reciprocal
+        if `divide_by_reciprocal` is set in the config. Returns `False` if the division is not changed
+        """
+        divisor = operand_right.value if isinstance(operand_right, ast.Constant) else None
+        operand_type = self.get_operand_type(operand_left)
+        if type(divisor) is not int or divisor <= 0 or operand_type not in UNSIGNED_INTEGER_TYPES:
+            return False
+
+        parents = self.transit_data['parents']
+        is_need_brackets = len(parents) < 2 or not isinstance(parents[-2], STATEMENT_NODE_CLASSES)
+        if divisor & (divisor - 1) == 0:
+            self.write_lbracket(is_need_brackets)
+            self.walk(operand_left)
+            if operator == '//':
+                self.write(f' >> {divisor.bit_length() - 1}')
+            else:
+                self.write(f' & {divisor - 1}')
+
+            self.write_rbracket(is_need_brackets)
+            return True
+
+        bits = FIXED_INTEGER_TYPES.get(operand_type, (None,))[0]
+        reciprocal = get_reciprocal(divisor, bits) if bits in (8, 16, 32) else None
+        if not self.config.get('divide_by_reciprocal') or not reciprocal or not isinstance(operand_left, ast.Name):
+            return False
+
+        multiplier, shift, product_bits = reciprocal
+        quotient = f'(({WIDE_UNSIGNED_TYPES[product_bits]}){operand_left.id} * {multiplier}u >> {shift})'
+        self.write_lbracket(is_need_brackets)
+        if operator == '//':
+            self.write(quotient)
+        else:
+            self.write(f'{operand_left.id} - {quotient} * {divisor}')
+
+        self.write_rbracket(is_need_brackets)
+        return True
+
+    def process_binary_op(self, operand_left, operator: str, operand_right, is_need_brackets: bool):
+        if operator == '**':
+            self.process_pow(operand_left, operand_right, is_need_brackets)
+        elif operator in ('//', '%') and self.process_division_by_constant(operand_left, operator, operand_right):
+            pass
         else:
             if operator == '//':  # https://youngcoder.ru/lessons/4/
                 operator = '/'
@@ -375,6 +874,19 @@ class TranslatorC:
         self.walk(operand)
 
     def process_return(self, expression):
+        """Arrays allocated in the heap are freed after the returned value is computed"""
+        if isinstance(expression, ast.Name) and expression.id in self.get_heap_array_names():
+            raise SourceCodeException('The array allocated in the heap can not be returned', expression)
+
+        if self.get_heap_array_names() and expression and not isinstance(expression, (ast.Constant, ast.Name)):
+            result_name = self.make_temporary_name('result')
+            annotation = self.get_variable_data(self.current_function_name).get('annotation', 'int')
+            self.process_init_variable(result_name, expression, annotation)
+            self.write_heap_arrays_freeing()
+            self.write(f'{self.ident}return {result_name};\n')
+            return
+
+        self.write_heap_arrays_freeing()
         self.write(f'{self.ident}return')
         if expression:
             self.write(' ')
@@ -382,15 +894,105 @@ class TranslatorC:
 
         self.write(';\n')
 
+    def get_returned_value_type(self, expression) -> str:
+        if isinstance(expression, ast.Constant) and type(expression.value) in CONSTANT_C_TYPES:
+            return CONSTANT_C_TYPES[type(expression.value)]
+
+        value_type = self.get_operand_type(expression)
+        if value_type is None:
+            raise SourceCodeException(
+                'Type of the returned value is unknown. Annotate the result of the function by the tuple of types',
+                expression,
+            )
+
+        return value_type
+
     def process_multi_return(self, expressions):
-        # TODO: Добавить аргументов к струткуре
-        # TODO: Объявление структуры
-        # TODO: Изменить аннотацию типа функции (struct function_mys)
+        function_data = self.get_variable_data(self.current_function_name)
+        if function_data['return_types'] is None:
+            function_data['return_types'] = [self.get_returned_value_type(element) for element in expressions.elts]
+        elif len(function_data['return_types']) != len(expressions.elts):
+            raise SourceCodeException('The count of returned values differs from the annotation', expressions)
+
+        if function_data['multi_return'] == 'out_pointers':
+            for index, element in enumerate(expressions.elts):
+                self.write(f'{self.ident}*{OUT_ARGUMENT_NAME.format(index=index)} = ')
+                self.walk(element)
+                self.write(';\n')
+
+            self.write_heap_arrays_freeing()
+            self.write(f'{self.ident}return;\n')
+            return
+
         structure_name = f'{self.current_function_name}_mys'
         variable_name = f'_{structure_name}'
         self.process_init_variable(name=variable_name, value_expr=expressions, annotation=f'struct__{structure_name}')
+        self.write_heap_arrays_freeing()
         self.write(f'{self.ident}return {variable_name};\n')
 
+    def process_unpack_call(self, targets, call):
+        """
+        `a, b = function()` writes returned values into the targets. Undeclared targets are declared by types of
+        the values. Pointers to targets of other types are not passed to the function, the values are written
+        into temporaries of the returned types and are assigned to the targets
+        """
+        function_name = call.func.id
+        function_data = self.get_variable_data(function_name)
+        return_types = function_data.get('return_types')
+        if return_types is None:
+            raise SourceCodeException('Types of values returned by the function are unknown yet', call)
+
+        if len(targets) != len(return_types):
+            raise SourceCodeException('The count of targets differs from the count of returned values', call)
+
+        for target, return_type in zip(targets, return_types):
+            if not isinstance(target, (ast.Name, ast.Attribute, ast.Subscript)):
+                raise SourceCodeException('Only names, attributes and items can be targets of unpacking', target)
+
+            if isinstance(target, ast.Name) and not self.get_variable_data(target.id):
+                self.process_init_variable(name=target.id, value_expr=None, annotation=return_type)
+
+        if function_data['multi_return'] == 'out_pointers':
+            out_targets = []
+            converted_targets = []
+            for target, return_type in zip(targets, return_types):
+                if isinstance(target, ast.Name) and self.get_variable_data(target.id).get('type') == return_type:
+                    out_targets.append(target)
+                    continue
+
+                # the callee writes the value of the returned type, so the target of another type gets it through
+                # the temporary
+                temporary_target = ast.Name(id=self.make_temporary_name('out'), ctx=ast.Store())
+                self.process_init_variable(name=temporary_target.id, value_expr=None, annotation=return_type)
+                out_targets.append(temporary_target)
+                converted_targets.append((target, temporary_target))
+
+            self.write(f'{self.ident}{function_name}(')
+            for pos_arg in self.get_call_arguments(function_data, call.args, call.keywords, call):
+                self.walk(pos_arg)
+                self.write(', ')
+
+            for index, target in enumerate(out_targets):
+                self.write('&')
+                self.walk(target)
+                if index < len(out_targets) - 1:
+                    self.write(', ')
+
+            self.write(');\n')
+            for target, temporary_target in converted_targets:
+                self.write(self.ident)
+                self.walk(target)
+                self.write(f' = {temporary_target.id};\n')
+
+            return
+
+        variable_name = self.make_temporary_name('result')
+        self.process_init_variable(name=variable_name, value_expr=call, annotation=f'struct__{function_name}_mys')
+        for index, target in enumerate(targets):
+            self.write(self.ident)
+            self.walk(target)
+            self.write(f' = {variable_name}.item{index};\n')
+
     def process_while(self, condition, body, orelse):
         if orelse:
             self.write(f'{self.ident}unsigned byte success = 1;\n')
@@ -410,18 +1012,23 @@ class TranslatorC:
 
             self.write(f'{self.ident}}}\n\n')
 
+    def build_module_symbols(self, source_code: str) -> dict:
+        from py2c import bytecode_walker
+        translater = type(self)(save_to=None, config=self.config)
+        translater._walk = self._walk
+        bytecode_walker.translate(translater, source_code, save_result=False)
+        return translater.symbols.global_symbols
+
     def walk_throw_module(self, module_name):
         modules_dir = self.config.get('modules_dir')
         if modules_dir:
             module_path = modules_dir / f'{module_name}.py'
             if module_path.exists() and module_path.is_file():
-                from py2c import bytecode_walker
-                translater = TranslatorC(save_to=None)
-                translater._walk = self._walk
-                with open(module_path) as module_file:
-                    bytecode_walker.translate(translater, module_file.read(), save_result=False)
+                if module_path not in self.read_modules:
+                    self.read_modules.append(module_path)
 
-                self.variables_data.update(translater.variables_data)
+                interface = load_module_interface(module_path, self.config, self.build_module_symbols)
+                self.symbols.update(interface['symbols'])
 
     def process_import_from(self, module_name: str, imported_objects: list[tuple[str]], level: int):
         module_name = module_name.replace('.', '/')
@@ -521,7 +1128,7 @@ class TranslatorC:
             self.write('&')
             self.walk(value)
         else:
-            self.walk(value)
+            self.walk_inline(value)
 
             module_name = 'math'
             if self.raw_strings[-1] == module_name:
@@ -542,7 +1149,7 @@ class TranslatorC:
         self.write(']')
 
     def process_array(self, elements, variable_name: str):
-        if variable_name:
+        if variable_name and not self.get_variable_data(variable_name).get('array_sizes'):
             self.set_variable_data(variable_name, array_sizes=[''])
 
         self.write('{')
@@ -553,23 +1160,224 @@ class TranslatorC:
 
         self.write('}')
 
+    def is_same_size(self, annotated_size: str, size) -> bool:
+        """`c: int__3 = [0] * 3` is the same as `c: int = [0] * 3`, if both sizes are the same constant"""
+        return int(annotated_size) == get_constant_value(self, size)
+
+    def process_init_array(self, name: str, item_type: str, item, size):
+        """
+        Allocation of the array `[item] * size`. The array with the size known at the translation time (a constant,
+        a `preproc` constant or their expression) is allocated statically or in the stack. The array with the size
+        known only at runtime is allocated in the heap and is freed at the exit of the function, if `allow_heap`
+        of the config is not `False`. The item, which is not a constant or a name, is evaluated once, and the array is
+        filled by the loop
+        """
+        size_value = get_constant_value(self, size)
+        if type(size_value) is int:
+            if size_value <= 0:
+                raise SourceCodeException('The size of the array must be positive', size)
+
+            array_size = size.id if isinstance(size, ast.Name) else str(size_value)
+            self.write(DeclarationVariableString(Annotation(item_type, [array_size]), name, self, self.level, self.ident))
+            if not isinstance(item, (ast.Constant, ast.Name)) and get_constant_value(self, item) is NOT_CONSTANT:
+                self.write(';\n')
+                self.write_array_filling(name, item_type, item, array_size)
+                return
+
+            self.write(' = {')
+            if isinstance(item, ast.Constant) and item.value == 0:
+                self.write('0')
+            else:
+                for index in range(size_value):
+                    if index:
+                        self.write(', ')
+
+                    self.walk(item)
+
+            self.write('};\n')
+            return
+
+        if not self.config.get('allow_heap', True):
+            raise SourceCodeException(
+                'The size of the array is not known at the translation time, but the heap is not allowed',
+                size,
+            )
+
+        if not self.transit_data.get('heap_arrays') or self.transit_data['heap_arrays'][-1][0] != self.level:
+            raise SourceCodeException(
+                'The array with the size known only at runtime may be allocated only in the body of the function',
+                size,
+            )
+
+        self.raw_imports.add(self.STR_INCLUDE_MODULE_STDLIB)
+        length_name = f'py2c_length_{name}'
+        self.process_init_variable(length_name, size, 'size_t')
+        raw_string = DeclarationVariableString(Annotation(item_type, [length_name]), name, self, self.level, self.ident)
+        self.set_variable_data(name, variable_type='dynamic_array')
+        self.transit_data['heap_arrays'][-1][1].append(name)
+        self.write(raw_string)
+        if isinstance(item, ast.Constant) and item.value == 0:
+            self.write(f' = ({item_type} *)calloc({length_name}, sizeof({item_type}));\n')
+            return
+
+        self.write(f' = ({item_type} *)malloc({length_name} * sizeof({item_type}));\n')
+        self.write_array_filling(name, item_type, item, length_name)
+
+    def write_array_filling(self, name: str, item_type: str, item, length: str):
+        """Fill the array by the item in the loop. The item, which is not a constant or a name, is evaluated once"""
+        if not isinstance(item, (ast.Constant, ast.Name)):
+            item_name = self.make_temporary_name('item')
+            self.process_init_variable(item_name, item, item_type)
+            item = ast.Name(id=item_name)
+
+        index_name = self.make_temporary_name('index')
+        self.process_init_variable(index_name, None, 'size_t')
+        self.write(f'{self.ident}for ({index_name}=0; {index_name}<{length}; {index_name}++) {{\n')
+        self.write(f'{self.ident}    {name}[{index_name}] = ')
+        self.walk(item)
+        self.write(';\n')
+        self.write(f'{self.ident}}}\n\n')
+
+    def get_heap_array_names(self) -> list[str]:
+        heap_arrays = self.transit_data.get('heap_arrays')
+        return heap_arrays[-1][1] if heap_arrays else []
+
+    def write_heap_arrays_freeing(self):
+        for name in reversed(self.get_heap_array_names()):
+            self.write(f'{self.ident}free({name});\n')
+
+    def make_temporary_name(self, prefix: str) -> str:
+        temporary_index = self.transit_data.get('temporaries_count', 0) + 1
+        self.transit_data['temporaries_count'] = temporary_index
+        return f'py2c_{prefix}_{temporary_index}'
+
+    def get_array_data(self, array_name: str) -> tuple[str, str]:
+        """Return the type of items and the length of the one-dimensional array"""
+        variable_data = self.get_variable_data(array_name)
+        if len(variable_data.get('array_sizes', [])) != 1 or not variable_data['array_sizes'][0]:
+            raise SourceCodeException(
+                f'`{array_name}` must be an one-dimensional array declared with its size',
+                self.parent_node,
+            )
+
+        return variable_data['type'], variable_data['array_sizes'][0]
+
+    def process_for_array(
+            self,
+            names: list[str],
+            body,
+            array_names: list[str],
+            index_name: str | None = None,
+            index_start=None,
+    ):
+        """
+        Iterate arrays by pointers: `for x in array`, `for index, x in enumerate(array)`, `for x, y in zip(a, b)`.
+        Zipped arrays must have equal lengths
+        """
+        arrays_data = [self.get_array_data(array_name) for array_name in array_names]
+        length = arrays_data[0][1]
+        if any(array_length != length for _, array_length in arrays_data):
+            raise SourceCodeException('Zipped arrays must have equal lengths', self.parent_node)
+
+        for name, (item_type, _) in zip(names, arrays_data):
+            if not self.get_variable_data(name):
+                self.process_init_variable(name, None, item_type)
+
+        pointer_names = []
+        for item_type, _ in arrays_data:
+            pointer_names.append(self.make_temporary_name('pointer'))
+            self.process_init_variable(pointer_names[-1], None, f'{item_type}__link')
+
+        initializations = [f'{pointer_name}={array_name}' for pointer_name, array_name in zip(pointer_names, array_names)]
+        increments = [f'{pointer_name}++' for pointer_name in pointer_names]
+        if index_name:
+            start_value = get_constant_value(self, index_start) if index_start else 0
+            if not self.get_variable_data(index_name):
+                index_type = None
+                if type(start_value) is int and length.isdigit():
+                    index_type = get_smallest_integer_type(min(start_value, 0), start_value + int(length))
+
+                if index_type in FIXED_INTEGER_TYPES:
+                    self.raw_imports.add(self.STR_INCLUDE_MODULE_STDINT)
+
+                self.process_init_variable(index_name, None, index_type or 'int')
+
+            initializations.append(f'{index_name}=')
+            increments.append(f'{index_name}++')
+
+        self.write(f'{self.ident}for (')
+        self.write(', '.join(initializations))
+        if index_name:
+            if index_start:
+                self.walk(index_start)
+            else:
+                self.write('0')
+
+        self.write(f'; {pointer_names[0]}<{array_names[0]}+{length}; ')
+        self.write(', '.join(increments))
+        self.write(') {\n')
+        self.level += 1
+        for name, pointer_name in zip(names, pointer_names):
+            self.write(f'{self.ident}{name} = *{pointer_name};\n')
+
+        self.level -= 1
+        for expression in body:
+            self.walk(expression, 1)
+
+        self.write(f'{self.ident}}}\n\n')
+
     def process_for_function(self, name: str, body, function_name, args):
+        """
+        Only `range` is supported. The step must be constant, its sign selects the comparison. The bound is
+        evaluated once, like in Python, into the temporary of the type of the bound, so it is not truncated to the type
+        of the loop variable. The undeclared loop variable gets the smallest type covering the range, or
+        the type inferred from all values of the local variable
+        """
+        if function_name != 'range':
+            raise SourceCodeException(f'Unsupported function `{function_name}` in `for`', self.parent_node)
+
+        if not 1 <= len(args) <= 3:
+            raise SourceCodeException('Unsupported count of arguments for `range`', self.parent_node)
+
+        start, stop = (args[0], args[1]) if len(args) >= 2 else (ast.Constant(0), args[0])
+        step = get_constant_value(self, args[2]) if len(args) == 3 else 1
+        if type(step) is not int or step == 0:
+            raise SourceCodeException('The step of `range` must be a constant non-zero integer', self.parent_node)
+
+        start_value = get_constant_value(self, start)
+        stop_value = get_constant_value(self, stop)
+        if not self.get_variable_data(name):
+            loop_type = None
+            if self.current_function_names and self.config.get('infer_integer_types', True):
+                loop_type = self.get_inferred_type(name)
+            elif type(start_value) is int and type(stop_value) is int:
+                exit_value = get_range_exit_value(start_value, stop_value, step)
+                loop_type = get_smallest_integer_type(min(start_value, exit_value), max(start_value, exit_value))
+
+            if loop_type in FIXED_INTEGER_TYPES:
+                self.raw_imports.add(self.STR_INCLUDE_MODULE_STDINT)
+
+            self.process_init_variable(name, None, loop_type or 'int')
+
+        stop_name = None
+        if stop_value is NOT_CONSTANT:
+            stop_name = self.make_temporary_name('stop')
+            stop_type = self.get_operand_type(stop)
+            self.process_init_variable(stop_name, stop, stop_type if stop_type in INTEGER_TYPES else 'long long')
+
         self.write(f'{self.ident}for ({name}=')
-        if len(args) >= 2:
-            self.walk(args[0])
+        self.walk(start)
+        self.write(f'; {name}{"<" if step > 0 else ">"}')
+        if stop_name:
+            self.write(stop_name)
         else:
-            self.write('0')
-
-        self.write(f'; {name}<')
+            self.walk(stop)
 
-        if len(args) == 1:
-            self.walk(args[0])
-        elif len(args) >= 2:
-            self.walk(args[1])
+        if abs(step) == 1:
+            self.write(f'; {name}{"++" if step > 0 else "--"}) {{\n')
         else:
-            raise Exception('Unsupported count of arguments for `range`')
+            self.write(f'; {name}{"+" if step > 0 else "-"}={abs(step)}) {{\n')
 
-        self.write(f'; {name}++) {{\n')
         for expression in body:
             self.walk(expression, 1)
 
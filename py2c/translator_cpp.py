@@ -2,5 +2,5 @@ from py2c.translator_c import TranslatorC
 
 
 class TranslatorCpp(TranslatorC):
-    ...
+    IS_OVERLOADING_SUPPORTED = True
 
@@ -0,0 +1,93 @@
+"""
+Analysis of the tree before it is walked. Some facts about a scope are needed before its statements are walked:
+whether the function returns several values and which nodes assign local variables (for the inference of value ranges).
+Statements following terminators are searched too. All of them are collected by one pass over the tree
+"""
+import ast
+from dataclasses import dataclass, field
+
+from py2c.dead_code import STATEMENTS_FIELDS, get_unreachable_statements
+from py2c.range_inference import is_range_node
+
+SCOPE_NODE_CLASSES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+# fields, which never keep nodes of expressions or statements
+SKIPPED_FIELDS = {
+    'ctx', 'op', 'ops', 'id', 'attr', 'name', 'names', 'arg', 'module', 'level', 'kind', 'conversion', 'simple',
+    'is_async', 'type_comment', 'kwd_attrs',
+}
+
+_child_fields = {}
+
+
+def get_child_fields(node_class) -> tuple[str]:
+    """Fields of the class, which may keep nodes, in the reversed order"""
+    fields = _child_fields.get(node_class)
+    if fields is None:
+        fields = _child_fields[node_class] = tuple(
+            field_name for field_name in reversed(node_class._fields) if field_name not in SKIPPED_FIELDS
+        )
+
+    return fields
+
+
+@dataclass
+class ScopeAnalysis:
+    has_multi_return: bool = False
+    range_nodes: list = field(default_factory=list)  # nodes of the scope, which are used by the range inference
+
+
+@dataclass
+class TreeAnalysis:
+    scopes: dict[int, ScopeAnalysis] = field(default_factory=dict)  # scopes by ids of bodies of their nodes
+    unreachable_statements: list = field(default_factory=list)
+
+
+def analyze_body(body: list) -> TreeAnalysis:
+    """
+    Analyze the statements and nested scopes of the body. Nested functions and classes are separate scopes, they are
+    analyzed after the scope, which contains them. Nodes of a scope are visited in the order of the tree
+    """
+    analysis = TreeAnalysis()
+    analysis.unreachable_statements.extend(get_unreachable_statements(body))
+    scopes = [(id(body), body)]
+    while scopes:
+        scope_id, scope_nodes = scopes.pop()
+        scope = analysis.scopes[scope_id] = ScopeAnalysis()
+        nodes = list(reversed(scope_nodes))
+        while nodes:
+            node = nodes.pop()
+            node_class = type(node)
+            if node_class is ast.Name:  # names are the most frequent leaves
+                if type(node.ctx) is not ast.Load:
+                    scope.range_nodes.append(node)
+
+                continue
+
+            if node_class is ast.Constant or node is None:
+                continue
+
+            if node_class is ast.Return:
+                scope.has_multi_return = scope.has_multi_return or type(node.value) is ast.Tuple
+            elif is_range_node(node):
+                scope.range_nodes.append(node)
+
+            if isinstance(node, SCOPE_NODE_CLASSES):
+                children = []
+                scopes.append((id(node.body), children))
+            else:
+                children = nodes
+
+            for field_name in get_child_fields(node_class):
+                value = getattr(node, field_name, None)
+                if type(value) is list:
+                    if field_name in STATEMENTS_FIELDS:
+                        analysis.unreachable_statements.extend(get_unreachable_statements(value))
+
+                    children.extend(reversed(value))
+                elif isinstance(value, ast.AST):
+                    children.append(value)
+
+            if children is not nodes:
+                children.reverse()  # nodes of the nested scope are visited in the order of the tree
+
+    return analysis
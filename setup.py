@@ -40,6 +40,7 @@ setup(
     entry_points={
         'console_scripts': [
             'py2c = py2c.cli:run',
+            'py2c-client = py2c.client:run_client',
         ]
     },
 
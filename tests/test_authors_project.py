@@ -1,6 +1,7 @@
 """Testing examples from the book Белов А. В. "Разработка устройств на микроконтроллерах" """
 import pytest
 
+from py2c.exceptions import DeadCodeWarning
 from py2c.shortcuts import trans_c as trans
 
 
@@ -395,3 +396,11 @@ class TestAuthorsProject:
     @pytest.mark.skip('The source code is not ready for transformin into the original result')
     def test_indic(self):
         assert trans(SOURCE_INDIC) == RESULT_INDIC
+
+    def test_unreachable_code_is_removed(self):
+        with pytest.warns(DeadCodeWarning) as records:
+            result_code = trans(SOURCE_MAIN)
+
+        assert 'return 2;\n}\n' in result_code
+        assert '_delay_us(80)' not in result_code
+        assert any('_delay_us(80)' in str(record.message) for record in records)
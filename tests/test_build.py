@@ -0,0 +1,181 @@
+import pytest
+
+import py2c.build
+from py2c.build import build, build_import_graph, discover_modules
+from py2c.cli import run
+from py2c.depfile import escape_path
+from py2c.exceptions import InvalidAnnotationException
+from py2c.manifest import get_manifest_path, read_manifest
+from py2c.shortcuts import trans_c as trans
+
+MODULES = {
+    'registers.py': "PORTB: 'byte' = 0\nF_CPU: preproc = 8000000\n",
+    'util/delay.py': 'from registers import *\ndef delay_ms(ms: int):\n    PORTB = ms\n',
+    'main.py': 'from registers import *\nfrom util.delay import *\nPORTB = 1\ndelay_ms(F_CPU // 1000)\n',
+    'standalone.py': 'value = 5\n',
+}
+
+
+def write_modules(source_dir):
+    for module_name, source_code in MODULES.items():
+        module_path = source_dir / module_name
+        module_path.parent.mkdir(parents=True, exist_ok=True)
+        module_path.write_text(source_code)
+
+
+class TestBuild:
+    def test_import_graph(self, tmp_path):
+        write_modules(tmp_path)
+        modules = discover_modules(tmp_path)
+        build_import_graph(modules)
+        assert {name: module.dependencies for name, module in modules.items()} == {
+            'main': {'registers', 'util/delay'},
+            'registers': set(),
+            'standalone': set(),
+            'util/delay': {'registers'},
+        }
+
+    def test_build(self, tmp_path):
+        source_dir = tmp_path / 'source'
+        write_modules(source_dir)
+        for jobs in (1, 2):
+            output_dir = tmp_path / f'output{jobs}'
+            report = build(source_dir, output_dir, jobs=jobs)
+            assert report.modules_count == 4
+            assert report.lines_count == 14
+            for module_name, source_code in MODULES.items():
+                expected_code = trans(source_code, config={'modules_dir': source_dir})
+                assert (output_dir / module_name).with_suffix('.c').read_text() == expected_code
+
+    def test_build_command(self, tmp_path, capsys):
+        write_modules(tmp_path)
+        run(['build', str(tmp_path), '-j', '1'])
+        assert (tmp_path / 'main.c').read_text() == trans(MODULES['main.py'], config={'modules_dir': tmp_path})
+        assert capsys.readouterr().out.startswith('Translated 4 modules (14 lines)')
+
+    def test_failed_module(self, tmp_path, capsys):
+        source_dir = tmp_path / 'source'
+        write_modules(source_dir)
+        (source_dir / 'broken.py').write_text('a: a + b = 1\n')
+        for jobs in (1, 2):
+            output_dir = tmp_path / f'output{jobs}'
+            report = build(source_dir, output_dir, jobs=jobs)
+            assert report.modules_count == 4
+            assert list(report.errors) == ['broken']
+            assert report.errors['broken'].startswith('InvalidAnnotationException')
+            assert (output_dir / 'main.c').exists()
+
+        with pytest.raises(SystemExit) as error:
+            run(['build', str(source_dir), '-o', str(tmp_path / 'output'), '-j', '1'])
+
+        assert error.value.code == 1
+
+        assert 'Failed: 1 modules\nbroken: InvalidAnnotationException' in capsys.readouterr().out
+
+    def test_module_is_translated_once(self, tmp_path, monkeypatch):
+        translated_sources = []
+        original_translate = py2c.build.translate
+
+        def counted_translate(translator, source_code, *args, **kwargs):
+            translated_sources.append(source_code)
+            return original_translate(translator, source_code, *args, **kwargs)
+
+        monkeypatch.setattr(py2c.build, 'translate', counted_translate)
+        write_modules(tmp_path)
+        build(tmp_path, jobs=1)
+        assert sorted(translated_sources) == sorted(MODULES.values())
+
+
+class TestIncrementalBuild:
+    def test_unchanged_modules_are_skipped(self, tmp_path):
+        write_modules(tmp_path)
+        assert build(tmp_path, jobs=1).modules_count == 4
+
+        report = build(tmp_path, jobs=1)
+        assert (report.modules_count, report.up_to_date_count) == (0, 4)
+
+        (tmp_path / 'registers.py').write_text(MODULES['registers.py'] + 'DDRB: byte\n')
+        report = build(tmp_path, jobs=1)
+        assert (report.modules_count, report.up_to_date_count) == (3, 1)  # only standalone is not changed
+
+        report = build(tmp_path, jobs=1, force=True)
+        assert (report.modules_count, report.up_to_date_count) == (4, 0)
+
+    def test_manifest_of_file(self, tmp_path):
+        write_modules(tmp_path)
+        main_path = tmp_path / 'main.py'
+        output_path = tmp_path / 'main.c'
+        run([str(main_path), '-m', str(tmp_path)])
+        manifest = read_manifest(output_path)
+        assert manifest['input'] == {str(main_path): manifest['input'][str(main_path)]}
+        assert sorted(manifest['dependencies']) == [str(tmp_path / 'registers.py'), str(tmp_path / 'util/delay.py')]
+        assert get_manifest_path(output_path).name == 'main.c.py2c.json'
+
+        output_path.write_text('changed by hand')
+        run([str(main_path), '-m', str(tmp_path)])
+        assert output_path.read_text() == 'changed by hand'
+
+        (tmp_path / 'util/delay.py').write_text(MODULES['util/delay.py'] + '\n')
+        run([str(main_path), '-m', str(tmp_path)])
+        assert output_path.read_text() == trans(MODULES['main.py'], config={'modules_dir': tmp_path})
+
+
+    def test_failed_translation_keeps_output(self, tmp_path):
+        write_modules(tmp_path)
+        main_path = tmp_path / 'main.py'
+        output_path = tmp_path / 'main.c'
+        assert build(tmp_path, jobs=1).modules_count == 4
+        expected_code = output_path.read_text()
+
+        main_path.write_text(MODULES['main.py'] + 'a: a + b = 1\n')
+        assert build(tmp_path, jobs=1).errors.keys() == {'main'}
+        main_path.write_text(MODULES['main.py'])
+        report = build(tmp_path, jobs=1)
+        assert (report.modules_count, report.up_to_date_count) == (0, 4)
+        assert output_path.read_text() == expected_code
+
+        run([str(main_path), '-m', str(tmp_path)])
+        expected_code = output_path.read_text()
+        main_path.write_text(MODULES['main.py'] + 'a: a + b = 1\n')
+        with pytest.raises(InvalidAnnotationException):
+            run([str(main_path), '-m', str(tmp_path)])
+
+        main_path.write_text(MODULES['main.py'])
+        run([str(main_path), '-m', str(tmp_path)])
+        assert output_path.read_text() == expected_code
+        assert sorted(path.name for path in tmp_path.glob('main.c*')) == ['main.c', 'main.c.py2c.json']
+
+
+class TestDepfile:
+    def test_depfile(self, tmp_path):
+        write_modules(tmp_path)
+        main_path = tmp_path / 'main.py'
+        run([str(main_path), '-m', str(tmp_path), '-MD'])
+        assert (tmp_path / 'main.d').read_text() == (
+            f'{tmp_path / "main.c"}: {main_path} \\\n'
+            f'  {tmp_path / "registers.py"} \\\n'
+            f'  {tmp_path / "util/delay.py"}\n'
+            f'\n{tmp_path / "registers.py"}:\n'
+            f'\n{tmp_path / "util/delay.py"}:\n'
+        )
+
+    def test_depfile_lists_transitive_imports(self, tmp_path):
+        (tmp_path / 'cmod.py').write_text('X: preproc = 1\n')
+        (tmp_path / 'bmod.py').write_text('from cmod import *\n')
+        (tmp_path / 'amod.py').write_text('from bmod import *\ny = X + 1\n')
+        run([str(tmp_path / 'amod.py'), '-m', str(tmp_path), '-MD'])
+        assert (tmp_path / 'amod.d').read_text().startswith(
+            f'{tmp_path / "amod.c"}: {tmp_path / "amod.py"} \\\n'
+            f'  {tmp_path / "bmod.py"} \\\n'
+            f'  {tmp_path / "cmod.py"}\n'
+        )
+
+    def test_depfile_with_filename(self, tmp_path):
+        write_modules(tmp_path)
+        depfile_path = tmp_path / 'deps' / 'standalone.dep'
+        depfile_path.parent.mkdir()
+        run([str(tmp_path / 'standalone.py'), '-m', str(tmp_path), '-MF', str(depfile_path)])
+        assert depfile_path.read_text() == f'{tmp_path / "standalone.c"}: {tmp_path / "standalone.py"}\n'
+
+    def test_escaping(self):
+        assert escape_path('my dir/#1/$module.py') == 'my\\ dir/\\#1/$$module.py'
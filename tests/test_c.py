@@ -1,11 +1,22 @@
+import ast
+from io import StringIO
+
 import pytest
 from pytest import raises
 
+from py2c import shortcuts
+from py2c.bytecode_walker import register_walker, translate, translate_tree
 from py2c.exceptions import (
+    DeadCodeWarning,
     InvalidAnnotationException,
     NoneIsNotAllowedException,
+    SourceCodeException,
 )
-from py2c.shortcuts import trans_c as trans
+from py2c.shortcuts import trans_c as trans, trans_cpp
+from py2c.symbol_table import SymbolTable
+from py2c.translator_c import STR_HELPER_IPOW, TranslatorC, get_reciprocal
+from py2c.translator_cpp import TranslatorCpp
+from py2c.tree_analysis import analyze_body
 
 
 class TestOperatorsAndVariables:
@@ -219,16 +230,15 @@ class TestFunction:
         source_code = (
             'def function(arg1: float, arg2: char, arg3: int = 10) -> int:\n'
             '    a: int = 5\n'
-            '    return a + arg1'
+            '    return a + arg1\n'
+            'b: int = function(1.5, c)'
         )
         result_code = (
             'int function(float arg1, char arg2, int arg3) {\n'
             '    int a = 5;\n'
             '    return a + arg1;\n'
             '}\n'
-            'int function(float arg1, char arg2) {\n'
-            '    return function(arg1, arg2, 10);\n'
-            '}\n'
+            'int b = function(1.5, c, 10);\n'
         )
         assert trans(source_code) == result_code
 
@@ -236,23 +246,73 @@ class TestFunction:
         source_code = (
             'def function(arg1: float, arg2: char, arg3: int = 10, arg4: int = 55) -> int:\n'
             '    a: int = 5\n'
-            '    return a + arg1'
+            '    return a + arg1\n'
+            'function(1.5, c)\n'
+            'function(1.5, c, 2)\n'
+            'function(1.5, c, arg4=3)\n'
+            'function(arg2=c, arg1=1.5)'
         )
         result_code = (
             'int function(float arg1, char arg2, int arg3, int arg4) {\n'
             '    int a = 5;\n'
             '    return a + arg1;\n'
             '}\n'
-            'int function(float arg1, char arg2, int arg3) {\n'
-            '    return function(arg1, arg2, arg3, 55);\n'
+            'function(1.5, c, 10, 55);\n'
+            'function(1.5, c, 2, 55);\n'
+            'function(1.5, c, 10, 3);\n'
+            'function(1.5, c, 10, 55);\n'
+        )
+        assert trans(source_code) == result_code
+        assert trans(source_code, config={'iterative_walk': True}) == result_code
+
+    def test_calling_function_defined_below(self):
+        source_code = (
+            'def a():\n'
+            '    b(1)\n'
+            'def b(x: int, y: int = 2):\n'
+            '    pass'
+        )
+        result_code = (
+            'void a(void) {\n'
+            '    b(1, 2);\n'
             '}\n'
-            'int function(float arg1, char arg2) {\n'
-            '    return function(arg1, arg2, 10, 55);\n'
+            'void b(int x, int y) {\n'
             '}\n'
         )
         assert trans(source_code) == result_code
 
-    def test_function_with_default_ars_no_return(self):
+        with raises(SourceCodeException):
+            trans('def a():\n    b()\ndef b(x: int, y: int = 2):\n    pass')
+
+    def test_function_is_declared_once(self, monkeypatch):
+        declared_functions = []
+        original_set_variable_data = TranslatorC.set_variable_data
+
+        def counted_set_variable_data(translator, name, **kwargs):
+            if kwargs.get('type') == 'function':
+                declared_functions.append(name)
+
+            return original_set_variable_data(translator, name, **kwargs)
+
+        monkeypatch.setattr(TranslatorC, 'set_variable_data', counted_set_variable_data)
+        trans('def a():\n    b(1)\ndef b(x: int, y: int = 2):\n    return x, y\na()')
+        assert declared_functions == ['a', 'b']
+
+    def test_function_with_wrong_args(self):
+        function_code = 'def function(arg1: float, arg2: int = 10):\n    pass\n'
+        with raises(SourceCodeException):
+            trans(f'{function_code}function()')
+
+        with raises(SourceCodeException):
+            trans(f'{function_code}function(1.5, 2, 3)')
+
+        with raises(SourceCodeException):
+            trans(f'{function_code}function(1.5, arg3=3)')
+
+        with raises(SourceCodeException):
+            trans(f'{function_code}function(1.5, arg1=3)')
+
+    def test_default_args_wrappers(self):
         source_code = (
             'def function(arg1: float, arg2: char, arg3: int = 10, arg4: int = 55):\n'
             '    a: int = 5\n'
@@ -263,14 +323,29 @@ class TestFunction:
             '    int a = 5;\n'
             '    a = a + arg1;\n'
             '}\n'
-            'void function(float arg1, char arg2, int arg3) {\n'
+            'static inline void function__3(float arg1, char arg2, int arg3) {\n'
             '    function(arg1, arg2, arg3, 55);\n'
             '}\n'
-            'void function(float arg1, char arg2) {\n'
+            'static inline void function__2(float arg1, char arg2) {\n'
             '    function(arg1, arg2, 10, 55);\n'
             '}\n'
         )
-        assert trans(source_code) == result_code
+        assert trans(source_code, config={'default_args_wrappers': True}) == result_code
+
+    def test_default_args_wrappers_cpp(self):
+        source_code = (
+            'def function(arg1: int = 10) -> int:\n'
+            '    return arg1'
+        )
+        result_code = (
+            'int function(int arg1) {\n'
+            '    return arg1;\n'
+            '}\n'
+            'static inline int function(void) {\n'
+            '    return function(10);\n'
+            '}\n'
+        )
+        assert trans_cpp(source_code, config={'default_args_wrappers': True}) == result_code
 
     def test_calling_function(self):
         source_code = 'function(arg1, 1)'
@@ -679,9 +754,141 @@ class TestBoolean:
 class TestFor:
     def test_for(self):
         source_code = 'for j in range(0, 5): pass'
-        result_code = 'for (j=0; j<5; j++) {\n}\n\n'
+        result_code = '#include <stdint.h>\n\nuint8_t j;\nfor (j=0; j<5; j++) {\n}\n\n'
+        assert trans(source_code) == result_code
+
+    def test_declared_variable(self):
+        source_code = (
+            'j: int = 0\n'
+            'for j in range(5): pass'
+        )
+        result_code = 'int j = 0;\nfor (j=0; j<5; j++) {\n}\n\n'
+        assert trans(source_code) == result_code
+
+    def test_step(self):
+        source_code = (
+            'for j in range(0, 300, 3): pass\n'
+            'for k in range(10, -1, -1): pass\n'
+            'for m in range(10, 0, -2): pass'
+        )
+        result_code = (
+            '#include <stdint.h>\n\n'
+            'uint16_t j;\n'
+            'for (j=0; j<300; j+=3) {\n}\n\n'
+            'int8_t k;\n'
+            'for (k=10; k>-1; k--) {\n}\n\n'
+            'uint8_t m;\n'
+            'for (m=10; m>0; m-=2) {\n}\n\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_bound_has_its_own_type(self):
+        source_code = (
+            'def function(n: int, m: uint16_t):\n'
+            '    i: uint8_t = 0\n'
+            '    for i in range(n):\n'
+            '        pass\n'
+            '    for i in range(m):\n'
+            '        pass\n'
+            '    for i in range(f(n)):\n'
+            '        pass'
+        )
+        result_code = (
+            'void function(int n, uint16_t m) {\n'
+            '    uint8_t i = 0;\n'
+            '    int py2c_stop_1 = n;\n'
+            '    for (i=0; i<py2c_stop_1; i++) {\n'
+            '    }\n\n'
+            '    uint16_t py2c_stop_2 = m;\n'
+            '    for (i=0; i<py2c_stop_2; i++) {\n'
+            '    }\n\n'
+            '    long long py2c_stop_3 = f(n);\n'
+            '    for (i=0; i<py2c_stop_3; i++) {\n'
+            '    }\n\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_bound_is_evaluated_once(self):
+        source_code = (
+            'def function(n: int):\n'
+            '    for j in range(1, n * 2):\n'
+            '        n -= 1'
+        )
+        result_code = (
+            'void function(int n) {\n'
+            '    int j;\n'
+            '    int py2c_stop_1 = n * 2;\n'
+            '    for (j=1; j<py2c_stop_1; j++) {\n'
+            '        n -= 1;\n'
+            '    }\n\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_array(self):
+        source_code = (
+            'a: uint8_t__5 = [1, 2, 3, 4, 5]\n'
+            'total: int = 0\n'
+            'for x in a:\n'
+            '    total += x'
+        )
+        result_code = (
+            'uint8_t a[5] = {1, 2, 3, 4, 5};\n'
+            'int total = 0;\n'
+            'uint8_t x;\n'
+            'uint8_t *py2c_pointer_1;\n'
+            'for (py2c_pointer_1=a; py2c_pointer_1<a+5; py2c_pointer_1++) {\n'
+            '    x = *py2c_pointer_1;\n'
+            '    total += x;\n'
+            '}\n\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_enumerate_and_zip(self):
+        source_code = (
+            'a: uint8_t__3 = [1, 2, 3]\n'
+            'b: int__3 = [4, 5, 6]\n'
+            'for i, x in enumerate(a, 1): pass\n'
+            'for x, y in zip(a, b): pass'
+        )
+        result_code = (
+            '#include <stdint.h>\n\n'
+            'uint8_t a[3] = {1, 2, 3};\n'
+            'int b[3] = {4, 5, 6};\n'
+            'uint8_t x;\n'
+            'uint8_t *py2c_pointer_1;\n'
+            'uint8_t i;\n'
+            'for (py2c_pointer_1=a, i=1; py2c_pointer_1<a+3; py2c_pointer_1++, i++) {\n'
+            '    x = *py2c_pointer_1;\n'
+            '}\n\n'
+            'int y;\n'
+            'uint8_t *py2c_pointer_2;\n'
+            'int *py2c_pointer_3;\n'
+            'for (py2c_pointer_2=a, py2c_pointer_3=b; py2c_pointer_2<a+3; py2c_pointer_2++, py2c_pointer_3++) {\n'
+            '    x = *py2c_pointer_2;\n'
+            '    y = *py2c_pointer_3;\n'
+            '}\n\n'
+        )
         assert trans(source_code) == result_code
 
+    @pytest.mark.parametrize(
+        'source_code',
+        (
+            'for j in some_function(5): pass',
+            'for j in range(0, 5, step): pass',
+            'for j in range(0, 5, 0): pass',
+            'for j in range(): pass',
+            'for x in undeclared_array: pass',
+            'a: int__link = [1, 2]\nfor x in a: pass',
+            'a: int__2 = [1, 2]\nb: int__3 = [1, 2, 3]\nfor x, y in zip(a, b): pass',
+            'a: int__2 = [1, 2]\nfor x, y in zip(a, [1, 2]): pass',
+        ),
+    )
+    def test_unsupported_loops(self, source_code):
+        with raises(SourceCodeException):
+            trans(source_code)
+
 
 class TestReturningSeveralValues:
     def test_several_values(self):
@@ -692,7 +899,11 @@ class TestReturningSeveralValues:
             '    return value1, value2'
         )
         result_code = (
-            'int function(void) {\n'
+            'struct function_mys {\n'
+            '    int item0;\n'
+            '    char item1;\n'
+            '};\n'
+            'struct function_mys function(void) {\n'
             '    int value1 = 5;\n'
             '    char value2 = "k";\n'
             '    struct function_mys _function_mys = {value1, value2};\n'
@@ -701,6 +912,398 @@ class TestReturningSeveralValues:
         )
         assert trans(source_code) == result_code
 
+    def test_annotated_types(self):
+        source_code = (
+            'def function(a: int) -> (long, float):\n'
+            '    return a, 1'
+        )
+        result_code = (
+            'struct function_mys {\n'
+            '    long item0;\n'
+            '    float item1;\n'
+            '};\n'
+            'struct function_mys function(int a) {\n'
+            '    struct function_mys _function_mys = {a, 1};\n'
+            '    return _function_mys;\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_unknown_type(self):
+        with raises(SourceCodeException):
+            trans('def function():\n    return a, 1')
+
+    def test_unpacking(self):
+        source_code = (
+            'def function(a: int) -> (int, int):\n'
+            '    return a, 1\n'
+            'x: int = 0\n'
+            'x, y = function(5)'
+        )
+        result_code = (
+            'struct function_mys {\n'
+            '    int item0;\n'
+            '    int item1;\n'
+            '};\n'
+            'struct function_mys function(int a) {\n'
+            '    struct function_mys _function_mys = {a, 1};\n'
+            '    return _function_mys;\n'
+            '}\n'
+            'int x = 0;\n'
+            'int y;\n'
+            'struct function_mys py2c_result_1 = function(5);\n'
+            'x = py2c_result_1.item0;\n'
+            'y = py2c_result_1.item1;\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_unpacking_wrong_count(self):
+        source_code = (
+            'def function(a: int) -> (int, int):\n'
+            '    return a, 1\n'
+            'x, y, z = function(5)'
+        )
+        with raises(SourceCodeException):
+            trans(source_code)
+
+    def test_out_pointers(self):
+        source_code = (
+            'def function(a: int):\n'
+            '    b: float = 2.5\n'
+            '    return a, b\n'
+            'x, y = function(5)'
+        )
+        result_code = (
+            'void function(int a, int *py2c_out_0, float *py2c_out_1) {\n'
+            '    float b = 2.5;\n'
+            '    *py2c_out_0 = a;\n'
+            '    *py2c_out_1 = b;\n'
+            '    return;\n'
+            '}\n'
+            'int x;\n'
+            'float y;\n'
+            'function(5, &x, &y);\n'
+        )
+        config = {'multi_return': 'out_pointers'}
+        assert trans(source_code, config=config) == result_code
+        assert trans(source_code, config={**config, 'iterative_walk': True}) == result_code
+
+    def test_out_pointers_without_arguments(self):
+        source_code = (
+            'def function() -> (int, int):\n'
+            '    return 1, 2'
+        )
+        result_code = (
+            'void function(int *py2c_out_0, int *py2c_out_1) {\n'
+            '    *py2c_out_0 = 1;\n'
+            '    *py2c_out_1 = 2;\n'
+            '    return;\n'
+            '}\n'
+        )
+        assert trans(source_code, config={'multi_return': 'out_pointers'}) == result_code
+
+
+    def test_out_pointers_to_targets_of_other_types(self):
+        source_code = (
+            'def function(a: int) -> (int, int):\n'
+            '    return a, 1\n'
+            'x: uint8_t = 0\n'
+            'table: int__2\n'
+            'x, table[1] = function(5)'
+        )
+        result_code = (
+            'void function(int a, int *py2c_out_0, int *py2c_out_1) {\n'
+            '    *py2c_out_0 = a;\n'
+            '    *py2c_out_1 = 1;\n'
+            '    return;\n'
+            '}\n'
+            'uint8_t x = 0;\n'
+            'int table[2];\n'
+            'int py2c_out_1;\n'
+            'int py2c_out_2;\n'
+            'function(5, &py2c_out_1, &py2c_out_2);\n'
+            'x = py2c_out_1;\n'
+            'table[1] = py2c_out_2;\n'
+        )
+        assert trans(source_code, config={'multi_return': 'out_pointers'}) == result_code
+
+    def test_out_pointers_without_unpacking(self):
+        source_code = (
+            'def function(a: int, b: int = 2) -> (int, int):\n'
+            '    return a, b\n'
+        )
+        for statement in ('r = function(5)', 'function(5)'):
+            with raises(SourceCodeException):
+                trans(source_code + statement, config={'multi_return': 'out_pointers'})
+
+
+class TestRangeInference:
+    def test_constants(self):
+        source_code = (
+            'def function():\n'
+            '    a = 5\n'
+            '    a = 200\n'
+            '    b = -5\n'
+            '    c = 1000\n'
+            '    d = 2 * 35000\n'
+            '    e = 1.5'
+        )
+        result_code = (
+            '#include <stdint.h>\n'
+            '\n'
+            'void function(void) {\n'
+            '    uint8_t a = 5;\n'
+            '    a = 200;\n'
+            '    int8_t b = -5;\n'
+            '    uint16_t c = 1000;\n'
+            '    uint32_t d = 70000;\n'
+            '    float e = 1.5;\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_preproc_constant(self):
+        source_code = (
+            'F_CPU: preproc = 8000000\n'
+            'def function():\n'
+            '    a = F_CPU // 1000'
+        )
+        result_code = (
+            '#include <stdint.h>\n'
+            '\n'
+            '#define F_CPU 8000000\n'
+            'void function(void) {\n'
+            '    uint16_t a = 8000;\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_loop_bounds(self):
+        source_code = (
+            'def function():\n'
+            '    i = -1\n'
+            '    for i in range(300):\n'
+            '        pass'
+        )
+        result_code = (
+            '#include <stdint.h>\n'
+            '\n'
+            'void function(void) {\n'
+            '    int16_t i = -1;\n'
+            '    for (i=0; i<300; i++) {\n'
+            '    }\n'
+            '\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_not_constant_assignments(self):
+        source_code = (
+            'def function(n: int):\n'
+            '    a = 1\n'
+            '    a += 1\n'
+            '    b = 1\n'
+            '    b = n\n'
+            '    for i in range(n):\n'
+            '        pass\n'
+            '    for j in range(10):\n'
+            '        j = n'
+        )
+        result_code = (
+            'void function(int n) {\n'
+            '    int a = 1;\n'
+            '    a += 1;\n'
+            '    int b = 1;\n'
+            '    b = n;\n'
+            '    int i;\n'
+            '    int py2c_stop_1 = n;\n'
+            '    for (i=0; i<py2c_stop_1; i++) {\n'
+            '    }\n'
+            '\n'
+            '    int j;\n'
+            '    for (j=0; j<10; j++) {\n'
+            '        j = n;\n'
+            '    }\n'
+            '\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_variables_with_taken_address_are_not_inferred(self):
+        source_code = (
+            'def function():\n'
+            '    x = 0\n'
+            '    read_value(x.link)'
+        )
+        result_code = (
+            'void function(void) {\n'
+            '    int x = 0;\n'
+            '    read_value(&x);\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_global_variables_are_not_inferred(self):
+        source_code = (
+            'a = 1\n'
+            'def function():\n'
+            '    global b\n'
+            '    b = 1'
+        )
+        assert trans(source_code).startswith('int a = 1;\n')
+        assert 'uint8_t' not in trans(source_code)
+
+    def test_disabling(self):
+        source_code = 'def function():\n    a = 1'
+        result_code = 'void function(void) {\n    int a = 1;\n}\n'
+        assert trans(source_code, config={'infer_integer_types': False}) == result_code
+
+
+class TestAllocation:
+    def test_static_arrays(self):
+        source_code = (
+            'SIZE: preproc = 8\n'
+            'table: uint8_t = [0] * SIZE\n'
+            'ones: int = 3 * [1]\n'
+            'doubled: int = [0] * (SIZE * 2)'
+        )
+        result_code = (
+            '#define SIZE 8\n'
+            'uint8_t table[SIZE] = {0};\n'
+            'int ones[3] = {1, 1, 1};\n'
+            'int doubled[16] = {0};\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_stack_array(self):
+        source_code = (
+            'def function():\n'
+            '    buffer: char = [0] * 4\n'
+            '    for item in buffer:\n'
+            '        pass'
+        )
+        result_code = (
+            'void function(void) {\n'
+            '    char buffer[4] = {0};\n'
+            '    char item;\n'
+            '    char *py2c_pointer_1;\n'
+            '    for (py2c_pointer_1=buffer; py2c_pointer_1<buffer+4; py2c_pointer_1++) {\n'
+            '        item = *py2c_pointer_1;\n'
+            '    }\n'
+            '\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_heap_arrays(self):
+        source_code = (
+            'def function(n: int) -> int:\n'
+            '    zeros: int = [0] * n\n'
+            '    sevens: int = [7] * (n + 1)\n'
+            '    if n > 5:\n'
+            '        return zeros[0] + sevens[0]\n'
+            '    return n'
+        )
+        result_code = (
+            '#include <stdlib.h>\n'
+            '\n'
+            'int function(int n) {\n'
+            '    size_t py2c_length_zeros = n;\n'
+            '    int *zeros = (int *)calloc(py2c_length_zeros, sizeof(int));\n'
+            '    size_t py2c_length_sevens = n + 1;\n'
+            '    int *sevens = (int *)malloc(py2c_length_sevens * sizeof(int));\n'
+            '    size_t py2c_index_1;\n'
+            '    for (py2c_index_1=0; py2c_index_1<py2c_length_sevens; py2c_index_1++) {\n'
+            '        sevens[py2c_index_1] = 7;\n'
+            '    }\n'
+            '\n'
+            '    if (n > 5) {\n'
+            '        int py2c_result_2 = zeros[0] + sevens[0];\n'
+            '        free(sevens);\n'
+            '        free(zeros);\n'
+            '        return py2c_result_2;\n'
+            '    }\n'
+            '\n'
+            '    free(sevens);\n'
+            '    free(zeros);\n'
+            '    return n;\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+        assert trans(source_code, config={'iterative_walk': True}) == result_code
+
+    def test_heap_array_is_freed_at_function_exit(self):
+        source_code = (
+            'def function(n: int):\n'
+            '    buffer: char = [0] * n'
+        )
+        result_code = (
+            '#include <stdlib.h>\n'
+            '\n'
+            'void function(int n) {\n'
+            '    size_t py2c_length_buffer = n;\n'
+            '    char *buffer = (char *)calloc(py2c_length_buffer, sizeof(char));\n'
+            '    free(buffer);\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_heap_is_not_allowed(self):
+        source_code = 'def function(n: int):\n    buffer: char = [0] * n'
+        with raises(SourceCodeException):
+            trans(source_code, config={'allow_heap': False})
+
+    def test_invalid_heap_arrays(self):
+        with raises(SourceCodeException):
+            trans('buffer: char = [0] * n')
+
+        with raises(SourceCodeException):
+            trans('def function(n: int):\n    if n:\n        buffer: char = [0] * n')
+
+        with raises(SourceCodeException):
+            trans('def function(n: int) -> char__link:\n    buffer: char = [0] * n\n    return buffer')
+
+    def test_sized_annotation(self):
+        source_code = (
+            'SIZE: preproc = 8\n'
+            'c: int__3 = [0] * 3\n'
+            'table: uint8_t__8 = [1] * SIZE'
+        )
+        result_code = (
+            '#define SIZE 8\n'
+            'int c[3] = {0};\n'
+            'uint8_t table[SIZE] = {1, 1, 1, 1, 1, 1, 1, 1};\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_static_array_of_expression_items(self):
+        source_code = (
+            'def function(n: int):\n'
+            '    values: int = [g(n)] * 3'
+        )
+        result_code = (
+            'void function(int n) {\n'
+            '    int values[3];\n'
+            '    int py2c_item_1 = g(n);\n'
+            '    size_t py2c_index_2;\n'
+            '    for (py2c_index_2=0; py2c_index_2<3; py2c_index_2++) {\n'
+            '        values[py2c_index_2] = py2c_item_1;\n'
+            '    }\n'
+            '\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_invalid_arrays(self):
+        with raises(SourceCodeException):
+            trans('buffer: char__5 = [0] * 4')
+
+        with raises(SourceCodeException):
+            trans('buffer: char__4__2 = [0] * 4')
+
+        with raises(SourceCodeException):
+            trans('buffer: char = [0] * 0')
+
 
 class TestPow:
     def test_pow(self):
@@ -717,15 +1320,97 @@ class TestPow:
         source_code = (
             'from module1 import *\n'
             'a: int = 10\n'
-            'b: int = 3\n'
+            'b: uint8_t = 3\n'
             'c: int = a ** b'
         )
         result_code = (
-            '#include "math.h"\n'
             '#include "module1.h"\n\n'
+            + STR_HELPER_IPOW
+            + '\n'
             'int a = 10;\n'
-            'int b = 3;\n'
-            'int c = pow(a, b);\n'
+            'uint8_t b = 3;\n'
+            'int c = py2c_ipow(a, b);\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_small_exponents_and_powers_of_two(self):
+        source_code = (
+            'x: float = 1.5\n'
+            'n: uint8_t = 3\n'
+            'a: float = x ** 2\n'
+            'b: float = 1 + x ** 3\n'
+            'c: int = x ** 0\n'
+            'd: long = 2 ** n\n'
+            'e: float = x ** n'
+        )
+        result_code = (
+            '#include "math.h"\n\n'
+            'float x = 1.5;\n'
+            'uint8_t n = 3;\n'
+            'float a = x * x;\n'
+            'float b = 1 + (x * x * x);\n'
+            'int c = 1;\n'
+            'long d = 1L << n;\n'
+            'float e = pow(x, n);\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_pow_of_integer_expressions(self):
+        source_code = (
+            'n: int = 3\n'
+            'table: uint8_t__4\n'
+            'a: int = (n + 1) ** 2\n'
+            'b: int = (n << 1) ** table[1]\n'
+            'c: int = table[0] ** 3\n'
+            'd: int = (-n) ** 2'
+        )
+        result_code = (
+            f'{STR_HELPER_IPOW}\n'
+            'int n = 3;\n'
+            'uint8_t table[4];\n'
+            'int a = py2c_ipow((n + 1), 2);\n'
+            'int b = py2c_ipow((n << 1), table[1]);\n'
+            'int c = table[0] * table[0] * table[0];\n'
+            'int d = py2c_ipow(-n, 2);\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_power_of_two_has_width_of_result(self):
+        source_code = (
+            'n: uint8_t = 40\n'
+            'a: int = 2 ** n\n'
+            'b: uint64_t = 2 ** n\n'
+            'c: unsigned__long__long = 2 ** n\n'
+            'd: int = (2 ** n) + 1'
+        )
+        result_code = (
+            'uint8_t n = 40;\n'
+            'int a = 1 << n;\n'
+            'uint64_t b = (uint64_t)1 << n;\n'
+            'unsigned long long c = 1ULL << n;\n'
+            'int d = (1LL << n) + 1;\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_negative_exponents(self):
+        source_code = (
+            'n: int = -1\n'
+            'm: int = 3\n'
+            'a: float = 2 ** n\n'
+            'b: float = m ** n\n'
+            'c: float = (m + 1) ** -1\n'
+            'd: float = 2 ** -m\n'
+            'e: float = 2 ** -1'
+        )
+        result_code = (
+            '#include "math.h"\n\n'
+            'int n = -1;\n'
+            'int m = 3;\n'
+            'float a = pow(2, n);\n'
+            'float b = pow(m, n);\n'
+            'float c = pow((m + 1), -1);\n'
+            'float d = pow(2, -m);\n'
+            'float e = pow(2, -1);\n'
         )
         assert trans(source_code) == result_code
 
@@ -815,3 +1500,380 @@ class TestPrint:
             '\n'
         )
         assert trans(source_code) == result_code
+
+
+class TestWalkers:
+    def test_translator_walker_overrides_common_walker(self):
+        class TranslatorUpperNames(TranslatorC):
+            pass
+
+        @register_walker(ast.Name, translator_class=TranslatorUpperNames)
+        def walk_name(converter, node, parent_node):
+            converter.process_name(node.id.upper())
+
+        source_code = 'variable1 = variable2 + 1'
+        assert shortcuts.trans(source_code, TranslatorUpperNames) == 'VARIABLE1 = VARIABLE2 + 1;\n'
+        assert shortcuts.trans(source_code, TranslatorC) == 'variable1 = variable2 + 1;\n'
+
+
+class TestIterativeWalk:
+    @pytest.mark.parametrize(
+        'source_code',
+        (
+            'a: int = b | c & ~d ^ (e << 2) ** f\nprint(x + "a")\nprint()',
+            'variable: int = function(arg1, 5 if c > 45 else d)\nvalue: int = array_struct[i+5].struct_field',
+            'TEST_FUNC: preproc = lambda x, y: x-y*7\nvariable: int = [5, 10, 15]',
+            (
+                'def function(arg1: float, arg2: char, arg3: int = 10, arg4: int = 1 + 2) -> int:\n'
+                '    """ docstring"""\n'
+                '    a: int = 5\n'
+                '    while a < 10:\n'
+                '        a += (1 if a > 3 else 2)\n'
+                '        if (y + 2 and x < a) or x > 30:\n'
+                '            break\n'
+                '    else:\n'
+                '        a = math.sqrt(a ** 2)\n'
+                '    return a + arg1'
+            ),
+        ),
+    )
+    def test_same_output_as_recursive_walk(self, source_code):
+        assert trans(source_code, config={'iterative_walk': True}) == trans(source_code)
+
+    def test_long_binary_op_chain(self):
+        terms_count = 10000
+        expression = ast.Name(id='v0', ctx=ast.Load())
+        for index in range(1, terms_count):
+            expression = ast.BinOp(left=expression, op=ast.BitOr(), right=ast.Name(id=f'v{index}', ctx=ast.Load()))
+
+        tree = ast.Module(
+            body=[
+                ast.AnnAssign(
+                    target=ast.Name(id='value', ctx=ast.Store()),
+                    annotation=ast.Name(id='int', ctx=ast.Load()),
+                    value=expression,
+                    simple=1,
+                ),
+            ],
+            type_ignores=[],
+        )
+        output = StringIO()
+        translate_tree(TranslatorC(save_to=output, config={'iterative_walk': True}), tree)
+        expression_code = 'v0'
+        for index in range(1, terms_count - 1):
+            expression_code = f'({expression_code} | v{index})'
+
+        assert output.getvalue() == f'int value = {expression_code} | v{terms_count - 1};\n'
+
+    def test_long_floor_division_chain(self):
+        terms_count = 10000
+        expression = ast.Name(id='v0', ctx=ast.Load())
+        for index in range(1, terms_count):
+            expression = ast.BinOp(left=expression, op=ast.FloorDiv(), right=ast.Constant(value=2))
+
+        tree = ast.Module(
+            body=[
+                ast.AnnAssign(
+                    target=ast.Name(id='value', ctx=ast.Store()),
+                    annotation=ast.Name(id='int', ctx=ast.Load()),
+                    value=expression,
+                    simple=1,
+                ),
+            ],
+            type_ignores=[],
+        )
+        output = StringIO()
+        translate_tree(TranslatorC(save_to=output, config={'iterative_walk': True}), tree)
+        expression_code = 'v0'
+        for index in range(1, terms_count - 1):
+            expression_code = f'({expression_code} / 2)'
+
+        assert output.getvalue() == f'int value = {expression_code} / 2;\n'
+
+    def test_long_foldable_chain(self):
+        source_code = 'value: int = ' + ' + '.join(['1'] * 2500)
+        assert trans(source_code, config={'iterative_walk': True}) == 'int value = 2500;\n'
+
+
+class TestReusableTree:
+    def test_tree_is_not_changed_by_translating(self):
+        source_code = (
+            'def function(arg1: int, arg2: int = 10) -> int:\n'
+            '    """ docstring"""\n'
+            '    if arg1 > 1:\n'
+            '        arg1 = 2\n'
+            '    elif arg1 < -10:\n'
+            '        arg1 = 4\n'
+            '    else:\n'
+            '        arg1 = 3\n'
+            '    return arg1 + arg2'
+        )
+        tree = ast.parse(source_code)
+        dumped_tree = ast.dump(tree, include_attributes=True)
+        outputs = []
+        for translator_class, config in (
+            (TranslatorC, None),
+            (TranslatorCpp, None),
+            (TranslatorC, {'iterative_walk': True}),
+        ):
+            output = StringIO()
+            translate_tree(translator_class(save_to=output, config=config), tree)
+            outputs.append(output.getvalue())
+
+        assert ast.dump(tree, include_attributes=True) == dumped_tree
+        assert outputs[0] == outputs[1] == outputs[2] == trans(source_code)
+
+
+class TestScopes:
+    def test_local_variables_are_released_with_function(self):
+        source_code = (
+            'def function1():\n'
+            '    x = 1\n'
+            '    x = 3\n'
+            'def function2(y: int):\n'
+            '    x = 2\n'
+            '    y = 5\n'
+            'x = 4'
+        )
+        result_code = (
+            '#include <stdint.h>\n'
+            '\n'
+            'void function1(void) {\n'
+            '    uint8_t x = 1;\n'
+            '    x = 3;\n'
+            '}\n'
+            'void function2(int y) {\n'
+            '    uint8_t x = 2;\n'
+            '    y = 5;\n'
+            '}\n'
+            'int x = 4;\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_symbol_table(self):
+        symbols = SymbolTable()
+        symbols.bind('x', type='int')
+        symbols.enter_scope()
+        assert symbols.lookup('x') == {'type': 'int'}
+        symbols.bind('x', type='char')
+        symbols.bind('y', type='float')
+        assert symbols.lookup('x') == {'type': 'char'}
+        symbols.leave_scope()
+        assert symbols.lookup('x') == {'type': 'int'}
+        assert symbols.lookup('y') is None
+        assert symbols.bindings == {'x': [{'type': 'int'}]}
+
+
+class TestConstantFolding:
+    def test_fold_expressions(self):
+        source_code = (
+            'F_CPU: preproc = 16000000\n'
+            'MASK: preproc = 0xFF & ~0x10\n'
+            'a: uint8_t = 1 << (7 - 3)\n'
+            'b: int = F_CPU // 1000\n'
+            'c: int = MASK | 1\n'
+            'd: int = a * (3 - 5)\n'
+            'e: int = -5\n'
+            'f: int = 7 / 2\n'
+            'g: float = 7.0 / 2'
+        )
+        result_code = (
+            '#define F_CPU 16000000\n'
+            '#define MASK 239\n'
+            'uint8_t a = 16;\n'
+            'int b = 16000;\n'
+            'int c = 239;\n'
+            'int d = a * (-2);\n'
+            'int e = -5;\n'
+            'int f = 7 / 2;\n'
+            'float g = 3.5;\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_python_semantics_and_declared_types(self):
+        source_code = (
+            'a: int = -7 % 3\n'
+            'b: int = -7 // 2\n'
+            'c: int8_t = 100 + 100\n'
+            'd: uint8_t = 0 - 1\n'
+            'def function() -> uint16_t:\n'
+            '    return 65535 + 2'
+        )
+        result_code = (
+            'int a = 2;\n'
+            'int b = -4;\n'
+            'int8_t c = -56;\n'
+            'uint8_t d = 255;\n'
+            'uint16_t function(void) {\n'
+            '    return 1;\n'
+            '}\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_debug_listing_and_disabling(self):
+        source_code = 'a: int = b + (2 * 3)'
+        translator = TranslatorC(save_to=StringIO())
+        translate(translator, source_code)
+        assert translator.save_to.getvalue() == 'int a = b + 6;\n'
+        [(node, value)] = translator.folded_constants
+        assert (node.lineno, node.col_offset, ast.unparse(node), value) == (1, 14, '2 * 3', 6)
+        assert trans('a: int = 2 * 3', config={'fold_constants': False}) == 'int a = 2 * 3;\n'
+
+
+class TestDivisionByConstant:
+    def test_unsigned_division_by_power_of_two(self):
+        source_code = (
+            'a: uint8_t = 200\n'
+            'b: int = 7\n'
+            'c: uint8_t = a // 8\n'
+            'd: uint8_t = a % 16 + 1\n'
+            'if a % 4 == 0:\n'
+            '    c = a // 10\n'
+            'e: int = b // 8'
+        )
+        result_code = (
+            'uint8_t a = 200;\n'
+            'int b = 7;\n'
+            'uint8_t c = a >> 3;\n'
+            'uint8_t d = (a & 15) + 1;\n'
+            'if ((a & 3) == 0) {\n'
+            '    c = a / 10;\n'
+            '}\n\n'
+            'int e = b / 8;\n'
+        )
+        assert trans(source_code) == result_code
+
+    def test_division_by_reciprocal(self):
+        source_code = (
+            'a: uint8_t = 200\n'
+            'b: uint16_t = 1000\n'
+            'c: uint8_t = a // 10\n'
+            'd: uint16_t = b % 10'
+        )
+        result_code = (
+            'uint8_t a = 200;\n'
+            'uint16_t b = 1000;\n'
+            'uint8_t c = ((uint16_t)a * 205u >> 11);\n'
+            'uint16_t d = b - ((uint32_t)b * 52429u >> 19) * 10;\n'
+        )
+        assert trans(source_code, config={'divide_by_reciprocal': True}) == result_code
+
+    def test_reciprocal(self):
+        for bits in (8, 16):
+            for divisor in (3, 7, 10, 100, 255):
+                multiplier, shift, product_bits = get_reciprocal(divisor, bits)
+                assert ((1 << bits) - 1) * multiplier < 1 << product_bits
+                assert all(value * multiplier >> shift == value // divisor for value in range(1 << bits))
+
+
+class TestDeadCode:
+    def test_statements_after_terminators(self):
+        source_code = (
+            'def function(a: int) -> int:\n'
+            '    while a > 0:\n'
+            '        a -= 1\n'
+            '        if a == 5:\n'
+            '            break\n'
+            '            a = 7\n'
+            '        continue\n'
+            '        a = 3\n'
+            '    return a\n'
+            '    a = 4'
+        )
+        result_code = (
+            'int function(int a) {\n'
+            '    while (a > 0) {\n'
+            '        a -= 1;\n'
+            '        if (a == 5) {\n'
+            '            break;\n'
+            '        }\n\n'
+            '        continue;\n'
+            '    }\n\n'
+            '    return a;\n'
+            '}\n'
+        )
+        with pytest.warns(DeadCodeWarning) as records:
+            assert trans(source_code) == result_code
+
+        assert len(records) == 3
+
+    def test_constant_conditions(self):
+        source_code = (
+            'DEBUG: preproc = 0\n'
+            'a: int = 0\n'
+            'if DEBUG:\n'
+            '    a = 1\n'
+            'elif a:\n'
+            '    a = 2\n'
+            'if 1 + 1:\n'
+            '    a = 3\n'
+            'else:\n'
+            '    a = 4\n'
+            'while False:\n'
+            '    a = 5\n'
+            'else:\n'
+            '    a = 6\n'
+            'while True:\n'
+            '    a = 7'
+        )
+        result_code = (
+            '#define DEBUG 0\n'
+            'int a = 0;\n'
+            'if (a) {\n'
+            '    a = 2;\n'
+            '}\n\n'
+            'a = 3;\n'
+            'a = 6;\n'
+            'while (1) {\n'
+            '    a = 7;\n'
+            '}\n\n'
+        )
+        with pytest.warns(DeadCodeWarning) as records:
+            assert trans(source_code) == result_code
+
+        assert [record.lineno for record in records] == [4, 10, 12]
+        assert [str(record.message).split('!')[0] for record in records] == [
+            'Unreachable code is removed (the condition is always False)',
+            'Unreachable code is removed (the condition is always True)',
+            'Unreachable code is removed (the condition is always False)',
+        ]
+
+    def test_disabling(self):
+        source_code = (
+            'def function():\n'
+            '    return\n'
+            '    a = 1'
+        )
+        result_code = (
+            '#include <stdint.h>\n'
+            '\n'
+            'void function(void) {\n'
+            '    return;\n'
+            '    uint8_t a = 1;\n'
+            '}\n'
+        )
+        assert trans(source_code, config={'eliminate_dead_code': False}) == result_code
+
+
+class TestTreeAnalysis:
+    def test_scopes_and_unreachable_statements(self):
+        tree = ast.parse(
+            'def outer(a: int):\n'
+            '    def inner():\n'
+            '        return 1, 2\n'
+            '    b = 1\n'
+            '    return b\n'
+            '    b = 2\n'
+            'def pair():\n'
+            '    return 1, 2'
+        )
+        outer, pair = tree.body
+        inner = outer.body[0]
+        analysis = analyze_body(tree.body)
+        assert not analysis.scopes[id(outer.body)].has_multi_return
+        assert analysis.scopes[id(inner.body)].has_multi_return
+        assert analysis.scopes[id(pair.body)].has_multi_return
+        assert [ast.unparse(node) for node in analysis.scopes[id(outer.body)].range_nodes] == [
+            'b = 1', 'b', 'b = 2', 'b',
+        ]
+        assert analysis.unreachable_statements == [outer.body[3]]
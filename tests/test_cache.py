@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from py2c.cache import FileCache, make_key
+from py2c.shortcuts import trans_c as trans
+from tests.test_examples_from_book import RESULT_LISTING_4_8, SOURCE_LISTING_4_8
+
+MODULES_DIR = Path(__file__).parent / 'mc_modules'
+
+
+class TestFileCache:
+    def test_get_and_set(self, tmp_path):
+        cache = FileCache(tmp_path, namespace='test')
+        key = make_key('content')
+        assert cache.get(key) is None
+        cache.set(key, {'name': {'type': 'int'}})
+        assert cache.get(key) == {'name': {'type': 'int'}}
+        assert make_key('content') == key
+        assert make_key('another content') != key
+
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        cache = FileCache(tmp_path)
+        for index in range(3):
+            cache.set(make_key(str(index)), 'x' * 1000)
+            os.utime(cache.get_path(make_key(str(index))), (index, index))
+
+        cache.get(make_key('0'))  # it becomes the most recently used
+        cache.max_size = cache.get_path(make_key('0')).stat().st_size * 2
+        cache.evict()
+        assert cache.get(make_key('0')) is not None
+        assert cache.get(make_key('1')) is None
+        assert cache.get(make_key('2')) is not None
+
+
+class TestModulesCache:
+    def test_translating_with_cache(self, tmp_path):
+        config = {'modules_dir': MODULES_DIR, 'cache_dir': tmp_path}
+        assert trans(SOURCE_LISTING_4_8, config=config) == RESULT_LISTING_4_8
+        assert len(list((tmp_path / 'interfaces').iterdir())) == 1
+        assert trans(SOURCE_LISTING_4_8, config=config) == RESULT_LISTING_4_8
@@ -0,0 +1,84 @@
+import json
+
+import py2c.module_interface
+from py2c.module_interface import get_interface_path
+from py2c.shortcuts import trans_c as trans
+
+MODULE_SOURCE = (
+    "PORTB: 'byte' = 0\n"
+    'table: uint8_t__16\n'
+    'F_CPU: preproc = 8000000\n'
+    'def delay_ms(ms: int) -> int:\n'
+    '    counter = 0\n'
+    '    return counter\n'
+)
+SOURCE = 'from registers import *\nPORTB = 1\ncounter = 2'
+RESULT = '#include "registers.h"\n\nPORTB = 1;\nint counter = 2;\n'
+
+
+class TestModuleInterface:
+    def test_interface_is_written(self, tmp_path):
+        module_path = tmp_path / 'registers.py'
+        module_path.write_text(MODULE_SOURCE)
+        assert trans(SOURCE, config={'modules_dir': tmp_path}) == RESULT
+
+        with open(get_interface_path(module_path)) as interface_file:
+            interface = json.load(interface_file)
+
+        assert interface['symbols'] == {
+            'PORTB': {'type': 'byte'},
+            'table': {'type': 'uint8_t', 'array_sizes': ['16']},
+            'F_CPU': {'type': 'preproc', 'value': 8000000},
+            'delay_ms': {'type': 'function', 'annotation': 'int', 'pos_args': [['int', 'ms']]},
+        }
+
+    def test_interface_is_used_instead_of_translating(self, tmp_path):
+        module_path = tmp_path / 'registers.py'
+        module_path.write_text(MODULE_SOURCE)
+        trans(SOURCE, config={'modules_dir': tmp_path})
+
+        interface_path = get_interface_path(module_path)
+        with open(interface_path) as interface_file:
+            interface = json.load(interface_file)
+
+        interface['symbols']['counter'] = {'type': 'int'}
+        with open(interface_path, 'w') as interface_file:
+            json.dump(interface, interface_file)
+
+        module_path.write_text(MODULE_SOURCE)  # the same source code, the interface is still valid
+        py2c.module_interface._loaded_interfaces.clear()
+        assert trans(SOURCE, config={'modules_dir': tmp_path}).endswith('counter = 2;\n')
+
+        module_path.write_text(MODULE_SOURCE + 'new_variable: int\n')  # the interface is regenerated
+        assert trans(SOURCE, config={'modules_dir': tmp_path}) == RESULT
+
+    def test_default_args_of_imported_function(self, tmp_path):
+        module_path = tmp_path / 'timers.py'
+        module_path.write_text('def delay_ms(ms: int, factor: int = 1000) -> int:\n    return ms * factor\n')
+        source_code = 'from timers import delay_ms\ndelay_ms(5)'
+        assert trans(source_code, config={'modules_dir': tmp_path}) == (
+            '#include "timers.h"\n\ndelay_ms(5, 1000);\n'
+        )
+
+    def test_interface_is_built_with_config_of_importer(self, tmp_path):
+        module_path = tmp_path / 'pairs.py'
+        module_path.write_text('def pair(a: int) -> (int, int):\n    return a, a\n')
+        source_code = 'from pairs import pair\nx, y = pair(5)'
+        assert trans(source_code, config={'modules_dir': tmp_path}).endswith(
+            'struct pair_mys py2c_result_1 = pair(5);\nx = py2c_result_1.item0;\ny = py2c_result_1.item1;\n',
+        )
+        assert trans(source_code, config={'modules_dir': tmp_path, 'multi_return': 'out_pointers'}) == (
+            '#include "pairs.h"\n\nint x;\nint y;\npair(5, &x, &y);\n'
+        )
+
+    def test_interface_is_regenerated_if_transitive_import_is_changed(self, tmp_path):
+        source_code = 'from bmod import *\ny = X + 1'
+        (tmp_path / 'bmod.py').write_text('from cmod import *\n')
+        for config in ({'modules_dir': tmp_path}, {'modules_dir': tmp_path, 'cache_dir': tmp_path / 'cache'}):
+            (tmp_path / 'cmod.py').write_text('X: preproc = 1\n')
+            assert trans(source_code, config=config).endswith('y = 2;\n')
+
+            (tmp_path / 'cmod.py').write_text('X: preproc = 5\n')
+            assert trans(source_code, config=config).endswith('y = 6;\n')
+            py2c.module_interface._loaded_interfaces.clear()
+            assert trans(source_code, config=config).endswith('y = 6;\n')
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import array
+import ctypes
+import importlib.util
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from py2c import native
+from py2c.cli import run
+from py2c.exceptions import CompilationException
+from py2c.extension import build_extension
+from py2c.shortcuts import compile_c, trans_c
+
+pytestmark = pytest.mark.skipif(not shutil.which(native.C_COMPILER), reason='C-compiler is not found')
+
+
+@pytest.fixture(autouse=True)
+def native_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PY2C_NATIVE_CACHE', str(tmp_path))
+    return tmp_path
+
+
+class TestCompileC:
+    def test_call_native_function(self):
+        @compile_c(background=False)
+        def multiply(a: int, b: float) -> float:
+            c: uint8_t = 3
+            return a * b + c ** 2
+
+        assert multiply(2, 1.5) == 12.0
+        assert multiply(b=0.5, a=4) == 11.0
+        assert multiply.__name__ == 'multiply'
+
+    def test_integer_power(self):
+        @compile_c(background=False)
+        def power(base: int, exponent: int) -> int64_t:
+            return base ** exponent + 2 ** exponent
+
+        assert power(3, 5) == 3 ** 5 + 2 ** 5
+        assert power(-2, 7) == 0
+
+    def test_division_by_reciprocal(self):
+        source_code = (
+            'def divide(a: uint8_t, b: uint16_t) -> uint32_t:\n'
+            '    return (a // 7) * 100000 + (a % 7) * 10000 + b // 10 + b % 3'
+        )
+        c_code = trans_c(source_code, config={'divide_by_reciprocal': True})
+        assert ' / ' not in c_code and ' % ' not in c_code
+        divide = native.load_function(
+            native.compile_library(c_code),
+            'divide',
+            [native.get_ctype('uint8_t'), native.get_ctype('uint16_t')],
+            native.get_ctype('uint32_t'),
+        )
+        for a, b in zip(range(256), range(0, 65536, 257)):
+            assert divide(a, b) == (a // 7) * 100000 + (a % 7) * 10000 + b // 10 + b % 3
+
+    def test_iteration_over_arrays(self):
+        @compile_c(background=False)
+        def dot() -> int:
+            a: int__4 = [1, 2, 3, 4]
+            b: int__4 = [5, 6, 7, 8]
+            total: int = 0
+            for x, y in zip(a, b):
+                total += x * y
+
+            for i, x in enumerate(a):
+                total += i * x
+
+            return total
+
+        assert dot() == 90
+
+    def test_library_is_cached(self, native_cache_dir):
+        c_code = 'int add(int a, int b) {\n    return a + b;\n}\n'
+        library_path = native.compile_library(c_code)
+        assert library_path.parent == native_cache_dir
+        mtime = library_path.stat().st_mtime_ns
+        assert native.compile_library(c_code) == library_path
+        assert library_path.stat().st_mtime_ns == mtime
+        assert native.compile_library(c_code, flags=('-O0', '-shared', '-fPIC')) != library_path
+
+        add = native.load_function(library_path, 'add', [native.get_ctype('int')] * 2, native.get_ctype('int'))
+        assert add(2, 3) == 5
+
+    def test_compilation_error(self):
+        with pytest.raises(CompilationException):
+            native.compile_library('int broken(int a) {\n    return a +;\n}\n')
+
+    def test_specialization_per_signature(self):
+        @compile_c(background=False)
+        def scale(a, b) -> double:
+            return a * b
+
+        assert scale(3, 4) == 12.0
+        assert scale(1.5, 4) == 6.0
+        assert scale(ctypes.c_uint8(250), 2) == 500.0
+        assert list(scale.specializations) == [
+            ('long long', 'long long'),
+            ('double', 'long long'),
+            ('unsigned char', 'long long'),
+        ]
+        scale(3, 5)
+        assert list(scale.specializations)[-1] == ('long long', 'long long')
+
+    def test_specializations_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(native, 'SPECIALIZATIONS_MAX_COUNT', 1)
+
+        @compile_c(background=False)
+        def increment(a) -> double:
+            return a + 1
+
+        assert increment(1) == 2.0
+        assert increment(1.5) == 2.5
+        assert list(increment.specializations) == [('double',)]
+
+    def test_unsupported_argument(self):
+        @compile_c(background=False)
+        def increment(a) -> int:
+            return a + 1
+
+        with pytest.raises(CompilationException):
+            increment('1')
+
+
+class TestBufferArguments:
+    def test_bytearray_is_changed_in_place(self):
+        @compile_c(background=False)
+        def invert(data: uint8_t__link, length: int):
+            index: int = 0
+            for index in range(length):
+                data[index] = 255 - data[index]
+
+        data = bytearray(b'\x00\x01\xff')
+        invert(data, len(data))
+        assert data == bytearray(b'\xff\xfe\x00')
+        invert(memoryview(data)[1:], 2)
+        assert data == bytearray(b'\xff\x01\xff')
+
+    def test_array_annotation(self):
+        @compile_c(background=False)
+        def total(values: int32_t__4) -> int:
+            result: int = 0
+            index: int = 0
+            for index in range(4):
+                result += values[index]
+
+            return result
+
+        assert total(array.array('i', [1, 2, 3, 4])) == 10
+        with pytest.raises(ValueError):
+            total(array.array('i', [1, 2, 3]))
+
+        with pytest.raises(TypeError):
+            total(array.array('d', [1, 2, 3, 4]))
+
+        with pytest.raises(TypeError):
+            total(array.array('f', [1, 2, 3, 4]))
+
+        with pytest.raises(TypeError):
+            total(array.array('I', [1, 2, 3, 4]))
+
+    def test_byte_order_of_buffer(self):
+        @compile_c(background=False)
+        def first(values: int32_t__link) -> int:
+            return values[0]
+
+        assert first((ctypes.c_int32 * 2)(7, 8)) == 7
+        with pytest.raises(TypeError):
+            first((ctypes.c_int32.__ctype_be__ * 2)(7, 8))
+
+        assert native.get_buffer_c_type((ctypes.c_int32.__ctype_be__ * 2)()) is None
+
+    def test_readonly_buffers_are_copied(self):
+        @compile_c(background=False)
+        def replace_first(data: uint8_t__link) -> int:
+            result: int = data[0]
+            data[0] = 88
+            return result
+
+        data = b'\x07\x08'
+        assert replace_first(data) == 7
+        assert data == b'\x07\x08'
+        view = memoryview(data)
+        assert replace_first(view) == 7
+        assert view.tobytes() == b'\x07\x08'
+
+    def test_unannotated_buffer(self):
+        @compile_c(background=False)
+        def first(data) -> double:
+            return data[0]
+
+        assert first(array.array('d', [1.5])) == 1.5
+        assert first(bytearray(b'\x07')) == 7.0
+        assert list(first.specializations) == [('double *',), ('uint8_t *',)]
+
+
+class TestBackgroundCompilation:
+    def test_python_function_is_called_until_library_is_ready(self, monkeypatch):
+        compiled = threading.Event()
+        compile_library = native.compile_library
+
+        def wait_and_compile_library(c_code):
+            compiled.wait(5)
+            return compile_library(c_code)
+
+        monkeypatch.setattr(native, 'compile_library', wait_and_compile_library)
+
+        @compile_c
+        def increment(a: uint8_t) -> uint8_t:
+            return a + 1
+
+        assert increment(255) == 256  # python
+        assert not increment.specializations
+        compiled.set()
+        increment.wait()
+        assert increment(255) == 0  # C
+        assert list(increment.specializations) == [('uint8_t',)]
+
+    def test_one_compilation_for_concurrent_calls(self, monkeypatch):
+        compiled_signatures = []
+        compile_function = native.NativeFunction.compile
+
+        def count_and_compile(self, arg_types):
+            compiled_signatures.append(arg_types)
+            return compile_function(self, arg_types)
+
+        monkeypatch.setattr(native.NativeFunction, 'compile', count_and_compile)
+
+        @compile_c
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(multiply, range(100), range(100)))
+
+        multiply.wait()
+        assert results == [index * index for index in range(100)]
+        assert compiled_signatures == [('int', 'int')]
+        assert multiply(3, 4) == 12
+
+    def test_prewarm(self):
+        @compile_c(prewarm=True)
+        def increment(a: uint8_t) -> uint8_t:
+            return a + 1
+
+        increment.wait()
+        assert list(increment.specializations) == [('uint8_t',)]
+        assert increment(255) == 0
+
+    def test_failed_compilation(self):
+        @compile_c
+        def call_unknown(a: int) -> int:
+            return unknown_function(a)
+
+        with pytest.raises(NameError):
+            call_unknown(1)
+
+        with pytest.raises(CompilationException):
+            call_unknown.wait()
+
+
+class TestBuildExtension:
+    SOURCE_CODE = '''
+counter: int = 0
+
+
+def _square(a: int) -> int:
+    return a * a
+
+
+def add_squares(a: int, b: int) -> int:
+    """Sum of squares"""
+    global counter
+    counter += 1
+    return _square(a) + _square(b)
+
+
+def total(data: uint8_t__link, length: int) -> int:
+    result: int = 0
+    index: int = 0
+    for index in range(length):
+        result += data[index]
+
+    return result
+'''
+
+    def test_build_ext(self, tmp_path):
+        module_path = tmp_path / 'src' / 'numeric.py'
+        module_path.parent.mkdir()
+        module_path.write_text(self.SOURCE_CODE)
+        output_dir = tmp_path / 'build'
+        run(['build-ext', str(module_path), '-o', str(output_dir)])
+        assert (output_dir / 'libnumeric.so').exists()
+
+        spec = importlib.util.spec_from_file_location('numeric_native', output_dir / 'numeric_native.py')
+        wrapper = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(wrapper)
+        assert wrapper.add_squares(3, 4) == 25
+        assert wrapper.add_squares(b=2, a=3) == 13
+        assert wrapper.add_squares.__doc__ == 'Sum of squares'
+        assert wrapper.counter.value == 2
+        assert wrapper.total(bytearray(b'\x01\x02\x03'), 3) == 6
+        assert not hasattr(wrapper, '_square')
+
+    def test_default_args(self, tmp_path):
+        module_path = tmp_path / 'scaling.py'
+        module_path.write_text('def scale(a: int, factor: int = 3) -> int:\n    return a * factor\n')
+        library_path, wrapper_path = build_extension(module_path)
+
+        spec = importlib.util.spec_from_file_location('scaling_native', wrapper_path)
+        wrapper = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(wrapper)
+        assert wrapper.scale(2) == 6
+        assert wrapper.scale(2, 5) == 10
+        assert wrapper.scale(a=2) == 6
+
+    @pytest.mark.parametrize('source_code, message', [
+        ('def function(a, b: int) -> int:\n    return b\n', 'The argument `a` of the exposed function `function`'),
+        ('def function(a: int) -> (int, int):\n    return a, a\n', 'The exposed function `function` returns'),
+    ])
+    def test_unexposable_function(self, tmp_path, source_code, message):
+        module_path = tmp_path / 'module.py'
+        module_path.write_text(source_code)
+        with pytest.raises(CompilationException, match=message):
+            build_extension(module_path)
@@ -0,0 +1,66 @@
+import json
+import threading
+from io import StringIO
+
+from py2c.client import request_server, run_client
+from py2c.server import TranslationService, make_socket_server, serve_stream
+from py2c.shortcuts import trans_c as trans
+
+SOURCE = 'def function(a: int) -> int:\n    return a * 2\n'
+
+
+class TestServer:
+    def test_stdin_requests(self, tmp_path):
+        source_path = tmp_path / 'source.py'
+        source_path.write_text(SOURCE)
+        requests = [
+            {'source_code': SOURCE},
+            {'source_code': SOURCE, 'language': 'cpp'},
+            {'source_code': 'a: None = 1'},
+            {'argv': ['source.py', '-p'], 'cwd': str(tmp_path)},
+            {'argv': ['source.py'], 'cwd': str(tmp_path)},
+            {'source_code': SOURCE},
+        ]
+        output = StringIO()
+        serve_stream(StringIO(''.join(f'{json.dumps(request)}\n' for request in requests)), output)
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert responses[0] == responses[1] == responses[5] == {'code': trans(SOURCE)}
+        assert responses[2]['error'].startswith('NoneIsNotAllowedException')
+        assert responses[3] == {'returncode': 0, 'stdout': trans(SOURCE), 'stderr': ''}
+        assert responses[4] == {'returncode': 0, 'stdout': '', 'stderr': ''}
+        assert (tmp_path / 'source.c').read_text() == trans(SOURCE)
+
+    def test_transit_data_is_reset(self):
+        service = TranslationService()
+        source_code = 'def function():\n    a = 1'
+        assert 'uint8_t a = 1;' in service.translate(source_code)
+        config = {'infer_integer_types': False}
+        assert service.translate(source_code, config=config) == trans(source_code, config=config)
+
+    def test_socket_requests(self, tmp_path, monkeypatch, capsys):
+        socket_path = tmp_path / 'py2c.sock'
+        service = TranslationService()
+        server = make_socket_server(socket_path, service)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            assert request_server({'source_code': SOURCE}, socket_path) == {'code': trans(SOURCE)}
+
+            source_path = tmp_path / 'source.py'
+            source_path.write_text(SOURCE)
+            monkeypatch.setenv('PY2C_SOCKET', str(socket_path))
+            monkeypatch.chdir(tmp_path)
+            run_client(['source.py', '-p'])
+            assert capsys.readouterr().out == trans(SOURCE)
+            assert 'c' in service.translators
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    def test_client_without_server(self, tmp_path, monkeypatch, capsys):
+        source_path = tmp_path / 'source.py'
+        source_path.write_text(SOURCE)
+        monkeypatch.setenv('PY2C_SOCKET', str(tmp_path / 'absent.sock'))
+        run_client([str(source_path), '-p'])
+        assert capsys.readouterr().out == trans(SOURCE)